@@ -0,0 +1,496 @@
+# Rules of crimemapper: raw crime category (lower-cased and stripped) -> crime category in ES (see
+# crime_mapper_utils.map_event_types_from_es_to_en).
+#
+# A rule matches when all of its conditions hold:
+#   "any"     - at least one of the terms is a substring of the raw crime (a list inside means all of its terms)
+#   "and_any" - the same for a second group of terms
+#   "all"     - all of the terms are substrings of the raw crime
+#   "none"    - none of the terms is a substring of the raw crime
+# The matching rule with the highest priority wins, raw crimes without matching rules are mapped to DEFAULT_CRIME.
+# Rules with the same priority and target are alternatives of one condition.
+#
+# The rules reproduce the legacy if-chain (crime_mapper_utils.crimemapper_legacy), where later checks override
+# earlier ones, so priorities follow the order of the checks. Terms with upper-case letters of the legacy function
+# never matched the lower-cased raw crime and are left out.
+
+DEFAULT_CRIME = "Otro"
+
+ROBBERY_TERMS = [
+    "theft", "盗窃", "vols", "industrial espionage", "vol", "auto theft", "b&e", "vehicle crime", "burgl", "burglar",
+    "burglary", "burg", "b&", "stole", "shoplifting", "larceny", "larc", "gta", "snatch", "lojack", "snatching",
+    "hurto", "pocket-picking", "robo", "obtaining a service without payment", "purse-snatching",
+    "false pretenses/swindle/confidence game", "robbery", "allanamiento", ["robo", "negocio"], "robo a pasajero",
+    "robo a transportista", "vargus", "pisivargus", "robatori", "furto", "roubo", "abigeato", "despojo",
+    "breakings", ["breaking", "entering"], "furti", "rapine", "強盗", "金庫破り", "空き巣", "自動車盗", "オートバイ盗", "自転車盗",
+    "車上ねらい", "自販機ねらい", "工事場ねらい", "すり", "ひったくり", "置引き", "万引き", ["非侵入窃盗", "その他"], "dacoity", "house breaking",
+    "thefts", "making off from a hotel, restaurant or bar without payment", "break and enter", "pickpocketing",
+    "taking conveyance w/o authority", "hurtado", "escalamiento", "evading fare", "shop-lifting", "rb_sorpresa",
+    "rb_fuerza", "rb_vehìculo", "rb_lug_habitado", "rb_lug_no_habitado", "otros_rb", "introduction",
+    "break & enter", "a/rob", "rob", "steal", "tacha", "bmv", "thft", "cambriolage", ["breaking", "unarmed"],
+    "apropiació indeguda", "furt", "raub", "diebstahl", "einbruch", "被盗", "盗窃罪", "抢劫", "lopások", "rablások",
+    "lakásbetörések", "penadahan", "pencurian", "tatvina", "rob-other", "shoplift", "кражи", "грабежи",
+    "latrocínio", "ограбление", "разбои",
+]
+
+THEFT_TERMS = [
+    "theft", "盗窃", "b&e", "burgl", "burglar", "burglary", "burg", "b&", "stole", "shoplifting", "larceny", "larc",
+    "hurto", "pocket-picking", "obtaining a service without payment", "false pretenses/swindle/confidence game",
+    "vargus", "pisivargus", "furto", "roubo", "abigeato", "breakings", "breaking", "entering", "furti", "金庫破り",
+    "空き巣", "自販機ねらい", "工事場ねらい", "すり", "置引き", "万引き", "house breaking", "thefts",
+    "making off from a hotel, restaurant or bar without payment", "break and enter", "pickpocketing",
+    "taking conveyance w/o authority", "hurtado", "escalamiento", "evading fare", "shop-lifting", "rb_sorpresa",
+    "rb_lug_habitado", "rb_lug_no_habitado", "otros_rb", "introduction", "break & enter", "rob", "bmv", "thft",
+    "apropiació indeguda", "furt", "diebstahl", "einbruch", "被盗", "盗窃罪", "lopások", "lakásbetörések", "pencurian",
+    "tatvina", "shoplift", "кражи",
+]
+
+AUTO_THEFT_TERMS = [
+    "auto", "auto theft", "gta", "vehicle", "car", "motorcar", "moped", "coche", "carjacking", "hijacking",
+    "motocicleta", "vols de vélos", "motorcycle", "vehiculo robado", "robo de vehiculo", "robo de vehículo",
+    "mootorsoiduki", "jalgratta", "veículo", "automezzi", "ciclomotori", "motociclo", "autovetture", "自動車盗",
+    "オートバイ盗", "自転車盗", "車上ねらい", "conveyance", "vehiculo", "véhicule", "voiture", "vehiculo hurtado", "camion",
+    "vehicle larceny", "vehicle theft", "kendaraan bermotor", "transportation", "veiculo", "rb_vehìculo", "угон тс",
+]
+
+DISTURBANCE_TERMS = [
+    "disturb", "drunk", ["public", "order"], "noisy", "breach of the peace", "intox", "desorden publico",
+]
+
+
+CRIME_RULES = [
+    {
+        "priority": 10, "target": "Pirateria",
+        "any": ["piracy", "pirateria", "imitation"],
+        "none": ["total"],
+    },
+    {
+        "priority": 20, "target": "Acoso",
+        "any": [
+            "obscenity", "以滋扰他", "侮辱", "威胁", "寻衅滋事", "猥亵", "intimidacion", "intimidación", "difamacion",
+            "discriminacion", "tracking", "amenaza", "harrassment", "harassment", "harassing", "stalking", "bully",
+            "threat", "acoso", "intimidaci", "intimidation", "peeping tom", "menac", "ultraje", "amenazas",
+            "minacce", "ingiurie", "脅迫", "恐喝", "insult", "cruelty", "intent to outrage her modesty", "harass",
+            "disorderly", "indecent", "indecency", "unlawful exposure", "annoy", "accosting", "intimidating",
+            ["obscene", "phone call"], "dis-conduct", "amenaces", "vexacions", "injúr", "骚扰", "garázdaságok",
+            "zalezovanje", "grožnja", "armed disturb",
+        ],
+        "none": ["total", "domest", "animal"],
+    },
+    {
+        "priority": 30, "target": "Robo",
+        "any": ROBBERY_TERMS,
+        "none": ["total"],
+    },
+    {
+        "priority": 40, "target": "Robo_de_Coche",
+        "any": ROBBERY_TERMS,
+        "and_any": [
+            "auto", "vehicle", "car", "motorcar", "moped", "coche", "carjacking", "hijacking", "motocicleta",
+            "vols de vélos", "motorcycle", "vehiculo robado", "robo de vehiculo", "robo de vehículo",
+            "mootorsoiduki", "jalgratta", "veículo", "automezzi", "ciclomotori", "motociclo", "autovetture", "自動車盗",
+            "オートバイ盗", "自転車盗", "車上ねらい", "conveyance", "vehiculo", "véhicule", "voiture", "vehiculo hurtado",
+            "camion", "vehicle larceny", "vehicle theft", "kendaraan bermotor", "transportation", "veiculo",
+            "угон тс",
+        ],
+        "none": ["total", "from", "inside", "desde", "da"],
+    },
+    {
+        "priority": 50, "target": "Robo",
+        "any": ROBBERY_TERMS,
+        "and_any": [
+            "arma", "強盗", "dacoity", "firearms", "violent robbery", "pistol", "à main armée", "agresion agravada",
+            "con violencia", "amb violència", "qualifiés", "gun", "knife", "strong", "разбой", "a/", "de cecular",
+        ],
+        "none": ["total"],
+    },
+    {
+        "priority": 50, "target": "Robo",
+        "any": ROBBERY_TERMS,
+        "all": ["armed"],
+        "none": ["total", "unarmed"],
+    },
+    {
+        "priority": 50, "target": "Robo",
+        "any": ROBBERY_TERMS,
+        "all": ["force"],
+        "none": ["total", "no force"],
+    },
+    {
+        "priority": 60, "target": "Robo_de_Coche",
+        "any": [
+            "vehicle grand t", "vehicle petty t", "hijacking", "carjacking", "vehicle grand theft",
+            "vehicle petty theft", "mvt", "kendaraan bermotor", "gépkocsi", "feltörések", "kraftwagen", "gta",
+            "kfz", "劫持", "car jack", "stol veh-passenger vehicle", "grnd thft",
+        ],
+        "none": ["total"],
+    },
+    {
+        "priority": 70, "target": "Asalto",
+        "any": [
+            "assault", "交通肇事逃逸", "故意伤害", "殴打", "猥亵他人", "肇事逃逸案", "uso de fuerza", "lesiones intencionales", "asslt",
+            "abigeato", "weapons offense", "hit & run", "strangulation", "obstr breath", "resist", "serious injury",
+            "injury to", "inj", "aslt", "agg assault", "a&b", "asalto", "elder abuse", "wound", "knifing",
+            "stabbing", "battery", "bat", "poison", "fuerza", "tortura", "riot", "tentativa de feminicidio",
+            "tentativa de homicidio", "tentativa de homicídio", "contra funcionarios publicos", "violencia física",
+            "vagivald", "agressions", "violència domèstica", "lesiones dolosas", "lesiones culposas", "lesiones",
+            "les_leves", "les_graves", "attentati", "tentati omicidi", "lesioni dolose", "percosse",
+            "lesão corporal", "暴行", "傷害", "attempt to murder", "u/s 326 a ipc", "attempted murder", "wounding",
+            "disorder/fighting", "attempts or threats to murder", "weapons and explosives offences",
+            ["impaired adult", "abuse"], ["panhandling", "aggressive"], "affray", "shooting", ["spousal", "abuse"],
+            "attempted homicide", "bodily harm", "atemptat", "lesion", "maltractaments", "violència",
+            "körper-verletzungen", "刺伤", "伤害", "突击", "受伤", "伤人", "contre l'intégrité physique",
+            "violence intrafamiliale physique", "agresión", "coups", "blessures", "grievous bodily harm",
+            "simply bodily harm", "female genital mutilation", "endangering the life or health", "endangering life",
+            "endangering the welfare", "participation brawl", "participation attack",
+            "representations of acts of violence", "administering substances capable of causing injury to children",
+            "against humanity", "endangering public safety with weapons",
+            "endangering the life or health of another/abandonment", "crimes against persons", "erőszak",
+            "penganiayaan", "offence against a person", "offensive weapon", "mvc hit and run",
+            "traffic - hit and run", "telesna poškodba", "nasilje v družini", "verwondingen", "deadly weap", "adw",
+            "armed dispute", "fight", "abuse", "assualt", ["display/use", "weapon"], "wpn", "gun",
+            ["displ/use", "weapon"], "вред здоровью", "violence against", "attempt agg", ["violence", "person"],
+            "тяжкие телесные повреждения",
+        ],
+        "none": ["total", "domest", "dating"],
+    },
+    {
+        "priority": 70, "target": "Asalto",
+        "all": ["violencia"],
+        "none": ["sin", "con", "total", "domest", "dating"],
+    },
+    {
+        "priority": 70, "target": "Asalto",
+        "all": ["hurt"],
+        "none": ["hurto", "total", "domest", "dating"],
+    },
+    {
+        "priority": 70, "target": "Asalto",
+        "all": ["shot"],
+        "none": ["death", "total", "domest", "dating"],
+    },
+    {
+        "priority": 70, "target": "Asalto",
+        "all": ["shot"],
+        "none": ["died", "total", "domest", "dating"],
+    },
+    {
+        "priority": 70, "target": "Asalto",
+        "all": ["shot"],
+        "none": ["dead", "total", "domest", "dating"],
+    },
+    {
+        "priority": 70, "target": "Asalto",
+        "all": ["stabbed"],
+        "none": ["death", "total", "domest", "dating"],
+    },
+    {
+        "priority": 70, "target": "Asalto",
+        "all": ["stabbed"],
+        "none": ["died", "total", "domest", "dating"],
+    },
+    {
+        "priority": 70, "target": "Asalto",
+        "all": ["stabbed"],
+        "none": ["dead", "total", "domest", "dating"],
+    },
+    {
+        "priority": 80, "target": "Extorcion",
+        "any": [
+            "extorcion", "exhortos", "extortion", "coercion", "extorsion", "extorción", "extorsão", "estorsioni",
+            "敲诈勒索", "coaccions", "extorsió'", "敲诈", "extorsión", "izsiljevanje", "вымогательство",
+        ],
+        "none": ["total"],
+    },
+    {
+        "priority": 90, "target": "Secuestro",
+        "any": [
+            "kidnap", "imprisonment", "desaparicion forzada", "abduct", "secuestro", "plagio", "restraint", "rapto",
+            "purchase of a child", "privacion de la libertad", "privación ilegal de libertad",
+            "trafficking of person", "trafficking", "retención", "sustracc", "trafico de infantes",
+            "involuntary servitude", "robo de infante", "roovimine", "sequestro", "sequestri", "abduction",
+            "trata humana", "trata de personas", "segrest", "sostracció de menor", "freiheits-beraubung", "拐",
+            "enlèvement", "desaparecidos", "autosecuestro", "hostage taking", "penculikan", "odvzem prostosti",
+            "desaparición forzada",
+        ],
+        "none": ["total"],
+    },
+    {
+        "priority": 100, "target": "Actividad_de_Crimen_Organizado",
+        "any": [
+            "organized", "blackmail", "conspiracy", "usury", "crimen organizado", "lavado de activos",
+            "receptación", "sicariato", "tráfico de influencias", "tráfico de moneda", "tráfico de órganos",
+            "tráfico ilícito de", "money launder", "operaciones con recursos de procedencia ilicita",
+            "operating/promoting/assisting gambling", "pandilla", "mafioso", "riciclaggio",
+            "keeping vice establishments", "crime organisé", "gang", "criminal organisation", "blanqueig", "grups",
+            ["organitzacions", "criminals"], "pranje denarja", "illicit manufacturing", "sale/manufacture",
+            "manufacture / deliver", "asociación ilícita", "delincuencia organizada",
+        ],
+        "none": ["total"],
+    },
+    {
+        "priority": 110, "target": "Violacion",
+        "any": [
+            "viol.", "sexual", "contact-sexual", "rape", "incest", "violacion", "indec expo",
+            "restraining order violation", "violación", "groped", "sodomy", "fondling", "batt/sexual", "batt/oral",
+            "criminal solicitation", "bestiality", ["indecency", "child"], "prostitución", "escort", "proxenetismo",
+            "utilización de personas", "prostitution", "estupro", "violacion equiparada", "lenocinio", "incesto",
+            "sessuali", "minorenne", "molestation", "rape(1)minor", "posco act", "u/s 354 ipc", "u/s 326b ipc",
+            "intent to dosrobe", "indecent assault", "unnatural offences", "other offences vs. public morality",
+            "child abuse", "massage or erogenous areas", "obscene material", ["photography", "minor"], "prostitute",
+            "sexuals", "卖淫", "violence sexuelle", "prostitució", ["porno", "menors"], "csc - penetrate with object",
+            "perkosaan", "kršitev", "posilstvo", "spoln", "nasilništvo", "lewd", "pimping", "soliciting",
+            "pencabulan", "изнасилование",
+        ],
+        "none": ["total", "domest"],
+    },
+    {
+        "priority": 110, "target": "Violacion",
+        "all": ["sex"],
+        "none": ["sex offender registration viol", "sexies", "failure to register", "total", "domest"],
+    },
+    {
+        "priority": 120, "target": "Vandalismo",
+        "any": [
+            "arson", "grafitti", "criminal mis", "graffiti", "grafitt", "mischief", "damage", "damage city",
+            "damage prop", "damage to", "vandalism", "vandalismo", "defacing", "defacement",
+            "causing a flood, collapse or landslide", "causing explosion", "vandal", "dumping complaint", "vand",
+            "dano", ["daño", "intencional"], "daño a vias", "sabotaje", ["daño", "propiedad"], "materiales",
+            "actes contra la propietat", "vandalisme", "criminal damage", "danneggiamenti", "incendio",
+            "desecration", "burning", "firebombing", "property crime", "故意损坏公私财物", "故意损毁", "明火", "消防安全", "过失引起火灾",
+            "过失引起火灾案", "danys", "incendi", "brand", "损伤", "dégradation de la propriété", "méfait",
+            "crimes against property", "rongalas", "tulajdon elleni szabálysértések", "pembakaran", "pengrusakan",
+            "poškodovanje", "uničenje", "destruct", "повреждение", "destrucción de bienes",
+        ],
+        "none": ["total"],
+    },
+    {
+        "priority": 130, "target": "Trafico_de_Materias_Ilegales",
+        "any": [
+            "narcotic", "吸毒", "吸食毒", "非法持有毒品", "tráfico", "siembra", "distrib", "narc", "controlled substance",
+            "marijuana", "amphetamine", "meth ", "smuggling", "poss.", "poss of", "possession", "controlled sub",
+            "materias ilegales", "estupefacientes", "possess", "cont.sub", "contraband", "drug", "overdose",
+            "estupefaents", "psicotropics", "entorpecentes", "narcomenudeo", "contrabbando", "stupefacenti",
+            "sale of obscene object/s", "manufacturing of d.d.", "trafficking in d.d.", "cannab", "pwits",
+            "p-w-i-t-s", "cocaine", "heroin", "fentanyl", "crack", "peddling", "drogue", "rauschgift", "trafic",
+            "stupéfiants", "crimes against  alcoholic drinks law", "obat", "narkotika", "promet", "izdelovanje",
+            "proizvodnja", "cont subs", "toxic substances", "hallucin", "opiate", "fabricac", "opium", "poss:",
+            "наркопреступления",
+        ],
+        "none": [
+            "loitering", "weapon", "driving", "radio", "stolen", "gambling", "fireworks", "under the influ",
+            "escolar", "pesado", "orožja", "nedovoljena", "total",
+        ],
+    },
+    {
+        "priority": 140, "target": "Fraude",
+        "any": [
+            "fraud", "defraudacion", "defraudación", "fraudulenta", "wothless", "usura",
+            "issuing a false medical certificate", "maliciously causing financial loss to another", "w&i",
+            "worthless", "white-collar", "captac", "forge", "counterfei",
+            "reduction of assets to the prejudice of creditors", "removal of property", "fraude",
+            "misuse without criminal intent or through negligence", "accepting an advantage",
+            "unlawful use of financial assets", "embezz", "perj", "embezzlement", "trafico de influencia",
+            "usurpación de identidad", "overcharging of taxes", "abuse of public office",
+            "failure to comply with accounting regulations", "misconduct in public office", "abuso de confianza",
+            "suplantación de identidad", "enriquecimiento ilicito", "identity th", "documento falso", "falsedad",
+            "falsificación", "falsificacion", "alteracion", "alteración", "kelmus", "estelionato", "truffe",
+            "contraffazione", "詐欺", "deception", "deceptive", "forgery", "apropiacion ilegal", "alter",
+            ["bad", "check"], "scalping", "scam", "伪", "伪造的", "使用伪造", "使用变造的", "使用变造证", "冒用", "招", "提供虚假证言", "诈骗",
+            "estafes", "defraudaci", "falsificació", "usurpació", "伪造", "escroquerie", "cobro ilegal", "estafa",
+            "penipuan", "na črno", "goljufija", "ponareditev", "davčna zatajitev", "bedrog", "false info",
+            "false police reports", "false pretenses", "ponzi", "taking identity of another",
+            "unlawful use of financial card", "false", ["falsify", "id"], "document", "news", "statement", "credit",
+            "personation", "identification", "penggelapan", "engaño", "concusión", "evasión",
+            "aprovechamiento ilícito", "enriquecimiento ilícito", "testaferrismo", "agiotaje",
+        ],
+        "none": ["total"],
+    },
+    {
+        "priority": 150, "target": "Homicidio",
+        "any": [
+            "murder", "homicide", "homicidio", "femicidio", "manslaughter", "genocidio", "assassinat", "maurtre",
+            "muerte culposa", "genocide", "feminicidio", "atemptats", "homicídio", "strage", "omicidi", "infantici",
+            "kill", "dowry death", "asesinato", "death investigation", "homicidi dolós", "杀", "死亡",
+            "infractions entrainant la mort", "pembunuhan", "moord", "doodslag", "убийства", "feminicídio",
+            "fatally shot", "died after shots fired", ["shot", "death"], ["shot", "died"], ["shot", "dead"],
+            ["stabbed", "death"], ["stabbed", "died"], ["stabbed", "dead"],
+        ],
+        "none": [
+            "attempt to murder", "tentativa de homicidio", "tentativa de homicídio", "tentati omicidi",
+            "attempted murder", "attempts or threats to murder", "attempted homicide", "total",
+        ],
+    },
+    {
+        "priority": 160, "target": "Terrorismo",
+        "any": ["terror", "terrorismo", "terrorist attack", "terrorisme", "恐怖主义", "attentats"],
+        "none": ["terroristic threat", "total"],
+    },
+    {
+        "priority": 170, "target": "Corrupción",
+        "any": [
+            "corruption", "cohecho", "abuso de autoridad", "encubrimiento", "ejercicio indebido",
+            "ejercicio abusivo", "ejercicio ilegal", "financial exploitation", "bribery", "tampering",
+            "abuse of official", "corrupción", "breach of a prohibition from practising a profession",
+            "uso indebido de atribuciones y facultades", "usurpacion de funciones publicas", "coaccion",
+            "delitos de abogados, patronos, litigantes y asesores juridicos",
+            "uso indebido de insignias y uniformes", "impersonat", "corrupcion", "peculado", "corrupção",
+            "delitos cometidos por servidores públicos", "占有離脱物横領", "bribe", "brib", "suborn", "贿赂",
+            "granting an advantage", "crimes against public post", "poneverba", "zloraba",
+            "nedovoljeno sprejemanje daril", "nedovoljeno dajanje daril", "korupsi",
+        ],
+        "none": ["total"],
+    },
+    {
+        "priority": 180, "target": "Violent_Crimes",
+        "all": ["violence and sexual offences"],
+    },
+    {
+        "priority": 190, "target": "Violent_Crimes",
+        "any": [["凶悪犯", "その他"], "凶器準備集合"],
+    },
+    {
+        "priority": 200, "target": "Violent_Crimes",
+        "any": [
+            "openlijke geweldpleging", "public violence", "opzettelijke slagen en verwondingen", "doodslag",
+            "agressieve diefstal", "diefstal met gebruik of vertoon van een wapen", "opzettelijke brandstichting",
+            "geweld",
+        ],
+    },
+    {
+        "priority": 210, "target": "Robo",
+        "any": [
+            "huisdiefstal", "woninginbraken", "handelszaken inbraken", "andere inbraken", "diefstal met geweld",
+            "gebruiksdiefstal", "inbraken bedrijf",
+        ],
+    },
+    {
+        "priority": 220, "target": "Robo",
+        "all": ["pogingen tot woninginbraak"],
+    },
+    {
+        "priority": 230, "target": "Robo",
+        "any": [
+            "enkelvoudige of gewone diefstal", "gauwdiefstal", "winkeldiefstal", "fietsdiefstal",
+            "diefstal uit voertuig", "handtasroof", "zakkenrollerij", "overval", "straatroof", "diefstal",
+            "diefstallen",
+        ],
+    },
+    {
+        "priority": 240, "target": "Robo_de_Coche",
+        "any": [
+            "autodeifstal", "diefstal motorfiets", "diefstal bromfiets", "motorvoertuigen", "brom-", "snor-",
+            "fietsen", "voertuigen",
+        ],
+    },
+    {
+        "priority": 250, "target": "Trafico_de_Materias_Ilegales",
+        "any": ["drugs", "drugshandel", "druggebruik", "drugsbezit", "drugsaanmaak", "drugszoekgedrag", "heling"],
+    },
+    {
+        "priority": 260, "target": "Fraude",
+        "any": [
+            "oplichting", "bedriegerij", "valsheid in geschriften", "valse munt", "namaking/vervalsing",
+            "misbruik van vertrouwen",
+        ],
+    },
+    {
+        "priority": 270, "target": "Actividad_de_Crimen_Organizado",
+        "all": ["bedrijven"],
+    },
+    {
+        "priority": 280, "target": "Violacion",
+        "any": [
+            "aanmatiging", "andere misdrijven tegen de openbare trouw", "flessentrekkerij", "zedenfeiten",
+            "sluiksort", "geluidshinder", "verboden wapens", "racisme/discriminatie", "mishandeling",
+            "zedenmisdrijf",
+        ],
+    },
+    {
+        "priority": 290, "target": "Acoso",
+        "any": ["bedreiging", "bedreigingen"],
+    },
+    {
+        "priority": 300, "target": "Vandalismo",
+        "all": ["vandalisme"],
+    },
+    {
+        "priority": 310, "target": "Otro",
+        "all": ["autokraak"],
+    },
+    {
+        "priority": 320, "target": "Asalto",
+        "any": ["aslt-sgnfcnt bdly hm", "aslt-great bodily hm", "aslt4-less than subst harm"],
+    },
+    {
+        "priority": 330, "target": "Hurto",
+        "any": THEFT_TERMS,
+        "none": ["total"],
+    },
+    {
+        "priority": 340, "target": "Robo",
+        "any": THEFT_TERMS,
+        "and_any": [
+            "armed", "force", "arma", "強盗", "firearms", "violent robbery", "pistol", "à main armée",
+            "agresion agravada", "con violencia", "amb violència", "qualifiés", "gun", "knife", "strong", "разбой",
+            "a/",
+        ],
+        "none": ["total", "unarmed", "no force"],
+    },
+    {
+        "priority": 350, "target": "Robo",
+        "any": [
+            "snatch", "snatching", "robo", "purse-snatching", "robbery", "robo a pasajero", "robo a transportista",
+            "robatori", "rapina", "despojo", "rapine", "強盗", "ひったくり", "dacoity", "rb_fuerza", "a/rob", "raub", "抢劫",
+            "rablások", "penadahan", "rob-other", "грабежи", "latrocinio", "oграбление", "pазбои",
+        ],
+        "none": ["total"],
+    },
+    {
+        "priority": 360, "target": "Robo_de_Coche",
+        "any": AUTO_THEFT_TERMS,
+        "none": ["total"],
+    },
+    {
+        "priority": 370, "target": "Hurto",
+        "any": AUTO_THEFT_TERMS,
+        "all": ["from", "inside", "desde", "da"],
+        "none": ["total"],
+    },
+    {
+        "priority": 380, "target": "Actividad_Sospechosa",
+        "any": ["susp", ["susp", "veh"], "loitering", "sospech"],
+        "none": ["bat", "gang", "suspect", "suspicion", "card", "shoot", "stab"],
+    },
+    {
+        "priority": 390, "target": "Desorden",
+        "any": DISTURBANCE_TERMS,
+        "none": [
+            "domest", "bat", "driver", "driving", "vehicle", "highway", "road", "alley", "shoot", "stab", "violat",
+            "auto", "armed", "assault", "med",
+        ],
+    },
+    {
+        "priority": 390, "target": "Desorden",
+        "any": DISTURBANCE_TERMS,
+        "none": [
+            "domest", "bat", "driver", "driving", "vehicle", "highway", "road", "alley", "shoot", "stab", "violent",
+            "auto", "armed", "assault", "med",
+        ],
+    },
+    {
+        "priority": 400, "target": "Violaciones_de_Transito",
+        "any": [
+            "driver", "driving", "dui", "dwi", ["traffic", "violat"], ["impair", "driv"], ["intox", "driv"],
+            ["drunk", "driv"], ["borrach", "manejando"], "guiando", "volante",
+        ],
+        "none": ["forger", "robbery", "assault", "shoot", "stab", "stole", "trafficking", "abuse", "goodwill"],
+    },
+    {
+        "priority": 410, "target": "Ofensas_Domesticas",
+        "any": [
+            "domest", ["violen", "dat"], "violencia psicológica contra la mujer o miembros del núcleo familiar",
+            "domes aslt",
+        ],
+        "none": ["homicid"],
+    },
+]
@@ -1,3 +1,15 @@
+import random
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from psycopg2 import sql
+from retrie.retrie import Checklist
+
+from crime_mapper_rules import CRIME_RULES, DEFAULT_CRIME
+
 # This is mapper from crime categories in ES to EN
 map_event_types_from_es_to_en = {
     "Acoso": "Harassment",
@@ -25,7 +37,318 @@ map_event_types_from_es_to_en = {
 }
 
 
-def crimemapper(input_crime):
+class CrimeRuleEngine:
+    """
+    Maps raw crime categories with a table of rules (see crime_mapper_rules).
+
+    All terms of all rules are compiled into one trie regex, so a raw crime is scanned once to find every term it
+    contains (overlapping ones included). Rules are then checked as bit masks from the highest priority down, and
+    the first matching rule wins.
+    """
+
+    def __init__(self, rules: Sequence[Dict] = CRIME_RULES, default: str = DEFAULT_CRIME):
+        """
+        :param rules: rules with 'priority', 'target' and 'any' / 'and_any' / 'all' / 'none' terms
+        :param default: crime of raw crimes without matching rules
+        """
+        self.default = default
+        # all crimes the engine can return, e.g. for categorical dtypes
+        self.crimes = sorted({rule['target'] for rule in rules} | {default})
+
+        terms = []
+        for rule in rules:
+            for key in ('any', 'and_any', 'all', 'none'):
+                for alternative in rule.get(key, []):
+                    terms.extend([alternative] if isinstance(alternative, str) else alternative)
+        self.terms = list(dict.fromkeys(terms))
+        self.terms_ids = {term: idx for idx, term in enumerate(self.terms)}
+
+        # a term found at some position implies all terms which are its prefixes
+        self.prefixes = [[self.terms_ids[term[:end]] for end in range(1, len(term) + 1) if term[:end] in self.terms_ids]
+                         for term in self.terms]
+        self.prefix_masks = [self._terms_mask(self.terms[idx] for idx in prefixes) for prefixes in self.prefixes]
+
+        # (target, masks of 'any' alternatives, masks of 'and_any' alternatives, 'all' mask, 'none' mask)
+        self.rules = []
+        # bit mask of the rules (by position in self.rules) each term can trigger, prefixes of the term included
+        self.rules_masks = [0] * len(self.terms)
+        for rule_idx, rule in enumerate(sorted(rules, key=lambda rule: rule['priority'], reverse=True)):
+            assert rule.get('any') or rule.get('all'), "Rule should have 'any' or 'all' terms: %s" % rule
+            self.rules.append((
+                rule['target'],
+                self._alternatives_masks(rule.get('any')),
+                self._alternatives_masks(rule.get('and_any')),
+                self._terms_mask(rule.get('all', [])),
+                self._terms_mask(rule.get('none', [])),
+            ))
+            for key in ('any', 'and_any', 'all'):
+                for alternative in rule.get(key, []):
+                    for term in [alternative] if isinstance(alternative, str) else alternative:
+                        self.rules_masks[self.terms_ids[term]] |= 1 << rule_idx
+        self.rules_masks = [_or_all(self.rules_masks[prefix_idx] for prefix_idx in prefixes)
+                            for prefixes in self.prefixes]
+
+        trie_pattern = Checklist(self.terms, match_substrings=True, re_flags=0).pattern()
+        self.regex = re.compile(r"(?=(" + trie_pattern + r"))")
+
+    def _terms_mask(self, terms: Iterable[str]) -> int:
+        mask = 0
+        for term in terms:
+            mask |= 1 << self.terms_ids[term]
+        return mask
+
+    def _alternatives_masks(self, alternatives: List) -> Tuple[int, Tuple[int, ...]]:
+        """
+        :return: mask of single-term alternatives and masks of multi-term alternatives (None if there is no condition)
+        """
+        if alternatives is None:
+            return None
+        single_mask = self._terms_mask(term for term in alternatives if isinstance(term, str))
+        multi_masks = tuple(self._terms_mask(terms) for terms in alternatives if not isinstance(terms, str))
+        return single_mask, multi_masks
+
+    def find_terms(self, raw_crime: str) -> Tuple[int, int]:
+        """
+        :return: bit mask of all terms contained in the raw crime and bit mask of the rules these terms can trigger
+        """
+        mask = 0
+        rules_mask = 0
+        for match in self.regex.finditer(raw_crime):
+            idx = self.terms_ids.get(match.group(1))
+            if idx is not None:
+                mask |= self.prefix_masks[idx]
+                rules_mask |= self.rules_masks[idx]
+        return mask, rules_mask
+
+    def map(self, input_crime) -> str:
+        """
+        Maps raw crime category to crime category in ES (the same as crimemapper_legacy)
+        """
+        return self.map_raw_crime(str(input_crime).lower().strip())
+
+    def map_raw_crime(self, raw_crime: str) -> str:
+        """
+        Maps already lower-cased and stripped raw crime category
+        """
+        present, candidates = self.find_terms(raw_crime)
+
+        # only rules having a found term are checked, from the highest priority down
+        while candidates:
+            lowest_bit = candidates & -candidates
+            candidates ^= lowest_bit
+            target, any_masks, and_any_masks, all_mask, none_mask = self.rules[lowest_bit.bit_length() - 1]
+            if present & none_mask or present & all_mask != all_mask:
+                continue
+            if any_masks is not None and not _has_alternative(present, any_masks):
+                continue
+            if and_any_masks is not None and not _has_alternative(present, and_any_masks):
+                continue
+            return target
+
+        return self.default
+
+
+def _or_all(masks: Iterable[int]) -> int:
+    result = 0
+    for mask in masks:
+        result |= mask
+    return result
+
+
+def _has_alternative(present: int, masks: Tuple[int, Tuple[int, ...]]) -> bool:
+    single_mask, multi_masks = masks
+    if present & single_mask:
+        return True
+    for mask in multi_masks:
+        if present & mask == mask:
+            return True
+    return False
+
+
+CRIME_RULE_ENGINE = CrimeRuleEngine()
+
+
+# raw crime categories are highly repetitive, so mapped values are memoized
+_map_raw_crime_cached = lru_cache(maxsize=1000000)(CRIME_RULE_ENGINE.map_raw_crime)
+
+
+def crimemapper(input_crime) -> str:
+    return _map_raw_crime_cached(str(input_crime).lower().strip())
+
+
+def crimemapper_series(series: pd.Series) -> pd.Series:
+    """
+    Maps pandas Series of raw crime categories. Each distinct value is mapped once and the results are broadcast back,
+    so no multiprocessing is needed even for millions of rows
+    :param series: pandas Series with raw crime categories
+    :return: pandas Series of Categorical dtype with categories CRIME_RULE_ENGINE.crimes and the index of the input
+    """
+    codes, uniques = pd.factorize(series)
+    crimes_ids = {crime: idx for idx, crime in enumerate(CRIME_RULE_ENGINE.crimes)}
+
+    uniques_crimes_ids = np.array([crimes_ids[crimemapper(value)] for value in uniques], dtype=np.int64)
+    crimes_codes = uniques_crimes_ids[codes] if len(uniques) else np.zeros(len(codes), dtype=np.int64)
+
+    # missing values are not factorized, None and NaN are mapped like their string representations
+    missing = codes == -1
+    if missing.any():
+        crimes_codes[missing] = [crimes_ids[crimemapper(value)] for value in series.values[missing]]
+
+    return pd.Series(pd.Categorical.from_codes(crimes_codes, categories=CRIME_RULE_ENGINE.crimes),
+                     index=series.index, name=series.name)
+
+
+# whitespace stripped by str.strip() from ASCII strings
+_SQL_STRIP_CHARS = " \t\n\r\x0b\x0c"
+
+
+def get_crimemapper_sql_normalization(input_crime: sql.Composable) -> sql.Composed:
+    """
+    SQL counterpart of str(input_crime).lower().strip(): NULL becomes 'none' like str(None) does
+    :param input_crime: SQL expression with raw crime category (e.g. sql.Identifier of a column)
+    :return: SQL expression with normalized raw crime category
+    """
+    return sql.SQL("btrim(lower(coalesce({input_crime}::text, 'none')), {strip_chars})").format(
+        input_crime=input_crime, strip_chars=sql.Literal(_SQL_STRIP_CHARS))
+
+
+def _sql_contains(raw_crime: sql.Composable, term: str) -> sql.Composed:
+    return sql.SQL("strpos({raw_crime}, {term}) > 0").format(raw_crime=raw_crime, term=sql.Literal(term))
+
+
+def _sql_alternatives(raw_crime: sql.Composable, alternatives: List) -> sql.Composable:
+    """
+    :return: SQL condition true when the raw crime contains any of the alternatives (all terms of a list)
+    """
+    conditions = []
+    for alternative in alternatives:
+        if isinstance(alternative, str):
+            conditions.append(_sql_contains(raw_crime, alternative))
+        else:
+            conditions.append(sql.SQL("({})").format(
+                sql.SQL(" AND ").join(_sql_contains(raw_crime, term) for term in alternative)))
+    if not conditions:
+        return sql.SQL("FALSE")
+    return sql.SQL("({})").format(sql.SQL(" OR ").join(conditions))
+
+
+def get_crimemapper_sql_case(raw_crime: sql.Composable, rules: Sequence[Dict] = CRIME_RULES,
+                             default: str = DEFAULT_CRIME) -> sql.Composed:
+    """
+    Translates the crimemapper rules into SQL CASE expression. Rules are checked from the highest priority down,
+    so the first matching WHEN is the rule CrimeRuleEngine would pick
+    :param raw_crime: SQL expression with normalized raw crime category (see get_crimemapper_sql_normalization)
+    :param rules: rules with 'priority', 'target' and 'any' / 'and_any' / 'all' / 'none' terms
+    :param default: crime of raw crimes without matching rules
+    :return: SQL CASE expression with crime category in ES
+    """
+    whens = []
+    for rule in sorted(rules, key=lambda rule: rule['priority'], reverse=True):
+        conditions = []
+        if rule.get('any') is not None:
+            conditions.append(_sql_alternatives(raw_crime, rule['any']))
+        if rule.get('and_any') is not None:
+            conditions.append(_sql_alternatives(raw_crime, rule['and_any']))
+        conditions.extend(_sql_contains(raw_crime, term) for term in rule.get('all', []))
+        if rule.get('none'):
+            conditions.append(sql.SQL("NOT {}").format(_sql_alternatives(raw_crime, rule['none'])))
+
+        whens.append(sql.SQL("WHEN {conditions} THEN {target}").format(
+            conditions=sql.SQL(" AND ").join(conditions), target=sql.Literal(rule['target'])))
+
+    return sql.SQL("CASE\n{whens}\nELSE {default}\nEND").format(
+        whens=sql.SQL("\n").join(whens), default=sql.Literal(default))
+
+
+def get_crimemapper_sql_expression(column: str) -> sql.Composed:
+    """
+    SQL expression mapping column with raw crime categories, e.g. for generated columns. The column is normalized
+    inline for every term, so prefer the function of get_crimemapper_sql_function for big tables
+    :param column: name of the column with raw crime categories
+    :return: SQL CASE expression with crime category in ES
+    """
+    return get_crimemapper_sql_case(get_crimemapper_sql_normalization(sql.Identifier(column)))
+
+
+def get_crimemapper_sql_function(schema: str, function_name: str = 'crimemapper') -> sql.Composed:
+    """
+    Query creating immutable SQL function {schema}.{function_name}(text) equivalent to crimemapper. Postgres lower()
+    follows the collation of the DB, so mapping can differ from Python for exotic letters
+    :param schema: schema of the function
+    :param function_name: name of the function
+    :return: CREATE FUNCTION query to be executed by execute_query_safely
+    """
+    return sql.SQL(
+        "CREATE OR REPLACE FUNCTION {schema}.{function_name}(input_crime text)\n"
+        "RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $crimemapper$\n"
+        "SELECT {case}\n"
+        "FROM (SELECT {normalization} AS raw_crime) AS normalized\n"
+        "$crimemapper$"
+    ).format(schema=sql.Identifier(schema), function_name=sql.Identifier(function_name),
+             case=get_crimemapper_sql_case(sql.Identifier('raw_crime')),
+             normalization=get_crimemapper_sql_normalization(sql.Identifier('input_crime')))
+
+
+def get_crimemapper_update_query(schema: str, table_name: str, raw_crime_column: str, crime_column: str,
+                                 function_name: str = None) -> sql.Composed:
+    """
+    Query mapping raw crime categories of the table in place, so no data leaves the DB
+    :param schema: schema of the table
+    :param table_name: name of the table
+    :param raw_crime_column: name of the column with raw crime categories
+    :param crime_column: name of the column to write crime categories in ES to
+    :param function_name: name of the function created by get_crimemapper_sql_function in the same schema
+                          (the CASE expression is inlined if None)
+    :return: UPDATE query to be executed by execute_query_safely
+    """
+    if function_name is None:
+        crime = get_crimemapper_sql_expression(raw_crime_column)
+    else:
+        crime = sql.SQL("{schema}.{function_name}({column})").format(
+            schema=sql.Identifier(schema), function_name=sql.Identifier(function_name),
+            column=sql.Identifier(raw_crime_column))
+
+    return sql.SQL("UPDATE {schema}.{table_name} SET {crime_column} = {crime}").format(
+        schema=sql.Identifier(schema),
+        table_name=sql.Identifier(table_name),
+        crime_column=sql.Identifier(crime_column),
+        crime=crime)
+
+
+def check_crimemapper_equivalence(raw_crimes: Iterable = None, n_samples: int = 100000,
+                                  seed: int = 0) -> List[Tuple[str, str, str]]:
+    """
+    Compares the rule engine with the legacy if-chain
+    :param raw_crimes: raw crime categories to compare on (random combinations of the rule terms if None)
+    :param n_samples: number of random raw crimes
+    :param seed: random seed of the raw crimes
+    :return: list of (raw crime, legacy crime, rule engine crime) for every mismatch
+    """
+    if raw_crimes is None:
+        rng = random.Random(seed)
+        terms = CRIME_RULE_ENGINE.terms
+        fillers = ["", " ", "-", "/", "other", "total", "attempted", "of", "2nd degree"]
+        raw_crimes = []
+        for _ in range(n_samples):
+            raw_crime = " ".join(rng.choice(terms) if rng.random() < 0.7 else rng.choice(fillers)
+                                 for _ in range(rng.randint(1, 4)))
+            raw_crimes.append(raw_crime.upper() if rng.random() < 0.1 else raw_crime)
+        raw_crimes += [None, "", float('nan'), 12]
+
+    mismatches = []
+    for raw_crime in raw_crimes:
+        legacy_crime = crimemapper_legacy(raw_crime)
+        crime = CRIME_RULE_ENGINE.map(raw_crime)
+        if legacy_crime != crime:
+            mismatches.append((raw_crime, legacy_crime, crime))
+
+    return mismatches
+
+
+def crimemapper_legacy(input_crime):
+    """
+    Legacy if-chain the rules of crime_mapper_rules were derived from, kept as a reference
+    """
     raw_crime = str(input_crime).lower().strip()
     crime = "Otro"
 
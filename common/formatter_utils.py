@@ -1,19 +1,131 @@
 import re
 from re import Pattern
+from typing import Any
 from retrie.retrie import Checklist
 
 SPACE_REGEX = re.compile(r"\s+")
 NUMERIC_REGEX = re.compile("[0-9]")
 NON_ALPHA_NUMERIC_REGEX = re.compile(r"[^a-z0-9]", re.IGNORECASE)
 WORD_REGEX = re.compile(r"(\s|^|\()[a-zA-Z]{2,}(\s|$|[,.\):;])")
-PUNCTUATION_REGEX = re.compile(r"""[=\?.,\/\\><:;'"\[\]()!%$*|^\-~`+#]""")
+PUNCTUATION_CHARS = """=?.,/\\><:;'"[]()!%$*|^-~`+#"""
+
+
+##############################
+#   NORMALIZING TEXTS        #
+##############################
+
+class TextNormalizer:
+    """
+    Precompiled text normalizer: lower-casing, replacing punctuation with spaces by a single str.translate pass and
+    (optionally) collapsing whitespace. The same instance is shared by all stages, so a text is normalized the same
+    way everywhere.
+
+    Without squash_spaces the normalized text has the same length as the original one (for texts whose lower-cased
+    form keeps the length), so character offsets found in it are valid in the original text.
+    """
+
+    def __init__(self, punctuation: str = PUNCTUATION_CHARS, lower: bool = True, squash_spaces: bool = False,
+                 strip: bool = True):
+        """
+        :param punctuation: characters replaced with spaces
+        :param lower: if True -> lower-case texts
+        :param squash_spaces: if True -> collapse runs of whitespace to a single space
+        :param strip: if True -> also strip whitespace of the ends when squash_spaces is True
+        """
+        assert not any(char.isalnum() or char.isspace() for char in punctuation), \
+            "Argument punctuation should contain only punctuation characters. Instead got '%s'" % punctuation
+
+        self.punctuation = punctuation
+        self.lower = lower
+        self.squash_spaces = squash_spaces
+        self.strip = strip
+        self.translate_table = str.maketrans(dict.fromkeys(punctuation, " "))
+        # the same character class as a regex, for engines without str.translate (e.g. pyarrow)
+        self.regex = re.compile("[" + "".join("\\" + char for char in punctuation) + "]" if punctuation else r"[^\s\S]")
+
+    def __call__(self, s: Any, lower: bool = None) -> Any:
+        """
+        Normalizes a single text
+        :param s: text (non-string values are returned as is)
+        :param lower: overrides the lower-casing of the normalizer
+        """
+        if not isinstance(s, str):
+            return s
+        if self.lower if lower is None else lower:
+            s = s.lower()
+        s = s.translate(self.translate_table)
+        if not self.squash_spaces:
+            return s
+        return " ".join(s.split()) if self.strip else SPACE_REGEX.sub(" ", s)
+
+    def normalize_series(self, series, lower: bool = None):
+        """
+        Normalizes pandas Series of texts (non-string values become NaN)
+        :param series: pandas Series
+        :param lower: overrides the lower-casing of the normalizer
+        """
+        if self.lower if lower is None else lower:
+            series = series.str.lower()
+        series = series.str.translate(self.translate_table)
+        if not self.squash_spaces:
+            return series
+        return series.str.split().str.join(" ") if self.strip else series.str.replace(SPACE_REGEX, " ", regex=True)
+
+    def normalize_arrow(self, array, lower: bool = None):
+        """
+        Normalizes pyarrow string array with pyarrow compute kernels (the same result as the scalar normalizer)
+        :param array: pyarrow (Chunked)Array of strings
+        :param lower: overrides the lower-casing of the normalizer
+        """
+        import pyarrow.compute as pc
+
+        if self.lower if lower is None else lower:
+            array = pc.utf8_lower(array)
+        array = pc.replace_substring_regex(array, pattern=self.regex.pattern, replacement=" ")
+        if self.squash_spaces:
+            array = pc.replace_substring_regex(array, pattern=r"\s+", replacement=" ")
+            if self.strip:
+                array = pc.utf8_trim_whitespace(array)
+        return array
+
+    def derive(self, keep: str = "", lower: bool = None, squash_spaces: bool = None,
+               strip: bool = None) -> 'TextNormalizer':
+        """
+        Creates normalizer replacing the same punctuation except the kept characters
+        :param keep: punctuation characters the new normalizer keeps in texts
+        :param lower: lower-casing of the new normalizer (the same as of this one if None)
+        :param squash_spaces: whitespace collapsing of the new normalizer (the same as of this one if None)
+        :param strip: stripping of the ends of the new normalizer (the same as of this one if None)
+        """
+        return TextNormalizer("".join(char for char in self.punctuation if char not in keep),
+                              lower=self.lower if lower is None else lower,
+                              squash_spaces=self.squash_spaces if squash_spaces is None else squash_spaces,
+                              strip=self.strip if strip is None else strip)
+
+
+# default normalizer of all stages: lower-cased, punctuation replaced, whitespace collapsed. Stages needing other
+# settings derive their normalizers from it (see level_0_filter_key_words.TEXT_NORMALIZER)
+TEXT_NORMALIZER = TextNormalizer(PUNCTUATION_CHARS, lower=True, squash_spaces=True)
+PUNCTUATION_REGEX = TEXT_NORMALIZER.regex
+# only collapses whitespace
+SPACE_NORMALIZER = TEXT_NORMALIZER.derive(keep=PUNCTUATION_CHARS, lower=False, strip=False)
+
+
+def normalize_text(s: Any) -> Any:
+    return TEXT_NORMALIZER(s)
 
 
 ##############################
 #   CLEANING STRINGS         #
 ##############################
 
-def squash_spaces(s, space_re: Pattern = SPACE_REGEX) -> str:
+def squash_spaces(s, space_re: Pattern = None) -> str:
+    """
+    Collapses runs of whitespace to a single space with the shared normalizers, without stripping the ends (runs
+    matched by space_re are replaced with a space if it is given)
+    """
+    if space_re is None:
+        return SPACE_NORMALIZER(s)
     return re.sub(space_re, " ", s) if isinstance(s, str) else s
 
 
@@ -1,4 +1,5 @@
 import asyncio
+import atexit
 import base64
 import gc
 import json
@@ -6,6 +7,7 @@ import os
 import re
 import shutil
 import subprocess
+import threading
 import time
 from contextlib import contextmanager
 from functools import wraps
@@ -13,8 +15,10 @@ from itertools import chain
 from multiprocessing import set_start_method
 from multiprocessing import cpu_count
 from multiprocessing import Pool
-from joblib import Parallel, delayed
+from joblib import Parallel, delayed, effective_n_jobs
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Tuple
 from typing import Union
@@ -28,6 +32,15 @@ from datetime import datetime
 from boto3.resources.factory import ServiceResource
 from botocore.exceptions import ClientError
 from loggers import configure_logging
+from pool_utils import TimedFunction
+from pool_utils import get_balanced_chunk_bounds
+from pool_utils import get_chunk_bounds
+from pool_utils import get_chunk_timings
+from pool_utils import get_text_costs
+from pool_utils import imap_bounded
+from pool_utils import log_chunk_timings
+from shared_memory_utils import OutputDtypes
+from shared_memory_utils import map_shared_memory
 from requests_aws4auth import AWS4Auth
 from opensearchpy import OpenSearch, RequestsHttpConnection, exceptions, helpers
 from opensearchpy.client import OpenSearch as OpenSearchClient
@@ -90,17 +103,124 @@ def timing(func: callable):
     return wrap
 
 
+# long-lived pool reused by parallelize (see get_managed_pool)
+_managed_pool = None
+_managed_pool_config = None
+_managed_pool_lock = threading.Lock()
+
+
+def get_managed_pool(n_jobs: int = -1, initializer: callable = None, initargs: Tuple = ()) -> Pool:
+    """
+    Returns long-lived multiprocessing pool shared by all calls with the same configuration. Workers are started
+    (and import their modules) only once, instead of once per call. A call with another configuration shuts the
+    previous pool down and starts a new one. The initializer and initargs other than scalars (arrays, DFs, matchers)
+    are compared by identity, so pass the same objects to reuse the pool. The pool is shut down at exit of the
+    interpreter
+    :param n_jobs: number of worker processes (-1 -> number of CPU cores)
+    :param initializer: function called once in every worker process when it starts (e.g. to load a model)
+    :param initargs: arguments of the initializer
+    :return: multiprocessing pool (do not close it, use shutdown_managed_pool)
+    """
+    global _managed_pool, _managed_pool_config
+
+    n_jobs = cpu_count() if n_jobs == -1 else n_jobs
+    # pools are not shared with forked child processes
+    config = (os.getpid(), n_jobs, initializer, tuple(initargs))
+
+    with _managed_pool_lock:
+        if _managed_pool is not None and _is_same_pool_config(_managed_pool_config, config):
+            return _managed_pool
+
+        if _managed_pool is not None and _managed_pool_config[0] == os.getpid():
+            _shutdown_pool(_managed_pool)
+
+        _logger.info("Starting managed pool with %d workers" % n_jobs)
+        _managed_pool = Pool(n_jobs, initializer=initializer, initargs=tuple(initargs))
+        _managed_pool_config = config
+        return _managed_pool
+
+
+def _is_same_pool_argument(argument, other) -> bool:
+    # initargs may hold numpy arrays / DFs, whose == is element-wise, so they are compared by identity
+    if argument is other:
+        return True
+    return type(argument) is type(other) and isinstance(argument, (str, bytes, int, float, bool)) and argument == other
+
+
+def _is_same_pool_config(config: Tuple, other: Tuple) -> bool:
+    """
+    Compares (pid, n_jobs, initializer, initargs) configurations of managed pools
+    """
+    pid, n_jobs, initializer, initargs = config
+    other_pid, other_n_jobs, other_initializer, other_initargs = other
+    return (pid == other_pid and n_jobs == other_n_jobs and initializer is other_initializer
+            and len(initargs) == len(other_initargs)
+            and all(_is_same_pool_argument(argument, other_argument)
+                    for argument, other_argument in zip(initargs, other_initargs)))
+
+
+def _shutdown_pool(pool: Pool) -> None:
+    try:
+        pool.close()
+        pool.join()
+    except Exception as e:
+        _logger.warning("Failed to shut the pool down cleanly (%s), terminating it" % e)
+        pool.terminate()
+
+
+def shutdown_managed_pool() -> None:
+    """
+    Shuts the managed pool down (waits for the running tasks), the next call of get_managed_pool starts a new one
+    """
+    global _managed_pool, _managed_pool_config
+
+    with _managed_pool_lock:
+        if _managed_pool is not None and _managed_pool_config[0] == os.getpid():
+            _logger.info("Shutting managed pool down")
+            _shutdown_pool(_managed_pool)
+        _managed_pool = None
+        _managed_pool_config = None
+
+
+atexit.register(shutdown_managed_pool)
+
+
 def parallelize(data, func: callable, n_data_chunks: int = -1, n_jobs: int = -1,
-                concat_ignore_idx: bool = False, copy: bool = False):
+                concat_ignore_idx: bool = False, copy: bool = False, reuse_pool: bool = True,
+                initializer: callable = None, initargs: Tuple = (), transport: str = 'pickle',
+                output_dtypes: OutputDtypes = None, balance: str = 'rows', cost: callable = None,
+                work_stealing: bool = False, log_chunk_times: bool = False):
     """
     This method applies any callable function to the input data using multiprocessing pool
     :param data: pd.DataFrame / pd.Series
     :param func: function to be mapped on data
     :param n_data_chunks: number of chunks to split data (e.g. number of parts one split pandas column). Normally, it
-                          should be smaller than n_jobs
+                          should be smaller than n_jobs (8 x n_jobs for work_stealing)
     :param n_jobs: number of threads to be used for running multiprocessing Pool
     :param concat_ignore_idx: if True -> ignore index when concatenating results into a single DF
     :param copy: if False -> do not copy data unnecessarily
+    :param reuse_pool: if True -> use the long-lived managed pool (see get_managed_pool), so that workers are started
+                       once for all calls, if False -> start and close a new pool for this call
+    :param initializer: function called once in every worker process when it starts
+    :param initargs: arguments of the initializer
+    :param transport: how chunks are passed to the workers:
+                      'pickle' -> chunks and results are pickled through pipes
+                      'shared_memory' -> columns are placed once in shared memory, workers receive only handles and
+                      row ranges of their chunks (data should be pd.DataFrame / pd.Series, see shared_memory_utils)
+    :param output_dtypes: with 'shared_memory' transport: numpy dtype of the values returned by func (pd.Series /
+                          np.ndarray / list of the chunk length), or dict {column: numpy dtype} of the columns of the
+                          DF returned by func. Workers write them into preallocated shared arrays instead of pickling
+                          the results back. Returns pd.Series with the index of data, or copy of data (DF) with the
+                          columns assigned
+    :param balance: how data is split into chunks:
+                    'rows' -> chunks of equal number of rows
+                    'cost' -> contiguous chunks of equal total cost, so long texts are spread over the workers
+                    (data should be pd.DataFrame / pd.Series)
+    :param cost: function returning cost of every row of data for balance='cost', e.g.
+                 lambda df: df['body'].str.len() (number of characters of string columns if None, see get_text_costs)
+    :param work_stealing: if True -> data is split into many small chunks (8 per worker by default), workers take
+                          the next chunk as soon as they finish one, so slow chunks do not keep the others idle
+    :param log_chunk_times: if True -> log rows, cost and time of every chunk and skew of chunk / worker times
     :return: processed data (e.g. pandas Series)
     """
     assert callable(func), "Argument func should be a callable function. Instead got %s" % type(func)
@@ -109,16 +229,63 @@ def parallelize(data, func: callable, n_data_chunks: int = -1, n_jobs: int = -1,
 
     assert isinstance(n_jobs, int), "Argument n_jobs of parallelize method should be int. " \
                                     "Instead provided %s" % type(n_jobs)
+    assert transport in ('pickle', 'shared_memory'), \
+        "Argument transport should be 'pickle' or 'shared_memory'. Instead got %s" % transport
+    assert output_dtypes is None or transport == 'shared_memory', \
+        "Argument output_dtypes is supported only by 'shared_memory' transport"
+    assert balance in ('rows', 'cost'), "Argument balance should be 'rows' or 'cost'. Instead got %s" % balance
 
-    n_data_chunks = cpu_count() if n_data_chunks == -1 else n_data_chunks  # number of CPU cores on your system
     n_jobs = cpu_count() if n_jobs == -1 else n_jobs  # number of CPU cores on your system
+    if n_data_chunks == -1:
+        n_data_chunks = 8 * n_jobs if work_stealing else cpu_count()  # number of CPU cores on your system
+
+    costs = None
+    if balance == 'cost' or (log_chunk_times and isinstance(data, (pd.DataFrame, pd.Series))):
+        costs = get_text_costs(data) if cost is None else np.asarray(cost(data), dtype=np.float64)
+    if balance == 'cost':
+        bounds = get_balanced_chunk_bounds(costs, n_data_chunks)
+        _logger.info("Balanced %d rows into %d chunks of equal cost" % (len(data), len(bounds)))
+    else:
+        bounds = get_chunk_bounds(len(data), n_data_chunks)
+
+    if transport == 'shared_memory':
+        _logger.info("Placing input data into shared memory, %d batches" % len(bounds))
+        batches = None
+    elif balance == 'cost':
+        batches = [data.iloc[start: stop] for start, stop in bounds]
+    else:
+        _logger.info("Splitting input data into %d batches" % n_data_chunks)
+        batches = np.array_split(data, n_data_chunks)
 
-    _logger.info("Splitting input data into %d batches" % n_data_chunks)
-    batches = np.array_split(data, n_data_chunks)
+    def map_batches(pool: Pool, batches: Union[List, None]):
+        # chunks are handed out one by one, so a worker that is done takes the next one
+        if batches is None:
+            return map_shared_memory(pool, data, func, bounds, output_dtypes=output_dtypes)
+        timed_results = pool.map(TimedFunction(func), batches, chunksize=1)
+        return [result for result, _, _ in timed_results], [(seconds, pid) for _, seconds, pid in timed_results]
 
     _logger.info("Starting parallel processing using %d CPU" % n_jobs)
-    pool = Pool(n_jobs)
-    results = pool.map(func, batches)
+    if reuse_pool:
+        results, timings = map_batches(get_managed_pool(n_jobs, initializer=initializer, initargs=initargs), batches)
+    else:
+        pool = Pool(n_jobs, initializer=initializer, initargs=tuple(initargs))
+        try:
+            results, timings = map_batches(pool, batches)
+        finally:
+            _shutdown_pool(pool)
+
+    if log_chunk_times:
+        log_chunk_timings(get_chunk_timings(bounds, timings, costs))
+
+    if output_dtypes is not None:
+        if not isinstance(output_dtypes, dict):
+            return pd.Series(results[None], index=data.index)
+        if not isinstance(data, pd.DataFrame):
+            return pd.DataFrame(results, index=data.index)
+        data = data.copy(deep=copy)
+        for column, values in results.items():
+            data[column] = values
+        return data
 
     if isinstance(results[0], pd.DataFrame) or isinstance(results[0], pd.Series):
         _logger.info("Concatenating results into single DF")
@@ -129,48 +296,150 @@ def parallelize(data, func: callable, n_data_chunks: int = -1, n_jobs: int = -1,
     else:
         pass
 
-    pool.close()
-    pool.join()
-
-    del pool, batches
+    del batches
     gc.collect()
 
     return results
 
 
-def parallelize_v2(data, func: callable, n_jobs: int = -1,
-                   concat_ignore_idx: bool = False, copy: bool = False):
+def parallelize_stream(chunks: Iterable, func: callable, n_jobs: int = -1, max_in_flight: int = None,
+                       ordered: bool = True, reuse_pool: bool = True, initializer: callable = None,
+                       initargs: Tuple = ()) -> Iterator:
+    """
+    Streaming counterpart of parallelize: applies func to chunks taken lazily from an iterator (e.g. batches read by
+    iter_record_batches) and yields the results one by one instead of concatenating them. Only max_in_flight chunks
+    are held at a time, so every result can be flushed (e.g. to Parquet / Postgres) as soon as it arrives and memory
+    does not grow with the number of chunks
+    :param chunks: iterable of chunks (e.g. pandas DFs)
+    :param func: function to be mapped on every chunk
+    :param n_jobs: number of worker processes (-1 -> number of CPU cores)
+    :param max_in_flight: maximum number of chunks being processed or waiting to be yielded (2 x n_jobs if None)
+    :param ordered: if True -> results are yielded in the order of the chunks, if False -> as soon as they are ready
+    :param reuse_pool: if True -> use the long-lived managed pool (see get_managed_pool), if False -> start a new pool
+                       that is closed when the generator is exhausted or closed
+    :param initializer: function called once in every worker process when it starts
+    :param initargs: arguments of the initializer
+    :return: iterator over results of the chunks
     """
-    This method applies any callable function to the input data using multiprocessing pool
-    :param data: pd.DataFrame / pd.Series
-    :param func: function to be mapped on data
-    :param n_jobs: number of threads to be used for running multiprocessing Pool
-    :param concat_ignore_idx: if True -> ignore index when concatenating results into a single DF
-    :param copy: if False -> do not copy data unnecessarily
-    :return: processed data (e.g. pandas Series)
+    assert callable(func), "Argument func should be a callable function. Instead got %s" % type(func)
+    assert isinstance(n_jobs, int), "Argument n_jobs of parallelize method should be int. " \
+                                    "Instead provided %s" % type(n_jobs)
+
+    n_jobs = cpu_count() if n_jobs == -1 else n_jobs
+    max_in_flight = 2 * n_jobs if max_in_flight is None else max_in_flight
+
+    _logger.info("Starting streaming parallel processing using %d CPU, at most %d chunks in flight" % (
+        n_jobs, max_in_flight))
+    if reuse_pool:
+        pool = get_managed_pool(n_jobs, initializer=initializer, initargs=initargs)
+        yield from imap_bounded(pool, func, chunks, max_in_flight=max_in_flight, ordered=ordered)
+        return
+
+    pool = Pool(n_jobs, initializer=initializer, initargs=tuple(initargs))
+    try:
+        yield from imap_bounded(pool, func, chunks, max_in_flight=max_in_flight, ordered=ordered)
+    finally:
+        _shutdown_pool(pool)
+
+
+def _apply_to_items(func: callable, items: List) -> List:
+    return [func(item) for item in items]
+
+
+def probe_item_cost(func: callable, items: List, probe_time: float = 0.05,
+                    max_probe_items: int = 1000) -> Tuple[List, float]:
     """
+    Applies func to the first items in the current process until probe_time is spent, to measure the cost per item
+    :param func: function to be mapped on items
+    :param items: list of items
+    :param probe_time: seconds to spend on probing
+    :param max_probe_items: maximum number of probed items
+    :return: results of the probed items and mean seconds per item
+    """
+    results = []
+    t0 = time.perf_counter()
+    elapsed = 0.
+    for item in items[:max_probe_items]:
+        results.append(func(item))
+        elapsed = time.perf_counter() - t0
+        if elapsed >= probe_time:
+            break
+    return results, elapsed / len(results) if results else 0.
+
 
-    # TODO: this does not work properly !!!!!!!!!!!!!
+def get_auto_batch_size(seconds_per_item: float, n_items: int, n_jobs: int, target_batch_time: float = 0.2,
+                        min_batches_per_job: int = 4) -> int:
+    """
+    Chooses number of items per batch, so that a batch takes about target_batch_time seconds, but every worker still
+    gets at least min_batches_per_job batches to balance the load
+    :param seconds_per_item: cost of one item (see probe_item_cost)
+    :param n_items: number of items to be processed
+    :param n_jobs: number of workers
+    :param target_batch_time: seconds per batch (long enough to amortize dispatching and pickling of a batch)
+    :param min_batches_per_job: minimal number of batches per worker
+    :return: batch size (at least 1)
+    """
+    max_batch_size = max(-(-n_items // (n_jobs * min_batches_per_job)), 1)
+    if seconds_per_item <= 0:
+        return max_batch_size
+    return int(min(max(target_batch_time / seconds_per_item, 1), max_batch_size))
 
+
+def parallelize_v2(data, func: callable, n_jobs: int = -1,
+                   concat_ignore_idx: bool = False, copy: bool = False, batch_size: Union[int, str] = 'auto',
+                   target_batch_time: float = 0.2, backend: str = 'loky'):
+    """
+    This method applies any callable function to every element of the input data using joblib workers. Elements are
+    grouped into batches, so that per-task overhead does not swamp cheap functions (e.g. crimemapper, base_filter).
+    With batch_size='auto' the cost per element is measured on the first elements in the current process (their
+    results are reused) and batches are sized to take about target_batch_time seconds
+    :param data: pd.Series / list of elements
+    :param func: function to be mapped on every element of data
+    :param n_jobs: number of worker processes (-1 -> number of CPU cores)
+    :param concat_ignore_idx: if True -> ignore index when concatenating results into a single DF
+    :param copy: if False -> do not copy data unnecessarily
+    :param batch_size: number of elements per task or 'auto'
+    :param target_batch_time: seconds per batch for batch_size='auto'
+    :param backend: joblib backend
+    :return: results in the order of data: pd.Series with the index of data for Series data; for list data single DF
+             if func returns DFs / Series, single list if func returns lists, list of results otherwise
+    """
     assert callable(func), "Argument func should be a callable function. Instead got %s" % type(func)
     assert isinstance(n_jobs, int), "Argument n_jobs of parallelize method should be int. " \
                                     "Instead provided %s" % type(n_jobs)
+    assert isinstance(data, (pd.Series, list, tuple, np.ndarray)), \
+        "Argument data should be pd.Series or list. Instead got %s" % type(data)
+    assert batch_size == 'auto' or (isinstance(batch_size, int) and batch_size > 0), \
+        "Argument batch_size should be positive int or 'auto'. Instead got %s" % batch_size
+
+    items = data.tolist() if isinstance(data, (pd.Series, np.ndarray)) else list(data)
+    n_jobs = effective_n_jobs(n_jobs)
+
+    if batch_size == 'auto':
+        results, seconds_per_item = probe_item_cost(func, items)
+        batch_size = get_auto_batch_size(seconds_per_item, len(items) - len(results), n_jobs,
+                                         target_batch_time=target_batch_time)
+        _logger.info("Measured %.3f ms per element on %d elements, using batches of %d elements" % (
+            seconds_per_item * 1000, len(results), batch_size))
+    else:
+        results = []
 
-    assert isinstance(n_jobs, int), "Argument n_jobs of parallelize method should be int. " \
-                                    "Instead provided %s" % type(n_jobs)
+    batches = [items[idx: idx + batch_size] for idx in range(len(results), len(items), batch_size)]
+    if batches:
+        _logger.info("Starting parallel processing of %d batches using %d CPU" % (len(batches), n_jobs))
+        with Parallel(n_jobs=n_jobs, backend=backend) as parallel:
+            batch_results = parallel(delayed(_apply_to_items)(func, batch) for batch in batches)
+        results.extend(chain.from_iterable(batch_results))
 
-    _logger.info("Starting parallel processing using %d CPU" % n_jobs)
-    with Parallel(n_jobs=n_jobs, prefer="processes") as parallel:
-        results = parallel(delayed(func)(entry) for entry in data)
+    if isinstance(data, pd.Series):
+        return pd.Series(results, index=data.index, name=data.name, dtype=None if results else object)
 
-    if isinstance(results[0], pd.DataFrame) or isinstance(results[0], pd.Series):
+    if results and (isinstance(results[0], pd.DataFrame) or isinstance(results[0], pd.Series)):
         _logger.info("Concatenating results into single DF")
         results = pd.concat(results, ignore_index=concat_ignore_idx, copy=copy)
-    elif isinstance(results[0], List):
+    elif results and isinstance(results[0], List):
         _logger.info("Concatenating results into single list")
         results = list(chain(*results))
-    else:
-        pass
 
     return results
 
@@ -0,0 +1,275 @@
+import argparse
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from retrie.retrie import Checklist
+
+from loggers import configure_logging
+
+# Setting logger
+logging = configure_logging()
+_logger = logging.getLogger("labeling-patterns-utils")
+
+# Compiles the supported subset of spaCy token patterns (labeling_patterns/*.jsonl) into regexes, so the patterns run
+# on raw texts without a spaCy pipeline. Tokens are approximated as runs of word characters or single punctuation
+# characters separated by optional whitespace, which is how spaCy's tokenizer splits most news texts. Supported:
+#   {"lower": "abuse"}, {"orth": "U.S."}, {"text": "-"}         - equality (lower is case-insensitive)
+#   {"lower": {"in": [...]}}, {"lower": {"not_in": [...]}}     - set membership
+#   {}                                                          - any token
+#   "op": "?" / "*" / "+"                                       - optional and repeated tokens
+# Patterns with other attributes (pos, lemma, ...), predicates or operators are reported as unsupported.
+
+SUPPORTED_ATTRIBUTES = ('lower', 'orth', 'text')
+SUPPORTED_OPERATORS = ('?', '*', '+')
+
+# any token: run of word characters or single punctuation character
+_ANY_TOKEN_REGEX = r"(?:(?<!\w)\w+(?!\w)|[^\w\s])"
+
+# placeholders of token separators in trie key words (whitespace required / optional)
+_SEPARATOR_REQUIRED = "\x00"
+_SEPARATOR_OPTIONAL = "\x01"
+
+
+class UnsupportedPatternError(ValueError):
+    pass
+
+
+def load_patterns(paths: Union[str, Sequence[str]]) -> List[Dict[str, Any]]:
+    """
+    Reads patterns files of spaCy EntityRuler / Prodigy
+    :param paths: path or list of paths to JSONL files with {"label", "pattern"} lines
+    :return: list of patterns
+    """
+    paths = [paths] if isinstance(paths, str) else paths
+    patterns = []
+    for path in paths:
+        with open(path, encoding='utf-8') as file:
+            patterns.extend(json.loads(line) for line in file if line.strip())
+    return patterns
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _value_regex(value: str) -> str:
+    """
+    :return: regex of the token text with word boundaries on its word character edges
+    """
+    regex = re.escape(value)
+    if _is_word_char(value[:1]):
+        regex = r"(?<!\w)" + regex
+    if _is_word_char(value[-1:]):
+        regex += r"(?!\w)"
+    return regex
+
+
+def compile_token(token: Dict[str, Any]) -> str:
+    """
+    Compiles single token pattern (without "op") into regex
+    :param token: spaCy token pattern, e.g. {"lower": {"not_in": ["child", "substance"]}}
+    :return: regex matching the token
+    """
+    constraints = {key.lower(): value for key, value in token.items() if key.lower() != 'op'}
+    if not constraints:
+        return _ANY_TOKEN_REGEX
+
+    unsupported = [key for key in constraints if key not in SUPPORTED_ATTRIBUTES]
+    if unsupported:
+        raise UnsupportedPatternError("unsupported token attributes %s" % unsupported)
+    if len(constraints) > 1:
+        raise UnsupportedPatternError("more than one attribute per token")
+
+    (attribute, value), = constraints.items()
+    case_insensitive = attribute == 'lower'
+
+    if isinstance(value, str):
+        if not value:
+            raise UnsupportedPatternError("empty token text")
+        regex = _value_regex(value)
+    elif isinstance(value, dict) and len(value) == 1 and next(iter(value)).lower() in ('in', 'not_in'):
+        (predicate, values), = value.items()
+        if not values or not all(isinstance(item, str) and item for item in values):
+            raise UnsupportedPatternError("predicate %s should have non-empty strings" % predicate)
+        alternatives = "|".join(_value_regex(item) for item in sorted(values, key=len, reverse=True))
+        if predicate.lower() == 'in':
+            regex = "(?:%s)" % alternatives
+        else:
+            # any token that is not exactly one of the values
+            regex = r"(?:(?<!\w)(?!(?:%s)(?!\w))\w+(?!\w)|(?!(?:%s))[^\w\s])" % (alternatives, alternatives)
+    else:
+        raise UnsupportedPatternError("unsupported value of '%s': %s" % (attribute, value))
+
+    return "(?i:%s)" % regex if case_insensitive else regex
+
+
+def compile_pattern(pattern: Union[str, List[Dict[str, Any]]]) -> str:
+    """
+    Compiles token pattern (or phrase pattern string) into regex
+    :param pattern: list of token patterns or phrase
+    :return: regex matching the same token sequences
+    """
+    if isinstance(pattern, str):
+        # phrase patterns match the exact text of their tokens
+        pattern = [{'orth': word} for word in re.findall(r"\w+|[^\w\s]", pattern)]
+    if not isinstance(pattern, list) or not pattern:
+        raise UnsupportedPatternError("pattern should be non-empty list of tokens")
+
+    tokens = []
+    for token in pattern:
+        if not isinstance(token, dict):
+            raise UnsupportedPatternError("token should be dict: %s" % token)
+        op = token.get('op', token.get('OP'))
+        if op is not None and op not in SUPPORTED_OPERATORS:
+            raise UnsupportedPatternError("unsupported operator '%s'" % op)
+        tokens.append((compile_token(token), op))
+
+    required = [idx for idx, (_, op) in enumerate(tokens) if op in (None, '+')]
+    if not required:
+        raise UnsupportedPatternError("pattern can match no tokens")
+
+    # separators are attached to the side of optional tokens facing the first required token
+    parts = []
+    for idx, (regex, op) in enumerate(tokens):
+        if idx < required[0]:
+            parts.append(r"(?:%s\s*)%s" % (regex, op))
+        elif idx == required[0]:
+            parts.append(regex if op is None else r"%s(?:\s*%s)*" % (regex, regex))
+        else:
+            parts.append(r"\s*" + regex if op is None else r"(?:\s*%s)%s" % (regex, op))
+    return "".join(parts)
+
+
+def _literal_key_word(pattern: Any) -> Optional[str]:
+    """
+    :return: key word for the trie if the pattern is a sequence of "lower" equalities starting and ending with word
+             characters (None otherwise)
+    """
+    if not isinstance(pattern, list) or not pattern:
+        return None
+    words = []
+    for token in pattern:
+        if not isinstance(token, dict) or len(token) != 1:
+            return None
+        (attribute, value), = token.items()
+        if attribute.lower() != 'lower' or not isinstance(value, str) or not value or re.search(r"\s", value):
+            return None
+        words.append(value.lower())
+
+    if not _is_word_char(words[0][0]) or not _is_word_char(words[-1][-1]):
+        return None
+
+    key_word = words[0]
+    for word in words[1:]:
+        both_words = _is_word_char(key_word[-1]) and _is_word_char(word[0])
+        key_word += (_SEPARATOR_REQUIRED if both_words else _SEPARATOR_OPTIONAL) + word
+    return key_word
+
+
+class PatternRegexMatcher:
+    """
+    Matches compiled labeling patterns without spaCy.
+
+    Patterns of each label are joined into one regex: plain "lower" sequences (the vast majority) go into a trie,
+    the rest are added as alternatives. Every label regex is wrapped in a zero-width lookahead, so matches starting
+    at every position are found, like spaCy's Matcher does.
+    """
+
+    def __init__(self, patterns: Sequence[Dict[str, Any]]):
+        """
+        :param patterns: supported patterns with "label" and "pattern" (see compile_patterns)
+        """
+        key_words = {}
+        regexes = {}
+        for pattern in patterns:
+            key_word = _literal_key_word(pattern['pattern'])
+            if key_word is not None:
+                key_words.setdefault(pattern['label'], []).append(key_word)
+            else:
+                regexes.setdefault(pattern['label'], []).append(compile_pattern(pattern['pattern']))
+
+        self.labels = list(dict.fromkeys(pattern['label'] for pattern in patterns))
+        self.regexes = {}
+        for label in self.labels:
+            alternatives = list(dict.fromkeys(regexes.get(label, [])))
+            if key_words.get(label):
+                trie = Checklist(list(dict.fromkeys(key_words[label])), match_substrings=True, re_flags=0).pattern()
+                trie = trie.replace(_SEPARATOR_REQUIRED, r"\s+").replace(_SEPARATOR_OPTIONAL, r"\s*")
+                alternatives.insert(0, r"(?i:(?<!\w)%s(?!\w))" % trie)
+            self.regexes[label] = re.compile(r"(?=(%s))" % "|".join(alternatives))
+
+    def find_labels(self, text: str) -> List[str]:
+        """
+        :return: labels having at least one match in the text
+        """
+        return [label for label, regex in self.regexes.items() if regex.search(text)]
+
+    def find_matches(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Finds a match of every label starting at every position of the text
+        :return: list of (start, end, label) sorted by start
+        """
+        matches = []
+        for label, regex in self.regexes.items():
+            for match in regex.finditer(text):
+                if match.end(1) > match.start(1):
+                    matches.append((match.start(1), match.end(1), label))
+        matches.sort()
+        return matches
+
+    def find_spans(self, text: str, labels: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Finds pattern spans in Prodigy's "spans" format. Overlaps are resolved the same way as by spaCy's EntityRuler
+        (spacy.util.filter_spans): longer spans win, then earlier ones
+        :param text: text to scan
+        :param labels: keep only spans with these labels (all spans if None)
+        :return: list of {"start", "end", "label"} dicts sorted by start
+        """
+        matches = [match for match in self.find_matches(text) if labels is None or match[2] in labels]
+
+        spans = []
+        taken = []
+        for start, end, label in sorted(matches, key=lambda match: (match[0] - match[1], match[0])):
+            if all(end <= taken_start or start >= taken_end for taken_start, taken_end in taken):
+                spans.append({'start': start, 'end': end, 'label': label})
+                taken.append((start, end))
+        spans.sort(key=lambda span: span['start'])
+        return spans
+
+
+def compile_patterns(patterns: Iterable[Dict[str, Any]]) -> Tuple[PatternRegexMatcher, List[Tuple[Dict, str]]]:
+    """
+    Compiles supported labeling patterns into PatternRegexMatcher
+    :param patterns: patterns with "label" and "pattern" (see load_patterns)
+    :return: matcher of the supported patterns and list of (pattern, reason) for the patterns that were skipped
+    """
+    supported = []
+    unsupported = []
+    for pattern in patterns:
+        try:
+            compile_pattern(pattern.get('pattern'))
+        except UnsupportedPatternError as e:
+            unsupported.append((pattern, str(e)))
+            continue
+        supported.append(pattern)
+
+    if unsupported:
+        _logger.warning("%d of %d patterns are not supported and were skipped" %
+                        (len(unsupported), len(supported) + len(unsupported)))
+    return PatternRegexMatcher(supported), unsupported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report labeling patterns the regex compiler does not support")
+    parser.add_argument('paths', nargs='+', help="JSONL files with patterns")
+    args = parser.parse_args()
+
+    matcher, unsupported = compile_patterns(load_patterns(args.paths))
+    _logger.info("Compiled patterns of labels %s" % matcher.labels)
+    for pattern, reason in unsupported:
+        _logger.info("Unsupported (%s): %s" % (reason, json.dumps(pattern, ensure_ascii=False)))
+
+
+if __name__ == '__main__':
+    main()
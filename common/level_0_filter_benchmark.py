@@ -0,0 +1,423 @@
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+import level_0_filter_key_words as fltr
+from level_0_filter_utils import base_filter, base_filter_for_dataframe, find_keywords_for_dataframe, profile_categories
+from loggers import configure_logging
+
+# Setting logger
+logging = configure_logging()
+_logger = logging.getLogger("level-0-filter-benchmark")
+
+ENTRY_POINTS = ('base_filter', 'base_filter_for_dataframe', 'find_keywords_for_dataframe')
+# synthetic documents are generated in pure Python, larger corpora are better sampled from a file (--corpus-path)
+CORPUS_SIZES = (1000, 10000, 100000)
+# number of words of the synthetic documents
+DOCUMENT_LENGTHS = {'short': (20, 60), 'long': (400, 1200)}
+
+_FILLER_WORDS = (
+    "the a an of to in on at for with by from and or but was were is are has had have said says told police "
+    "officers man woman people city county state court local news report reported according year years week "
+    "day monday tuesday wednesday thursday friday saturday sunday morning evening night street road home house "
+    "car vehicle family friends community school children officials department statement investigation after "
+    "before during while about more than new public area near two three first last"
+).split()
+_PUNCTUATION = ('', '', '', '', ',', '.', '.', '"', "'s", '(', ')', ':', '!', '?')
+
+
+def get_peak_rss_mb() -> float:
+    """
+    Returns peak resident set size of the current process in MB (None if it can not be measured on the platform).
+    It is the peak over the whole life of the process, so every benchmark case is run in its own process (see
+    run_benchmarks)
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, 'peak_wset', memory_info.rss) / 1024 ** 2
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak_rss / 1024 ** 2 if sys.platform == 'darwin' else peak_rss / 1024
+
+
+def generate_synthetic_corpus(n_docs: int, length: str = 'short', key_word_ratio: float = 0.02,
+                              seed: int = 0) -> List[str]:
+    """
+    Generates news-like documents made of filler words, punctuation and key words of all categories
+    :param n_docs: number of documents
+    :param length: 'short' or 'long' (see DOCUMENT_LENGTHS)
+    :param key_word_ratio: probability of every word to be a key word
+    :param seed: random seed, the same seed gives the same corpus
+    :return: list of documents
+    """
+    assert length in DOCUMENT_LENGTHS, "Argument length should be one of %s. Instead got '%s'" % (
+        list(DOCUMENT_LENGTHS), length)
+
+    rng = random.Random(seed)
+    key_words = [key_word for key_words in fltr.all_key_words_list for key_word in key_words]
+    min_words, max_words = DOCUMENT_LENGTHS[length]
+
+    documents = []
+    for _ in range(n_docs):
+        words = []
+        for _ in range(rng.randint(min_words, max_words)):
+            if rng.random() < key_word_ratio:
+                word = rng.choice(key_words)
+                word = word.capitalize() if rng.random() < 0.3 else word
+            else:
+                word = rng.choice(_FILLER_WORDS)
+            words.append(word + rng.choice(_PUNCTUATION))
+        documents.append(" ".join(words))
+
+    return documents
+
+
+def sample_corpus(path: str, n_docs: int, text_column: str = 'text', seed: int = 0) -> List[str]:
+    """
+    Samples documents from a JSONL / CSV / Parquet corpus. Documents are repeated if the corpus is smaller than n_docs
+    :param path: path to the corpus
+    :param n_docs: number of documents
+    :param text_column: name of the column with texts
+    :param seed: random seed
+    :return: list of documents
+    """
+    from level_0_filter_runner import iter_record_batches
+
+    texts = []
+    for batch in iter_record_batches(path, columns=[text_column]):
+        texts.extend(text for text in batch[text_column] if isinstance(text, str))
+    assert texts, "No texts found in column '%s' of %s" % (text_column, path)
+
+    rng = random.Random(seed)
+    if len(texts) >= n_docs:
+        return rng.sample(texts, n_docs)
+    return [rng.choice(texts) for _ in range(n_docs)]
+
+
+def _run_base_filter(texts: List[str]) -> None:
+    for text in texts:
+        base_filter(text)
+
+
+def _run_base_filter_for_dataframe(texts: List[str]) -> None:
+    base_filter_for_dataframe(pd.DataFrame({'text': texts}))
+
+
+def _run_find_keywords_for_dataframe(texts: List[str]) -> None:
+    find_keywords_for_dataframe(pd.DataFrame({'text': texts}))
+
+
+_ENTRY_POINT_FUNCTIONS = {
+    'base_filter': _run_base_filter,
+    'base_filter_for_dataframe': _run_base_filter_for_dataframe,
+    'find_keywords_for_dataframe': _run_find_keywords_for_dataframe,
+}
+
+
+def benchmark_entry_point(entry_point: str, texts: List[str], batch_size: int = 1000) -> Dict[str, Any]:
+    """
+    Runs an entry point over the corpus and measures its throughput and latency
+    :param entry_point: one of ENTRY_POINTS
+    :param texts: corpus
+    :param batch_size: number of documents per DataFrame call (base_filter is timed per document)
+    :return: dict with docs/sec, MB/sec, peak RSS and latency percentiles in ms (per document for base_filter,
+             per batch for DataFrame entry points)
+    """
+    assert entry_point in ENTRY_POINTS, "Argument entry_point should be one of %s. Instead got '%s'" % (
+        ENTRY_POINTS, entry_point)
+
+    run = _ENTRY_POINT_FUNCTIONS[entry_point]
+    call_size = 1 if entry_point == 'base_filter' else batch_size
+    n_chars = sum(len(text) for text in texts)
+
+    latencies = np.empty((len(texts) + call_size - 1) // call_size, dtype=np.float64)
+    t0 = time.perf_counter()
+    for idx, start in enumerate(range(0, len(texts), call_size)):
+        t_call = time.perf_counter()
+        run(texts[start: start + call_size])
+        latencies[idx] = time.perf_counter() - t_call
+    elapsed = time.perf_counter() - t0
+
+    percentiles = np.percentile(latencies * 1000, [50, 90, 99]) if len(latencies) else [0., 0., 0.]
+    return {
+        'entry_point': entry_point,
+        'n_docs': len(texts),
+        'mb': n_chars / 1024 ** 2,
+        'call_size': call_size,
+        'elapsed_sec': elapsed,
+        'docs_per_sec': len(texts) / elapsed if elapsed else 0.,
+        'mb_per_sec': n_chars / 1024 ** 2 / elapsed if elapsed else 0.,
+        'latency_ms_p50': float(percentiles[0]),
+        'latency_ms_p90': float(percentiles[1]),
+        'latency_ms_p99': float(percentiles[2]),
+        'latency_ms_max': float(latencies.max() * 1000) if len(latencies) else 0.,
+        'peak_rss_mb': get_peak_rss_mb(),
+    }
+
+
+def _benchmark_entry_point_in_process(args: tuple) -> Dict[str, Any]:
+    entry_point, texts_path, batch_size = args
+    with open(texts_path, 'rb') as file:
+        texts = pickle.load(file)
+    fltr.build_all()
+
+    rss_before = get_peak_rss_mb()
+    result = benchmark_entry_point(entry_point, texts, batch_size=batch_size)
+    result['rss_before_mb'] = rss_before
+    return result
+
+
+def benchmark_entry_point_isolated(entry_point: str, texts_path: str, batch_size: int = 1000) -> Dict[str, Any]:
+    """
+    Runs benchmark_entry_point in a new process, so that its peak RSS does not include the peaks of previous cases
+    :param entry_point: one of ENTRY_POINTS
+    :param texts_path: path to the pickled corpus
+    :param batch_size: number of documents per DataFrame call
+    :return: dict of benchmark_entry_point with 'rss_before_mb' - peak RSS of the process with the loaded corpus and
+             matcher before the entry point is run
+    """
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(_benchmark_entry_point_in_process, ((entry_point, texts_path, batch_size),))
+
+
+def run_benchmarks(sizes: List[int] = CORPUS_SIZES, lengths: List[str] = ('short', 'long'),
+                   entry_points: List[str] = ENTRY_POINTS, corpus_path: str = None, text_column: str = 'text',
+                   batch_size: int = 1000, seed: int = 0, isolate: bool = True) -> Dict[str, Any]:
+    """
+    Runs every entry point over corpora of every size and document length
+    :param sizes: numbers of documents
+    :param lengths: lengths of synthetic documents (see DOCUMENT_LENGTHS)
+    :param entry_points: entry points to benchmark (see ENTRY_POINTS)
+    :param corpus_path: path to a JSONL / CSV / Parquet corpus to sample documents from (synthetic corpora if None,
+                        lengths are then ignored)
+    :param text_column: name of the column with texts in the corpus
+    :param batch_size: number of documents per DataFrame call
+    :param seed: random seed of corpus generation / sampling
+    :param isolate: if True -> every entry point is run in its own process, so that its peak RSS is measured
+                    separately (otherwise the peak RSS of a case is the maximum over all previous cases)
+    :return: dict with environment info, key words version and list of results
+    """
+    # matcher is built before timing, so results do not depend on the state of the pattern cache
+    t0 = time.perf_counter()
+    fltr.build_all()
+    build_time = time.perf_counter() - t0
+
+    results = []
+    corpora = [('sampled', size) for size in sizes] if corpus_path else [
+        (length, size) for length in lengths for size in sizes]
+
+    for corpus, size in corpora:
+        if corpus_path:
+            texts = sample_corpus(corpus_path, size, text_column=text_column, seed=seed)
+        else:
+            texts = generate_synthetic_corpus(size, length=corpus, seed=seed)
+
+        texts_path = None
+        if isolate:
+            with tempfile.NamedTemporaryFile('wb', suffix='.pkl', delete=False) as file:
+                pickle.dump(texts, file)
+                texts_path = file.name
+
+        try:
+            for entry_point in entry_points:
+                if isolate:
+                    result = benchmark_entry_point_isolated(entry_point, texts_path, batch_size=batch_size)
+                else:
+                    result = benchmark_entry_point(entry_point, texts, batch_size=batch_size)
+                result['corpus'] = corpus
+                results.append(result)
+                _logger.info("%s on %d %s docs: %.0f docs/sec, %.2f MB/sec, p50 %.3f ms, p99 %.3f ms, "
+                             "peak RSS %s MB" % (entry_point, size, corpus, result['docs_per_sec'],
+                                                 result['mb_per_sec'], result['latency_ms_p50'],
+                                                 result['latency_ms_p99'], result['peak_rss_mb']))
+        finally:
+            if texts_path is not None:
+                os.remove(texts_path)
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'key_words_version': fltr.KEY_WORDS_MATCHER.version,
+        'n_key_words': len(fltr.KEY_WORDS_MATCHER.vocabulary_key_words),
+        'build_sec': build_time,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus_path': corpus_path,
+        'batch_size': batch_size,
+        'seed': seed,
+        'isolated': isolate,
+        'results': results,
+    }
+
+
+def _base_filter_chunk(texts: pd.Series) -> pd.Series:
+    return texts.map(base_filter)
+
+
+def benchmark_parallel_maps(texts: List[str], n_jobs: int = -1, n_data_chunks: int = -1) -> pd.DataFrame:
+    """
+    Compares throughput of base_filter mapped over the corpus sequentially, with parallelize (chunks of a Series of
+    equal number of rows / of equal number of characters with work stealing) and with parallelize_v2 (auto-sized
+    batches of elements). Chunk times of parallelize are logged to show their skew
+    :param texts: corpus
+    :param n_jobs: number of worker processes (-1 -> number of CPU cores)
+    :param n_data_chunks: number of chunks of parallelize (-1 -> number of CPU cores)
+    :return: pandas DF with elapsed seconds, docs/sec and agreement with the sequential results of every map
+    """
+    from generic_utils import parallelize, parallelize_v2
+
+    series = pd.Series(texts)
+    maps = {
+        'sequential': lambda: series.map(base_filter),
+        'parallelize': lambda: parallelize(series, _base_filter_chunk, n_data_chunks=n_data_chunks, n_jobs=n_jobs,
+                                           log_chunk_times=True),
+        'parallelize_balanced': lambda: parallelize(series, _base_filter_chunk, n_jobs=n_jobs, balance='cost',
+                                                    work_stealing=True, log_chunk_times=True),
+        'parallelize_v2': lambda: parallelize_v2(series, base_filter, n_jobs=n_jobs),
+    }
+
+    rows = []
+    expected = None
+    for name, run in maps.items():
+        t0 = time.perf_counter()
+        labels = run()
+        elapsed = time.perf_counter() - t0
+        expected = labels if expected is None else expected
+        rows.append({'map': name, 'n_docs': len(texts), 'elapsed_sec': elapsed,
+                     'docs_per_sec': len(texts) / elapsed if elapsed else 0.,
+                     'matches_sequential': bool(labels.equals(expected))})
+    return pd.DataFrame(rows)
+
+
+def save_benchmark_results(report: Dict[str, Any], output_path: str) -> None:
+    """
+    Saves report returned by run_benchmarks as JSON
+    """
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    _logger.info("Benchmark results saved to %s" % output_path)
+
+
+def compare_benchmark_results(baseline_path: str, current_path: str) -> pd.DataFrame:
+    """
+    Compares two saved reports, e.g. of two key word list revisions
+    :param baseline_path: path to the baseline report
+    :param current_path: path to the current report
+    :return: pandas DF with docs/sec of both reports and their ratio for every entry point / corpus / size
+    """
+    keys = ['entry_point', 'corpus', 'n_docs']
+    reports = []
+    for path in (baseline_path, current_path):
+        with open(path, encoding='utf-8') as file:
+            reports.append(pd.DataFrame(json.load(file)['results'])[keys + ['docs_per_sec']])
+
+    df = reports[0].merge(reports[1], on=keys, suffixes=('_baseline', '_current'))
+    df['speedup'] = df['docs_per_sec_current'] / df['docs_per_sec_baseline']
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark level-0 filter entry points")
+    parser.add_argument('--output-path', default='level_0_filter_benchmark.json', help="path to the JSON report")
+    parser.add_argument('--sizes', type=int, nargs='*', default=list(CORPUS_SIZES), help="numbers of documents")
+    parser.add_argument('--lengths', nargs='*', default=list(DOCUMENT_LENGTHS), choices=list(DOCUMENT_LENGTHS),
+                        help="lengths of synthetic documents")
+    parser.add_argument('--entry-points', nargs='*', default=list(ENTRY_POINTS), choices=list(ENTRY_POINTS),
+                        help="entry points to benchmark")
+    parser.add_argument('--corpus-path', default=None, help="JSONL / CSV / Parquet corpus to sample documents from")
+    parser.add_argument('--text-column', default='text', help="name of the column with texts")
+    parser.add_argument('--batch-size', type=int, default=1000, help="number of documents per DataFrame call")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    parser.add_argument('--no-isolate', action='store_true',
+                        help="run all entry points in this process (faster, but peak RSS is cumulative)")
+    parser.add_argument('--baseline-path', default=None, help="JSON report to compare the results with")
+    parser.add_argument('--profile-categories', action='store_true',
+                        help="profile per-category cost of the matcher over the largest corpus instead of "
+                             "benchmarking entry points")
+    parser.add_argument('--marginal', action='store_true',
+                        help="with --profile-categories: also measure the time saved by dropping every category")
+    parser.add_argument('--parallel-maps', action='store_true',
+                        help="compare sequential, parallelize and parallelize_v2 maps of base_filter over the largest "
+                             "corpus of all lengths instead of benchmarking entry points")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="number of worker processes of --parallel-maps")
+    args = parser.parse_args()
+
+    if args.parallel_maps:
+        size = max(args.sizes)
+        if args.corpus_path:
+            texts = sample_corpus(args.corpus_path, size, text_column=args.text_column, seed=args.seed)
+        else:
+            # documents of all lengths, grouped by length, as in a corpus sorted by source
+            texts = [text for length in args.lengths
+                     for text in generate_synthetic_corpus(size // len(args.lengths), length=length, seed=args.seed)]
+        comparison = benchmark_parallel_maps(texts, n_jobs=args.n_jobs)
+        report = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'key_words_version': fltr.KEY_WORDS_MATCHER.version,
+            'corpus_path': args.corpus_path,
+            'n_jobs': args.n_jobs,
+            'parallel_maps': comparison.to_dict(orient='records'),
+        }
+        _logger.info("Parallel maps of base_filter:\n%s" % comparison.to_string())
+        save_benchmark_results(report, args.output_path)
+        return
+
+    if args.profile_categories:
+        size = max(args.sizes)
+        if args.corpus_path:
+            texts = sample_corpus(args.corpus_path, size, text_column=args.text_column, seed=args.seed)
+        else:
+            texts = [text for length in args.lengths
+                     for text in generate_synthetic_corpus(size, length=length, seed=args.seed)]
+        profile = profile_categories(texts, marginal=args.marginal)
+        report = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'key_words_version': fltr.KEY_WORDS_MATCHER.version,
+            'n_docs': len(texts),
+            'corpus_path': args.corpus_path,
+            'marginal': args.marginal,
+            'ranked_by': 'marginal_sec' if args.marginal else 'attributed_time_sec',
+            # attributed time is split between the categories by their matches, it ranks how often a category
+            # matches and is not a cost measurement (see --marginal)
+            'profile': profile.to_dict(orient='records'),
+        }
+        if args.marginal:
+            _logger.info("Categories of the matcher ranked by marginal cost:\n%s" % profile.to_string())
+        else:
+            _logger.info("Categories of the matcher ranked by attributed time (not a cost measurement, use --marginal "
+                         "for the cost of every category):\n%s" % profile.to_string())
+        save_benchmark_results(report, args.output_path)
+        return
+
+    report = run_benchmarks(sizes=args.sizes, lengths=args.lengths, entry_points=args.entry_points,
+                            corpus_path=args.corpus_path, text_column=args.text_column,
+                            batch_size=args.batch_size, seed=args.seed, isolate=not args.no_isolate)
+    save_benchmark_results(report, args.output_path)
+
+    if args.baseline_path:
+        _logger.info("Comparison with %s:\n%s" % (
+            args.baseline_path, compare_benchmark_results(args.baseline_path, args.output_path).to_string()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,635 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import sys
+import tempfile
+import threading
+import time
+from re import Pattern
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import retrie
+from retrie.retrie import Checklist
+
+_logger = logging.getLogger("level-0-filter-matcher")
+
+RELEVANT_LABEL = "RELEVANT"
+NOT_RELEVANT_LABEL = "NOT_RELEVANT"
+
+# Directory of the on-disk cache of built patterns / matchers. Set LEVEL_0_FILTER_CACHE_DIR to "" to disable the cache
+PATTERN_CACHE_DIR = os.environ.get(
+    'LEVEL_0_FILTER_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'news_classifier', 'level_0_filter'))
+# Bump when the layout of cached objects changes
+PATTERN_CACHE_FORMAT_VERSION = 2
+
+
+class KeywordMatcher:
+    """
+    Single-pass matcher for the level-0 filter key word categories.
+
+    All key words of all categories are compiled into one trie regex wrapped in a zero-width lookahead, so a text is
+    scanned once and every word-bounded occurrence of every key word is found (overlapping ones included). Hits per
+    category (category_mask / label) are the same as running each category regex separately. Matched key words per
+    category are leftmost-longest: where a category regex stopped at the first alternative of its list matching at a
+    position (e.g. 'firefighters' before 'firefighters battled the fire'), the matcher takes the longest key word.
+    """
+
+    def __init__(self, categories_names: Sequence[str], key_words_list: Sequence[Sequence[str]],
+                 relevant_categories_names: Sequence[str], re_flags: int = re.IGNORECASE):
+        """
+        :param categories_names: names of all categories (relevant and not relevant)
+        :param key_words_list: list of key words for each category in categories_names
+        :param relevant_categories_names: names of categories which make the text relevant
+        :param re_flags: flags used to compile the regex
+        """
+        assert len(categories_names) == len(key_words_list), "Each category should have its own list of key words"
+        assert len(categories_names) <= 64, "Category bit masks are limited to 64 categories"
+
+        self.categories_names = list(categories_names)
+        self.key_words_list = [list(key_words) for key_words in key_words_list]
+        self.relevant_mask = 0
+        self.not_relevant_mask = 0
+        for idx, category in enumerate(self.categories_names):
+            if category in relevant_categories_names:
+                self.relevant_mask |= 1 << idx
+            else:
+                self.not_relevant_mask |= 1 << idx
+
+        # unique (lower-cased) key words and bit mask of categories each of them belongs to
+        key_words_masks = {}
+        for idx, key_words in enumerate(self.key_words_list):
+            for key_word in key_words:
+                key_word = key_word.lower()
+                key_words_masks[key_word] = key_words_masks.get(key_word, 0) | (1 << idx)
+
+        self.key_words = list(key_words_masks.keys())
+        self.key_words_ids = {key_word: idx for idx, key_word in enumerate(self.key_words)}
+        self.key_words_masks = [key_words_masks[key_word] for key_word in self.key_words]
+        self.key_words_categories = [tuple(idx for idx in range(len(self.categories_names)) if mask >> idx & 1)
+                                     for mask in self.key_words_masks]
+
+        # one vocabulary column per key word of every category, in the order of key_words_list
+        self.vocabulary_key_words = []
+        self.vocabulary_categories = []
+        self.vocabulary_ids = {}
+        for idx, key_words in enumerate(self.key_words_list):
+            for key_word in key_words:
+                self.vocabulary_ids.setdefault((idx, key_word.lower()), len(self.vocabulary_key_words))
+                self.vocabulary_key_words.append(key_word)
+                self.vocabulary_categories.append(idx)
+
+        # a key word matched at some position implies a match of all its key word prefixes ending on a word boundary
+        self.key_words_prefixes = [self._find_prefixes(key_word) for key_word in self.key_words]
+        self.match_masks = []
+        for prefixes in self.key_words_prefixes:
+            mask = 0
+            for idx in prefixes:
+                mask |= self.key_words_masks[idx]
+            self.match_masks.append(mask)
+
+        # version of the key word set, e.g. to invalidate results cached with other key words
+        self.version = compute_key_words_version(self.categories_names, self.key_words_list,
+                                                 relevant_categories_names, re_flags)
+
+        trie_pattern = Checklist(self.key_words, match_substrings=False, re_flags=re_flags).pattern()
+        self.regex = re.compile(r"\b(?=(" + trie_pattern + r")\b)", re_flags)
+
+    def _find_prefixes(self, key_word: str) -> Tuple[int, ...]:
+        """
+        Finds ids of the key words (the key word itself included) which match whenever the given key word matches.
+        These are the key words which are prefixes of the given one ending on a word boundary
+        :param key_word: lower-cased key word
+        :return: ids of the key words sorted from the longest to the shortest
+        """
+        prefixes = []
+        for end in range(len(key_word), 0, -1):
+            prefix = key_word[:end]
+            if prefix not in self.key_words_ids:
+                continue
+            if end < len(key_word) and _is_word_char(prefix[-1]) == _is_word_char(key_word[end]):
+                continue
+            prefixes.append(self.key_words_ids[prefix])
+        return tuple(prefixes)
+
+    def find_occurrences(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        Finds all word-bounded occurrences of all key words in the text, including overlapping ones
+        :param text: text to scan
+        :return: list of (start, end, key word id) sorted by start and then from the longest to the shortest
+        """
+        occurrences = []
+        for match in self.regex.finditer(text):
+            key_word_id = self.key_words_ids.get(match.group(1).lower())
+            if key_word_id is None:
+                continue
+            start = match.start()
+            for idx in self.key_words_prefixes[key_word_id]:
+                occurrences.append((start, start + len(self.key_words[idx]), idx))
+        return occurrences
+
+    def category_mask(self, text: str) -> int:
+        """
+        Scans the text once and returns bit mask of the categories having at least one key word in the text
+        :param text: text to scan
+        :return: bit mask where bit i is set if category i was hit
+        """
+        mask = 0
+        for match in self.regex.finditer(text):
+            key_word_id = self.key_words_ids.get(match.group(1).lower())
+            if key_word_id is not None:
+                mask |= self.match_masks[key_word_id]
+        return mask
+
+    def label(self, text: str) -> str:
+        """
+        Labels the text as RELEVANT if it has relevant key words and does not have not-relevant ones. The scan stops
+        as soon as a not-relevant key word is found
+        :param text: text to scan
+        :return: RELEVANT / NOT_RELEVANT
+        """
+        mask = 0
+        for match in self.regex.finditer(text):
+            key_word_id = self.key_words_ids.get(match.group(1).lower())
+            if key_word_id is None:
+                continue
+            mask |= self.match_masks[key_word_id]
+            if mask & self.not_relevant_mask:
+                return NOT_RELEVANT_LABEL
+        return self.label_from_mask(mask)
+
+    def label_from_mask(self, mask: int) -> str:
+        if mask & self.relevant_mask and not mask & self.not_relevant_mask:
+            return RELEVANT_LABEL
+        return NOT_RELEVANT_LABEL
+
+    def find_category_offsets(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        Finds key words of every category in the text: non-overlapping, leftmost-longest matches of each category.
+        Unlike regex.finditer(text) of the category regex, which takes the first alternative in the order of the key
+        word list, the longest key word matching at a position is taken
+        :param text: text to scan
+        :return: list of (category index, start, end) in the order of the matches in the text
+        """
+        offsets = []
+        next_free = {}
+
+        for match in self.regex.finditer(text):
+            key_word_id = self.key_words_ids.get(match.group(1).lower())
+            if key_word_id is None:
+                continue
+            start = match.start()
+            for idx in self.key_words_prefixes[key_word_id]:
+                end = start + len(self.key_words[idx])
+                for category_idx in self.key_words_categories[idx]:
+                    if start >= next_free.get(category_idx, 0):
+                        offsets.append((category_idx, start, end))
+                        next_free[category_idx] = end
+
+        return offsets
+
+    def find_category_matches(self, text: str) -> List[Tuple[int, str]]:
+        """
+        Finds key words of every category in the text (see find_category_offsets for how they differ from
+        regex.findall(text) of each category regex)
+        :param text: text to scan
+        :return: list of (category index, matched text) in the order of the matches in the text
+        """
+        return [(category_idx, text[start:end].strip())
+                for category_idx, start, end in self.find_category_offsets(text)]
+
+    def find_spans(self, text: str, label_by: str = 'category', labels: Optional[Sequence[str]] = None,
+                   resolve_overlaps: bool = True,
+                   offsets: Optional[List[Tuple[int, int, int]]] = None) -> List[Dict[str, Any]]:
+        """
+        Finds key word spans in Prodigy's "spans" format. Offsets refer to the scanned text, so the text should be
+        normalized without changing its length (e.g. punctuation replaced by spaces, no lower-casing)
+        :param text: text to scan
+        :param label_by: 'category' -> span label is the upper-cased category name (e.g. AUTO_THEFT),
+                         'relevance' -> span label is RELEVANT / NOT_RELEVANT
+        :param labels: keep only spans with these labels (all spans if None)
+        :param resolve_overlaps: if True -> keep only the leftmost-longest of overlapping spans, as Prodigy can not
+                                 highlight overlapping spans
+        :param offsets: result of find_category_offsets(text) if it was already computed
+        :return: list of {"start", "end", "label", "keyword"} dicts sorted by start
+        """
+        assert label_by in ('category', 'relevance'), \
+            "Argument label_by should be 'category' or 'relevance'. Instead got '%s'" % label_by
+
+        offsets = self.find_category_offsets(text) if offsets is None else offsets
+
+        spans = []
+        for category_idx, start, end in offsets:
+            if label_by == 'category':
+                label = self.categories_names[category_idx].upper()
+            else:
+                label = RELEVANT_LABEL if self.relevant_mask >> category_idx & 1 else NOT_RELEVANT_LABEL
+            if labels is not None and label not in labels:
+                continue
+            spans.append({'start': start, 'end': end, 'label': label, 'keyword': text[start:end].strip().lower()})
+
+        # stable sort keeps the order of categories for spans with equal offsets
+        spans.sort(key=lambda span: (span['start'], -span['end']))
+        if not resolve_overlaps:
+            return spans
+
+        resolved = []
+        for span in spans:
+            if not resolved or span['start'] >= resolved[-1]['end']:
+                resolved.append(span)
+        return resolved
+
+    def find_key_words(self, text: str, unique: bool = True) -> List[List[str]]:
+        """
+        Finds key words of every category in the text, sorted (see find_category_offsets for how they differ from
+        sorted(regex.findall(text)) of each category regex)
+        :param text: text to scan
+        :param unique: if True -> keep only distinct key words found in each category
+        :return: list of found key words for each category
+        """
+        found = {}
+        for category_idx, key_word in self.find_category_matches(text):
+            found.setdefault(category_idx, []).append(key_word)
+
+        results = []
+        for category_idx in range(len(self.categories_names)):
+            key_words = found.get(category_idx)
+            if not key_words:
+                results.append([])
+            elif unique:
+                results.append(sorted(set(key_words)))
+            else:
+                results.append(sorted(key_words))
+        return results
+
+    def count_key_words(self, matches: List[Tuple[int, str]], unique: bool = True) -> Dict[int, int]:
+        """
+        Counts key words per vocabulary column (see vocabulary_key_words)
+        :param matches: matches returned by find_category_matches
+        :param unique: if True -> count each distinct key word once
+        :return: dict {vocabulary column: count}
+        """
+        counts = {}
+        for category_idx, key_word in matches:
+            column = self.vocabulary_ids.get((category_idx, key_word.lower()))
+            if column is not None:
+                counts[column] = 1 if unique else counts.get(column, 0) + 1
+        return counts
+
+    def categories_from_mask(self, mask: int) -> List[str]:
+        return [name for idx, name in enumerate(self.categories_names) if mask >> idx & 1]
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def compute_key_words_version(categories_names: Sequence[str], key_words_list: Sequence[Sequence[str]],
+                              relevant_categories_names: Sequence[str], re_flags: int = re.IGNORECASE) -> str:
+    """
+    Computes version of the key word set (KeywordMatcher.version) without building the matcher
+    """
+    return hashlib.sha256(json.dumps(
+        [list(categories_names), [list(key_words) for key_words in key_words_list], list(relevant_categories_names),
+         int(re_flags)], ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+##############################
+#   ON-DISK PATTERN CACHE    #
+##############################
+
+def compute_cache_key(*key_parts: Any) -> str:
+    """
+    Computes hash of JSON-serializable key parts (e.g. key word lists and regex flags). The cache format version, the
+    retrie version and the python version are included, so cached objects built by other versions are not reused
+    :param key_parts: JSON-serializable objects the cached object is built from
+    :return: hex digest
+    """
+    versions = [PATTERN_CACHE_FORMAT_VERSION, getattr(retrie, '__version__', None), sys.version_info[:2]]
+    payload = json.dumps([versions, *key_parts], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_or_build(name: str, key: str, build: Callable[[], Any], cache_dir: Optional[str] = None) -> Any:
+    """
+    Loads a pickled object from the cache directory or builds it and stores it there. Any change of the key (e.g. an
+    edited key word list) points to another file, so stale objects are never loaded
+    :param name: prefix of the cache file name
+    :param key: hash of everything the object is built from (see compute_cache_key)
+    :param build: function building the object on cache miss
+    :param cache_dir: cache directory (PATTERN_CACHE_DIR if None, no caching if empty)
+    :return: the object
+    """
+    cache_dir = PATTERN_CACHE_DIR if cache_dir is None else cache_dir
+    if not cache_dir:
+        return build()
+
+    path = os.path.join(cache_dir, "%s_%s.pkl" % (name, key[:32]))
+    try:
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        _logger.warning("Failed to load cached '%s' (%s), rebuilding" % (path, e))
+
+    obj = build()
+
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # write to a temporary file first, so that concurrent readers never see a partially written file
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump(obj, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        _logger.warning("Failed to cache '%s' (%s)" % (path, e))
+        if tmp_path is not None and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    return obj
+
+
+def load_or_build_word_regex(word_array: Sequence[str], re_flags: int = re.IGNORECASE,
+                             cache_dir: Optional[str] = None) -> Pattern:
+    """
+    Builds retrie regex matching any of the words on word boundaries, caching the trie pattern on disk. Compiled
+    regexes can not be serialized, so only the trie construction is skipped on cache hit
+    :param word_array: list of words
+    :param re_flags: flags used to compile the regex
+    :param cache_dir: cache directory (PATTERN_CACHE_DIR if None, no caching if empty)
+    :return: compiled regex
+    """
+    def build() -> str:
+        return Checklist(word_array, match_substrings=False, re_flags=re_flags).compiled.pattern
+
+    key = compute_cache_key(list(word_array), int(re_flags))
+    return re.compile(load_or_build('word_regex', key, build, cache_dir), re_flags)
+
+
+def load_or_build_matcher(categories_names: Sequence[str], key_words_list: Sequence[Sequence[str]],
+                          relevant_categories_names: Sequence[str], re_flags: int = re.IGNORECASE,
+                          cache_dir: Optional[str] = None) -> KeywordMatcher:
+    """
+    Builds KeywordMatcher or loads it from the on-disk cache (keyed by the hash of the key word lists and flags)
+    :param categories_names: names of all categories (relevant and not relevant)
+    :param key_words_list: list of key words for each category in categories_names
+    :param relevant_categories_names: names of categories which make the text relevant
+    :param re_flags: flags used to compile the regex
+    :param cache_dir: cache directory (PATTERN_CACHE_DIR if None, no caching if empty)
+    :return: matcher
+    """
+    def build() -> KeywordMatcher:
+        return KeywordMatcher(categories_names, key_words_list, relevant_categories_names, re_flags=re_flags)
+
+    key = compute_cache_key(list(categories_names), [list(key_words) for key_words in key_words_list],
+                            list(relevant_categories_names), int(re_flags))
+    return load_or_build('matcher', key, build, cache_dir)
+
+
+##############################
+#   VERSIONED KEY WORDS FILE #
+##############################
+
+def load_key_words_file(path: str) -> Dict[str, Any]:
+    """
+    Loads key words file: {"version": ..., "categories": [{"name": ..., "relevant": ..., "key_words": [...]}, ...]}
+    :param path: path to the JSON file
+    :return: content of the file
+    """
+    with open(path, encoding='utf-8') as file:
+        key_words = json.load(file)
+
+    assert 'version' in key_words, "Key words file %s should have 'version'" % path
+    assert key_words.get('categories'), "Key words file %s should have non-empty 'categories'" % path
+    for category in key_words['categories']:
+        assert isinstance(category.get('name'), str) and isinstance(category.get('relevant'), bool) \
+            and isinstance(category.get('key_words'), list), "Invalid category in %s: %s" % (path, category)
+    return key_words
+
+
+def get_changed_categories(old_key_words: Optional[Dict[str, Any]], new_key_words: Dict[str, Any]) -> List[str]:
+    """
+    :return: names of the categories which were added, removed or changed (key words or relevance)
+    """
+    old_categories = {category['name']: category for category in (old_key_words or {}).get('categories', [])}
+    new_categories = {category['name']: category for category in new_key_words['categories']}
+    return [name for name in dict.fromkeys([*old_categories, *new_categories])
+            if old_categories.get(name) != new_categories.get(name)]
+
+
+def get_matcher_arguments(key_words: Dict[str, Any]) -> Tuple[List[str], List[List[str]], List[str]]:
+    """
+    Arranges categories of a key words file for KeywordMatcher: relevant categories go first, then not relevant ones
+    (the layout of level_0_filter_key_words.all_key_words_list)
+    :return: categories names, key words list and relevant categories names
+    """
+    categories = [category for category in key_words['categories'] if category['relevant']] + \
+                 [category for category in key_words['categories'] if not category['relevant']]
+    return ([category['name'] for category in categories], [category['key_words'] for category in categories],
+            [category['name'] for category in categories if category['relevant']])
+
+
+def load_or_build_matcher_from_key_words(key_words: Dict[str, Any], re_flags: int = re.IGNORECASE,
+                                         cache_dir: Optional[str] = None) -> KeywordMatcher:
+    """
+    Builds KeywordMatcher of the content of a key words file (see load_or_build_matcher)
+    """
+    return load_or_build_matcher(*get_matcher_arguments(key_words), re_flags=re_flags, cache_dir=cache_dir)
+
+
+class KeyWordsWatcher:
+    """
+    Watches versioned key words file and swaps in a new matcher when the file changes, so long-running processes
+    pick up new key words without a restart.
+
+    The file is checked at most once per poll_interval seconds (by modification time and size). The new matcher is
+    built completely before it replaces the old one, so readers of the matcher attribute always see a consistent key
+    word set. A file which can not be loaded (e.g. while it is being edited) is ignored until the next change.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 5.0, matcher: Optional[KeywordMatcher] = None,
+                 re_flags: int = re.IGNORECASE):
+        """
+        :param path: path to the key words file (see load_key_words_file)
+        :param poll_interval: minimal number of seconds between checks of the file
+        :param matcher: already built matcher of the file (reused if its version matches the file)
+        :param re_flags: flags used to compile the regex
+        """
+        self.path = path
+        self.poll_interval = poll_interval
+        self.re_flags = re_flags
+        self.listeners = []
+
+        self._lock = threading.Lock()
+        self._stat = self._get_stat()
+        self._last_poll = time.monotonic()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+        self.key_words = load_key_words_file(path)
+        self._matcher = matcher if matcher is not None and matcher.version == self.matcher_version() else None
+
+    def _get_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def matcher_version(self, key_words: Optional[Dict[str, Any]] = None) -> str:
+        """
+        :return: version of the matcher of the key words (the current ones if None)
+        """
+        return compute_key_words_version(*get_matcher_arguments(self.key_words if key_words is None else key_words),
+                                         re_flags=self.re_flags)
+
+    @property
+    def matcher(self) -> KeywordMatcher:
+        """
+        Matcher of the current key words (built on first access)
+        """
+        matcher = self._matcher
+        if matcher is None:
+            with self._lock:
+                if self._matcher is None:
+                    self._matcher = load_or_build_matcher_from_key_words(self.key_words, re_flags=self.re_flags)
+                matcher = self._matcher
+        return matcher
+
+    def add_listener(self, listener: Callable[[Dict[str, Any], List[str]], None]) -> None:
+        """
+        Registers function called with the new key words and the names of the changed categories after every swap
+        """
+        self.listeners.append(listener)
+
+    def poll(self, force: bool = False) -> List[str]:
+        """
+        Reloads the key words if the file has changed since the last check
+        :param force: if True -> check the file even if poll_interval has not passed yet
+        :return: names of the changed categories (empty list if nothing has changed)
+        """
+        now = time.monotonic()
+        if not force and now - self._last_poll < self.poll_interval:
+            return []
+        self._last_poll = now
+
+        stat = self._get_stat()
+        if stat is None or stat == self._stat:
+            return []
+
+        try:
+            key_words = load_key_words_file(self.path)
+        except Exception as e:
+            _logger.warning("Failed to load key words file '%s' (%s), keeping version %s" %
+                            (self.path, e, self.key_words['version']))
+            return []
+
+        self._stat = stat
+        changed = get_changed_categories(self.key_words, key_words)
+        if not changed:
+            self.key_words = key_words
+            return []
+
+        # the new matcher is built before the swap (only if the old one was used)
+        matcher = load_or_build_matcher_from_key_words(key_words, re_flags=self.re_flags) \
+            if self._matcher is not None else None
+        with self._lock:
+            old_version = self.key_words['version']
+            self.key_words, self._matcher = key_words, matcher
+
+        _logger.info("Key words updated from version %s to %s, changed categories: %s" %
+                     (old_version, key_words['version'], changed))
+        for listener in self.listeners:
+            listener(key_words, changed)
+        return changed
+
+    def start(self) -> None:
+        """
+        Starts daemon thread polling the file every poll_interval seconds (e.g. in a serving process)
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.wait(self.poll_interval):
+                try:
+                    self.poll(force=True)
+                except Exception as e:
+                    _logger.warning("Failed to reload key words file '%s' (%s)" % (self.path, e))
+
+        self._thread = threading.Thread(target=run, name='key-words-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+
+##############################
+#   WORKER PROCESSES         #
+##############################
+
+# matcher and text normalizer set once per worker process by init_worker_matcher
+_worker_matcher = None
+_worker_normalizer = None
+_worker_watcher = None
+
+
+def init_worker_matcher(matcher: KeywordMatcher, normalizer: Callable[[str], str],
+                        key_words_path: Optional[str] = None, poll_interval: float = 5.0) -> None:
+    """
+    Pool initializer: stores the pre-built matcher in the worker process, so that the worker does not import the key
+    words module and does not rebuild the key word tries
+    :param matcher: pre-built matcher (pickled once per worker by the pool)
+    :param normalizer: text normalizer applied before matching (e.g. level_0_filter_key_words.TEXT_NORMALIZER)
+    :param key_words_path: key words file the worker watches and reloads the matcher from (no reloads if None)
+    :param poll_interval: minimal number of seconds between checks of the key words file
+    """
+    global _worker_matcher, _worker_normalizer, _worker_watcher
+    _worker_matcher = matcher
+    _worker_normalizer = normalizer
+    _worker_watcher = KeyWordsWatcher(key_words_path, poll_interval, matcher=matcher) if key_words_path else None
+
+
+def get_worker_matcher() -> Optional[KeywordMatcher]:
+    """
+    Returns the matcher set by init_worker_matcher (reloaded first if the worker watches the key words file)
+    :return: the matcher (None outside of the workers initialized by init_worker_matcher)
+    """
+    global _worker_matcher
+    if _worker_watcher is not None:
+        _worker_watcher.poll()
+        _worker_matcher = _worker_watcher.matcher
+    return _worker_matcher
+
+
+def label_texts_in_worker(texts: List[str]) -> List[Optional[str]]:
+    """
+    Labels a batch of texts with the matcher set by init_worker_matcher (the same as base_filter)
+    :param texts: batch of texts
+    :return: RELEVANT / NOT_RELEVANT for every text (None for non-string values)
+    """
+    matcher = get_worker_matcher()
+    return [matcher.label(_worker_normalizer(text)) if isinstance(text, str) else None for text in texts]
+
+
+def category_masks_in_worker(texts: List[str]) -> Tuple[str, List[int]]:
+    """
+    Computes category bit masks for a batch of texts with the matcher set by init_worker_matcher
+    :param texts: batch of texts
+    :return: version of the matcher (workers watching the key words file may reload it at other times than the main
+             process) and category bit mask for every text (0 for non-string values)
+    """
+    matcher = get_worker_matcher()
+    return matcher.version, [matcher.category_mask(_worker_normalizer(text)) if isinstance(text, str) else 0
+                             for text in texts]
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# cached result of a text: category bit mask and (optionally) list of (category index, key word) matches
+CachedResult = Tuple[int, Optional[List[Tuple[int, str]]]]
+
+# SQLite limits the number of host parameters of a single query
+_MAX_QUERY_PARAMS = 900
+
+
+class FilterResultCache:
+    """
+    Persistent cache of level-0 filter results keyed by hash of the normalized text and the key word set version.
+
+    Results are stored in a SQLite file, so the cache survives between runs and can be shared by several jobs on the
+    same machine. When the number of entries exceeds max_entries the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, version: str, max_entries: int = 5000000, evict_ratio: float = 0.1):
+        """
+        :param path: path to the SQLite file (created if it does not exist)
+        :param version: version of the key word set and normalization the results depend on
+        :param max_entries: maximum number of cached texts
+        :param evict_ratio: share of max_entries evicted at once when the cache is full
+        """
+        assert max_entries > 0, "Argument max_entries should be positive. Instead got %s" % max_entries
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries
+        self.evict_ratio = evict_ratio
+        self.n_hits = 0
+        self.n_misses = 0
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key BLOB PRIMARY KEY, mask INTEGER NOT NULL, matches TEXT, last_used REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self._conn.commit()
+        self._n_entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def text_key(self, text: str) -> bytes:
+        """
+        Computes cache key of a normalized text
+        """
+        return hashlib.blake2b((self.version + '\0' + text).encode('utf-8'), digest_size=16).digest()
+
+    def get_many(self, keys: Iterable[bytes], need_matches: bool = False) -> Dict[bytes, CachedResult]:
+        """
+        Looks up cached results
+        :param keys: cache keys (see text_key)
+        :param need_matches: if True -> entries cached without matches are treated as misses
+        :return: dict {key: (category bit mask, matches or None)} for keys found in the cache
+        """
+        keys = list(keys)
+        found = {}
+
+        for idx in range(0, len(keys), _MAX_QUERY_PARAMS):
+            chunk = keys[idx: idx + _MAX_QUERY_PARAMS]
+            query = "SELECT key, mask, matches FROM results WHERE key IN (%s)" % ",".join("?" * len(chunk))
+            for key, mask, matches in self._conn.execute(query, chunk):
+                if matches is not None:
+                    found[key] = (mask, [tuple(match) for match in json.loads(matches)])
+                elif not need_matches:
+                    found[key] = (mask, None)
+
+        if found:
+            now = time.time()
+            hit_keys = list(found.keys())
+            for idx in range(0, len(hit_keys), _MAX_QUERY_PARAMS):
+                chunk = hit_keys[idx: idx + _MAX_QUERY_PARAMS]
+                self._conn.execute("UPDATE results SET last_used = ? WHERE key IN (%s)" % ",".join("?" * len(chunk)),
+                                   [now, *chunk])
+            self._conn.commit()
+
+        self.n_hits += len(found)
+        self.n_misses += len(keys) - len(found)
+
+        return found
+
+    def put_many(self, results: Dict[bytes, CachedResult]) -> None:
+        """
+        Stores results in the cache and evicts the least recently used entries if the cache is full
+        :param results: dict {key: (category bit mask, matches or None)}
+        """
+        if not results:
+            return
+
+        now = time.time()
+        rows = [(key, mask, json.dumps(matches, ensure_ascii=False) if matches is not None else None, now)
+                for key, (mask, matches) in results.items()]
+        self._conn.executemany("INSERT OR REPLACE INTO results (key, mask, matches, last_used) VALUES (?, ?, ?, ?)",
+                               rows)
+        self._conn.commit()
+
+        self._n_entries += len(rows)
+        if self._n_entries > self.max_entries:
+            self._n_entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            if self._n_entries > self.max_entries:
+                self.evict(self._n_entries - self.max_entries + int(self.max_entries * self.evict_ratio))
+
+    def evict(self, n_entries: int) -> None:
+        """
+        Deletes n_entries least recently used entries
+        """
+        self._conn.execute(
+            "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used LIMIT ?)", (n_entries,))
+        self._conn.commit()
+        self._n_entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._n_entries
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
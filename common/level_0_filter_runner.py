@@ -0,0 +1,293 @@
+import argparse
+import os
+import time
+from itertools import chain
+from multiprocessing import cpu_count
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Union
+
+import pandas as pd
+
+import level_0_filter_key_words as fltr
+from level_0_filter_matcher import init_worker_matcher, label_texts_in_worker
+from level_0_filter_result_cache import FilterResultCache
+from level_0_filter_utils import base_filter, match_texts, normalize_text_for_dataframe, open_result_cache
+from loggers import configure_logging
+
+# Setting logger
+logging = configure_logging()
+_logger = logging.getLogger("level-0-filter-runner")
+
+SUPPORTED_FORMATS = ('jsonl', 'csv', 'parquet')
+
+
+def get_file_format(path: str) -> str:
+    """
+    Infers file format from the file extension
+    :param path: path to the file
+    :return: one of SUPPORTED_FORMATS
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    file_format = 'jsonl' if extension in ('json', 'jsonl', 'ndjson') else extension
+    assert file_format in SUPPORTED_FORMATS, "File format should be one of %s. Instead got '%s'" % (
+        SUPPORTED_FORMATS, extension)
+    return file_format
+
+
+def iter_record_batches(path: str, batch_size: int = 10000, columns: List[str] = None,
+                        encoding: str = 'utf-8', dtype: Union[str, Dict[str, str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Reads JSONL / CSV / Parquet file in fixed-size batches of records without loading the whole file into memory.
+    Types of JSONL / CSV columns are not inferred per batch (it would turn ids like '00005' into 5 and give a column
+    different types in different batches): JSONL values keep their JSON types, CSV values are read as strings
+    :param path: path to the input file
+    :param batch_size: number of records per batch
+    :param columns: columns to read (all columns if None)
+    :param encoding: encoding of JSONL / CSV files
+    :param dtype: dtype / dict {column: dtype} of JSONL / CSV columns (see above if None)
+    :return: iterator over pandas DFs
+    """
+    file_format = get_file_format(path)
+
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for record_batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield record_batch.to_pandas()
+
+    elif file_format == 'csv':
+        with pd.read_csv(path, chunksize=batch_size, usecols=columns, encoding=encoding,
+                         dtype=str if dtype is None else dtype) as reader:
+            for batch in reader:
+                yield batch
+
+    else:
+        with pd.read_json(path, lines=True, chunksize=batch_size, encoding=encoding,
+                          dtype=False if dtype is None else dtype, convert_dates=False) as reader:
+            for batch in reader:
+                yield batch[columns] if columns else batch
+
+
+class BatchWriter:
+    """
+    Writes pandas DFs to a JSONL / CSV / Parquet file batch by batch
+    """
+
+    def __init__(self, path: str, encoding: str = 'utf-8', schema=None):
+        """
+        :param path: path to the output file
+        :param encoding: encoding of JSONL / CSV files
+        :param schema: pyarrow schema of Parquet files. If None -> schema of the first batch, where columns that are
+                       all-null in the first batch are written as strings. Later batches are cast to the schema
+        """
+        self.path = path
+        self.encoding = encoding
+        self.schema = schema
+        self.file_format = get_file_format(path)
+        self._file = None
+        self._parquet_writer = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.file_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                if self.schema is None:
+                    self.schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                             for field in table.schema], metadata=table.schema.metadata)
+                self._parquet_writer = pq.ParquetWriter(self.path, self.schema)
+            if not table.schema.equals(self.schema):
+                # types inferred from a batch differ e.g. for columns that are all-null in it
+                table = table.select(self.schema.names).cast(self.schema)
+            self._parquet_writer.write_table(table)
+
+        elif self.file_format == 'csv':
+            is_first_batch = self._file is None
+            if is_first_batch:
+                self._file = open(self.path, 'w', encoding=self.encoding, newline='')
+            df.to_csv(self._file, header=is_first_batch, index=False)
+
+        else:
+            if self._file is None:
+                self._file = open(self.path, 'w', encoding=self.encoding)
+            if not df.empty:
+                self._file.write(df.to_json(orient='records', lines=True, force_ascii=False).rstrip('\n') + '\n')
+
+    def close(self) -> None:
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def create_filter_pool(n_jobs: int = -1, watch_key_words: bool = False) -> Pool:
+    """
+    Creates multiprocessing pool whose workers are initialized once with the pre-built key words matcher, so that
+    afterwards they receive only batches of texts
+    :param n_jobs: number of worker processes (-1 -> number of CPU cores)
+    :param watch_key_words: if True -> workers reload the matcher when the key words file changes
+    :return: multiprocessing pool (to be closed by the caller)
+    """
+    n_jobs = cpu_count() if n_jobs == -1 else n_jobs
+    _logger.info("Starting filter pool with %d workers" % n_jobs)
+    key_words_path = fltr.KEY_WORDS_PATH if watch_key_words else None
+    return Pool(n_jobs, initializer=init_worker_matcher,
+                initargs=(fltr.KEY_WORDS_MATCHER, fltr.TEXT_NORMALIZER, key_words_path,
+                          fltr.KEY_WORDS_WATCHER.poll_interval))
+
+
+def parallel_base_filter(texts: Union[pd.Series, List[str]], pool: Pool = None, n_jobs: int = -1,
+                         batch_size: int = 1000) -> List[str]:
+    """
+    Applies base filter to texts using worker processes with pre-built matchers
+    :param texts: pandas Series / list with texts
+    :param pool: pool created by create_filter_pool (a temporary pool with n_jobs workers is used if None)
+    :param n_jobs: number of worker processes for the temporary pool
+    :param batch_size: number of texts sent to a worker at once
+    :return: RELEVANT / NOT_RELEVANT for every text (None for non-string values), in the order of texts
+    """
+    texts = list(texts)
+    batches = [texts[idx: idx + batch_size] for idx in range(0, len(texts), batch_size)]
+
+    if pool is not None:
+        return list(chain(*pool.imap(label_texts_in_worker, batches)))
+
+    with create_filter_pool(n_jobs) as temporary_pool:
+        return list(chain(*temporary_pool.imap(label_texts_in_worker, batches)))
+
+
+def cached_base_filter(texts: pd.Series, cache: FilterResultCache, pool: Pool = None,
+                       batch_size: int = 1000) -> List[str]:
+    """
+    Applies base filter to texts, looking up the results of already seen texts in the persistent cache
+    :param texts: pandas Series with texts
+    :param cache: cache opened by open_result_cache
+    :param pool: pool created by create_filter_pool to label the texts missing in the cache in (the current process
+                 if None)
+    :param batch_size: number of texts sent to a worker at once
+    :return: RELEVANT / NOT_RELEVANT for every text (None for non-string values), in the order of texts
+    """
+    matcher = fltr.KEY_WORDS_MATCHER
+    masks, _ = match_texts(normalize_text_for_dataframe(texts), cache=cache, pool=pool, batch_size=batch_size)
+    return [matcher.label_from_mask(mask) if isinstance(text, str) else None for text, mask in zip(texts, masks)]
+
+
+def run_base_filter_stream(input_path: str, output_path: str, text_column: str = 'text', batch_size: int = 10000,
+                           columns: List[str] = None, only_relevant: bool = False, encoding: str = 'utf-8',
+                           log_every: int = 1, n_jobs: int = 1,
+                           worker_batch_size: int = 1000, cache_path: str = None,
+                           cache_max_entries: int = 5000000,
+                           watch_key_words: bool = False) -> Dict[str, Union[int, float]]:
+    """
+    Applies base filter to a corpus batch by batch and writes labeled records incrementally, so memory usage does
+    not depend on the size of the corpus
+    :param input_path: path to JSONL / CSV / Parquet file with texts
+    :param output_path: path to JSONL / CSV / Parquet file to write labeled records to
+    :param text_column: name of the column with texts
+    :param batch_size: number of records per batch
+    :param columns: columns to read and keep in the output (all columns if None)
+    :param only_relevant: if True -> write only RELEVANT records
+    :param encoding: encoding of JSONL / CSV files
+    :param log_every: log progress every log_every batches
+    :param n_jobs: number of worker processes used to label each batch (1 -> label in the current process). With the
+                   cache only the texts missing in it are sent to the workers
+    :param worker_batch_size: number of texts sent to a worker at once
+    :param cache_path: path to the SQLite file of the persistent result cache (no cache if None). Texts seen in
+                       previous runs with the same key words are not matched again
+    :param cache_max_entries: maximum number of cached texts
+    :param watch_key_words: if True -> key words are reloaded between batches when the key words file changes
+    :return: dict with number of processed docs, number of RELEVANT docs, RELEVANT ratio, elapsed time and docs/sec
+    """
+    if columns is not None and text_column not in columns:
+        columns = [*columns, text_column]
+
+    n_docs = 0
+    n_relevant = 0
+    n_chars = 0
+    cache = open_result_cache(cache_path, max_entries=cache_max_entries) if cache_path else None
+    pool = create_filter_pool(n_jobs, watch_key_words=watch_key_words) if n_jobs != 1 else None
+    t0 = time.perf_counter()
+
+    try:
+        with BatchWriter(output_path, encoding=encoding) as writer:
+            for batch_idx, batch in enumerate(iter_record_batches(input_path, batch_size, columns, encoding)):
+                if watch_key_words:
+                    fltr.poll_key_words()
+                if cache is not None:
+                    batch['base_filter'] = cached_base_filter(batch[text_column], cache, pool=pool,
+                                                              batch_size=worker_batch_size)
+                elif pool is None:
+                    batch['base_filter'] = batch[text_column].map(base_filter)
+                else:
+                    batch['base_filter'] = parallel_base_filter(batch[text_column], pool=pool,
+                                                                batch_size=worker_batch_size)
+                batch['base_filter_int'] = (batch['base_filter'] == "RELEVANT").astype(int)
+
+                n_docs += batch.shape[0]
+                n_relevant += int(batch['base_filter_int'].sum())
+                n_chars += sum(len(text) for text in batch[text_column] if isinstance(text, str))
+
+                writer.write(batch[batch['base_filter_int'] == 1] if only_relevant else batch)
+
+                if (batch_idx + 1) % log_every == 0:
+                    elapsed = max(time.perf_counter() - t0, 1e-9)
+                    _logger.info("Processed %d docs - %.0f docs/sec, %.2f MB/sec, RELEVANT ratio %.4f" % (
+                        n_docs, n_docs / elapsed, n_chars / 1024 ** 2 / elapsed, n_relevant / max(n_docs, 1)))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if cache is not None:
+            _logger.info("Result cache: %d hits, %d misses, %d entries" % (cache.n_hits, cache.n_misses, len(cache)))
+            cache.close()
+
+    elapsed = time.perf_counter() - t0
+    summary = {
+        'n_docs': n_docs,
+        'n_relevant': n_relevant,
+        'relevant_ratio': n_relevant / max(n_docs, 1),
+        'elapsed_sec': elapsed,
+        'docs_per_sec': n_docs / elapsed if elapsed else 0.
+    }
+    _logger.info("Done: %s" % summary)
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply level-0 base filter to a JSONL / CSV / Parquet corpus")
+    parser.add_argument('input_path', help="path to JSONL / CSV / Parquet file with texts")
+    parser.add_argument('output_path', help="path to JSONL / CSV / Parquet file to write labeled records to")
+    parser.add_argument('--text-column', default='text', help="name of the column with texts")
+    parser.add_argument('--batch-size', type=int, default=10000, help="number of records per batch")
+    parser.add_argument('--columns', nargs='*', default=None, help="columns to keep in the output")
+    parser.add_argument('--only-relevant', action='store_true', help="write only RELEVANT records")
+    parser.add_argument('--encoding', default='utf-8', help="encoding of JSONL / CSV files")
+    parser.add_argument('--log-every', type=int, default=1, help="log progress every N batches")
+    parser.add_argument('--n-jobs', type=int, default=1, help="number of worker processes (-1 -> all CPU cores)")
+    parser.add_argument('--cache-path', default=None, help="path to the SQLite file of the persistent result cache")
+    parser.add_argument('--cache-max-entries', type=int, default=5000000, help="maximum number of cached texts")
+    parser.add_argument('--watch-key-words', action='store_true',
+                        help="reload key words between batches when the key words file changes")
+    args = parser.parse_args()
+
+    run_base_filter_stream(args.input_path, args.output_path, text_column=args.text_column,
+                           batch_size=args.batch_size, columns=args.columns, only_relevant=args.only_relevant,
+                           encoding=args.encoding, log_every=args.log_every,
+                           n_jobs=args.n_jobs, cache_path=args.cache_path,
+                           cache_max_entries=args.cache_max_entries, watch_key_words=args.watch_key_words)
+
+
+if __name__ == '__main__':
+    main()
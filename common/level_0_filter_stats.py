@@ -0,0 +1,278 @@
+import argparse
+import os
+from multiprocessing import cpu_count
+from typing import Iterable, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import level_0_filter_key_words as fltr
+from level_0_filter_matcher import NOT_RELEVANT_LABEL, RELEVANT_LABEL, get_worker_matcher
+from level_0_filter_result_cache import FilterResultCache
+from level_0_filter_runner import BatchWriter, create_filter_pool, iter_record_batches
+from level_0_filter_utils import category_counts_from_matrix, find_keywords_matrix, get_key_words_vocabulary
+from loggers import configure_logging
+from pool_utils import imap_bounded
+
+# Setting logger
+logging = configure_logging()
+_logger = logging.getLogger("level-0-filter-stats")
+
+LABELS = (RELEVANT_LABEL, NOT_RELEVANT_LABEL)
+
+
+class KeyWordStats:
+    """
+    Mergeable key word statistics of a corpus, broken down by RELEVANT / NOT_RELEVANT label of the documents:
+    number of documents, document frequency and total frequency of every key word (columns of the key words matrix,
+    see get_key_words_vocabulary) and number of documents where two key words occur together.
+
+    Statistics of separate batches (e.g. computed by different worker processes) are combined with merge, so a corpus
+    is aggregated batch by batch without keeping it in memory.
+    """
+
+    def __init__(self, version: str, n_key_words: int):
+        """
+        :param version: version of the key word set (see KeywordMatcher.version)
+        :param n_key_words: number of columns of the key words matrix
+        """
+        self.version = version
+        self.n_key_words = n_key_words
+        self.n_docs = np.zeros(len(LABELS), dtype=np.int64)
+        self.doc_freq = np.zeros((len(LABELS), n_key_words), dtype=np.int64)
+        self.total_freq = np.zeros((len(LABELS), n_key_words), dtype=np.int64)
+        self.cooccurrence = [sparse.csr_matrix((n_key_words, n_key_words), dtype=np.int64) for _ in LABELS]
+
+    def update(self, key_words_matrix: sparse.csr_matrix, labels: np.ndarray) -> None:
+        """
+        Adds statistics of a batch of documents
+        :param key_words_matrix: sparse (n_docs x n_key_words) matrix of key word counts (see find_keywords_matrix
+                                 with unique=False)
+        :param labels: index of the label (in LABELS) of every document
+        """
+        assert key_words_matrix.shape[1] == self.n_key_words, \
+            "Argument key_words_matrix should have %d columns. Instead got %d" % (self.n_key_words,
+                                                                                  key_words_matrix.shape[1])
+
+        for label_idx in range(len(LABELS)):
+            rows = np.flatnonzero(labels == label_idx)
+            if not rows.shape[0]:
+                continue
+            counts = key_words_matrix[rows].astype(np.int64)
+            occurrences = (counts > 0).astype(np.int64)
+
+            self.n_docs[label_idx] += rows.shape[0]
+            self.doc_freq[label_idx] += np.asarray(occurrences.sum(axis=0)).ravel()
+            self.total_freq[label_idx] += np.asarray(counts.sum(axis=0)).ravel()
+            self.cooccurrence[label_idx] = self.cooccurrence[label_idx] + (occurrences.T @ occurrences).tocsr()
+
+    def merge(self, other: 'KeyWordStats') -> 'KeyWordStats':
+        """
+        Adds statistics of other documents (in place)
+        :param other: statistics computed with the same key word set
+        :return: self
+        """
+        assert other.version == self.version, \
+            "Statistics should be computed with the same key words version. Instead got %s and %s" % (
+                self.version, other.version)
+
+        self.n_docs += other.n_docs
+        self.doc_freq += other.doc_freq
+        self.total_freq += other.total_freq
+        self.cooccurrence = [own + others for own, others in zip(self.cooccurrence, other.cooccurrence)]
+        return self
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        :return: pandas DF with one row per key word (see get_key_words_vocabulary): total and per label document
+                 frequency, total frequency, share of the key word documents labeled RELEVANT ('relevant_ratio')
+                 and share of all documents containing the key word ('doc_share')
+        """
+        df_stats = get_key_words_vocabulary()
+        assert df_stats.shape[0] == self.n_key_words, "Key words have changed since the statistics were computed"
+
+        df_stats['doc_freq'] = self.doc_freq.sum(axis=0)
+        df_stats['total_freq'] = self.total_freq.sum(axis=0)
+        for label_idx, label in enumerate(LABELS):
+            df_stats['doc_freq_' + label.lower()] = self.doc_freq[label_idx]
+            df_stats['total_freq_' + label.lower()] = self.total_freq[label_idx]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df_stats['relevant_ratio'] = self.doc_freq[0] / df_stats['doc_freq'].values
+        df_stats['doc_share'] = df_stats['doc_freq'] / max(int(self.n_docs.sum()), 1)
+        return df_stats
+
+    def cooccurrence_dataframe(self, min_docs: int = 1) -> pd.DataFrame:
+        """
+        :param min_docs: keep only pairs of key words occurring together in at least min_docs documents
+        :return: pandas DF with one row per pair of key words (matrix columns 'column_1' < 'column_2'), number of
+                 documents containing both of them ('n_docs') and the same per label
+        """
+        total = sum(self.cooccurrence[1:], self.cooccurrence[0])
+        pairs = sparse.triu(total, k=1).tocoo()
+        mask = pairs.data >= min_docs
+        column_1, column_2 = pairs.row[mask], pairs.col[mask]
+
+        vocabulary = get_key_words_vocabulary()
+        df_pairs = pd.DataFrame({
+            'column_1': column_1,
+            'column_2': column_2,
+            'key_word_1': vocabulary['key_word'].values[column_1],
+            'key_word_2': vocabulary['key_word'].values[column_2],
+            'n_docs': pairs.data[mask],
+        })
+        for label_idx, label in enumerate(LABELS):
+            df_pairs['n_docs_' + label.lower()] = \
+                np.asarray(self.cooccurrence[label_idx][column_1, column_2]).ravel().astype(np.int64)
+        return df_pairs.sort_values('n_docs', ascending=False, ignore_index=True)
+
+
+def get_label_indices(labels: Iterable) -> np.ndarray:
+    """
+    Converts document labels (RELEVANT / NOT_RELEVANT or 1 / 0, e.g. 'accept_int', also as strings read from CSV) to
+    indices in LABELS
+    """
+    indices = []
+    for label in labels:
+        if label in LABELS:
+            indices.append(LABELS.index(label))
+        elif label in (0, 1, '0', '1'):
+            indices.append(0 if label in (1, '1') else 1)
+        else:
+            raise ValueError("Labels should be one of %s or 0 / 1. Instead got %s" % (LABELS, label))
+    return np.array(indices, dtype=np.int64)
+
+
+def compute_key_word_stats(texts: pd.Series, labels: Iterable = None, cache: FilterResultCache = None
+                           ) -> KeyWordStats:
+    """
+    Computes key word statistics of a batch of texts (map step)
+    :param texts: pandas Series with texts
+    :param labels: label of every text, RELEVANT / NOT_RELEVANT or 1 / 0 (labels of the base filter if None)
+    :param cache: persistent cache of results (see open_result_cache)
+    :return: statistics of the batch
+    """
+    texts = pd.Series(texts).reset_index(drop=True)
+    key_words_matrix, vocabulary = find_keywords_matrix(texts, unique=False, cache=cache)
+
+    if labels is None:
+        matcher = fltr.KEY_WORDS_MATCHER
+        hits = category_counts_from_matrix(key_words_matrix) > 0
+        masks = (hits.astype(np.int64) << np.arange(hits.shape[1], dtype=np.int64)).sum(axis=1)
+        label_indices = np.array([LABELS.index(matcher.label_from_mask(int(mask))) for mask in masks],
+                                 dtype=np.int64)
+    else:
+        label_indices = get_label_indices(labels)
+        assert label_indices.shape[0] == texts.shape[0], "Argument labels should have a label for every text"
+
+    stats = KeyWordStats(fltr.KEY_WORDS_MATCHER.version, vocabulary.shape[0])
+    stats.update(key_words_matrix, label_indices)
+    return stats
+
+
+def _compute_batch_stats(batch: Tuple[pd.Series, Union[pd.Series, None]]) -> KeyWordStats:
+    texts, labels = batch
+    # in workers of create_filter_pool the pre-built matcher is used instead of building the lazy module attribute
+    worker_matcher = get_worker_matcher()
+    if worker_matcher is not None:
+        fltr.KEY_WORDS_MATCHER = worker_matcher
+    return compute_key_word_stats(texts, labels)
+
+
+def merge_key_word_stats(stats_list: Iterable[KeyWordStats]) -> KeyWordStats:
+    """
+    Combines statistics of separate batches (reduce step)
+    """
+    merged = None
+    for stats in stats_list:
+        merged = stats if merged is None else merged.merge(stats)
+    return merged
+
+
+def aggregate_key_word_stats(input_path: str, text_column: str = 'text', label_column: str = None,
+                             batch_size: int = 10000, n_jobs: int = 1, encoding: str = 'utf-8',
+                             log_every: int = 10) -> KeyWordStats:
+    """
+    Computes key word statistics of a corpus batch by batch, so memory usage does not depend on the size of the corpus
+    :param input_path: path to JSONL / CSV / Parquet file with texts
+    :param text_column: name of the column with texts
+    :param label_column: name of the column with labels, RELEVANT / NOT_RELEVANT or 1 / 0 (labels of the base
+                         filter if None)
+    :param batch_size: number of records per batch
+    :param n_jobs: number of worker processes computing statistics of batches (1 -> in the current process)
+    :param encoding: encoding of JSONL / CSV files
+    :param log_every: log progress every log_every batches
+    :return: statistics of the corpus
+    """
+    columns = [text_column] if label_column is None else [text_column, label_column]
+    batches = ((batch[text_column], batch[label_column] if label_column else None)
+               for batch in iter_record_batches(input_path, batch_size, columns, encoding))
+
+    def log_progress(stats_iterator: Iterable[KeyWordStats]) -> Iterable[KeyWordStats]:
+        n_docs = 0
+        for batch_idx, stats in enumerate(stats_iterator):
+            n_docs += int(stats.n_docs.sum())
+            if (batch_idx + 1) % log_every == 0:
+                _logger.info("Aggregated %d docs" % n_docs)
+            yield stats
+
+    n_key_words = get_key_words_vocabulary().shape[0]
+
+    n_jobs = cpu_count() if n_jobs == -1 else n_jobs
+    if n_jobs == 1:
+        stats = merge_key_word_stats(log_progress(map(_compute_batch_stats, batches)))
+    else:
+        # batches are read from the file only as fast as the workers process them
+        with create_filter_pool(n_jobs) as pool:
+            stats = merge_key_word_stats(log_progress(
+                imap_bounded(pool, _compute_batch_stats, batches, max_in_flight=2 * n_jobs, ordered=False)))
+
+    if stats is None:
+        stats = KeyWordStats(fltr.KEY_WORDS_MATCHER.version, n_key_words)
+    _logger.info("Aggregated %d docs: %s" % (stats.n_docs.sum(), dict(zip(LABELS, stats.n_docs.tolist()))))
+    return stats
+
+
+def save_key_word_stats(stats: KeyWordStats, path: str, min_cooccurrence_docs: int = 1) -> Tuple[str, str]:
+    """
+    Writes key word table and co-occurrence table next to each other
+    :param stats: statistics to write
+    :param path: path to JSONL / CSV / Parquet file of the key word table; the co-occurrence table is written to
+                 '<name>_cooccurrence.<extension>'
+    :param min_cooccurrence_docs: write only pairs of key words occurring together in at least this many documents
+    :return: paths to the key word table and the co-occurrence table
+    """
+    root, extension = os.path.splitext(path)
+    cooccurrence_path = root + '_cooccurrence' + extension
+
+    with BatchWriter(path) as writer:
+        writer.write(stats.to_dataframe())
+    with BatchWriter(cooccurrence_path) as writer:
+        writer.write(stats.cooccurrence_dataframe(min_docs=min_cooccurrence_docs))
+
+    _logger.info("Key word statistics saved to %s and %s" % (path, cooccurrence_path))
+    return path, cooccurrence_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate level-0 filter key word statistics over a corpus")
+    parser.add_argument('input_path', help="path to JSONL / CSV / Parquet file with texts")
+    parser.add_argument('output_path', help="path to JSONL / CSV / Parquet file to write the key word table to")
+    parser.add_argument('--text-column', default='text', help="name of the column with texts")
+    parser.add_argument('--label-column', default=None,
+                        help="name of the column with RELEVANT / NOT_RELEVANT or 1 / 0 labels (base filter if None)")
+    parser.add_argument('--batch-size', type=int, default=10000, help="number of records per batch")
+    parser.add_argument('--n-jobs', type=int, default=1, help="number of worker processes (-1 -> all CPU cores)")
+    parser.add_argument('--encoding', default='utf-8', help="encoding of JSONL / CSV files")
+    parser.add_argument('--min-cooccurrence-docs', type=int, default=1,
+                        help="minimal number of documents of co-occurring key word pairs to write")
+    args = parser.parse_args()
+
+    stats = aggregate_key_word_stats(args.input_path, text_column=args.text_column, label_column=args.label_column,
+                                     batch_size=args.batch_size, n_jobs=args.n_jobs, encoding=args.encoding)
+    save_key_word_stats(stats, args.output_path, min_cooccurrence_docs=args.min_cooccurrence_docs)
+
+
+if __name__ == '__main__':
+    main()
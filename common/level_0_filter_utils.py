@@ -1,97 +1,702 @@
-import re
 import json
-from typing import List
+import time
+from itertools import chain
+from multiprocessing import Pool
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple, Union
 
 import pandas as pd
 import numpy as np
-import spacy
+from scipy import sparse
 
 import level_0_filter_key_words as fltr
+from level_0_filter_matcher import KeywordMatcher, category_masks_in_worker
+from level_0_filter_result_cache import FilterResultCache
 
 
 def base_filter(text: str) -> str:
     if isinstance(text, str):
-        text_cleaned = re.sub(fltr.PUNCTUATION_REGEX, " ", text)
+        return fltr.KEY_WORDS_MATCHER.label(fltr.TEXT_NORMALIZER(text))
 
-        relevant_body = []
-        for regex in fltr.relevant_regex_list:
-            body = [x.strip() for x in sorted((set(regex.findall(text_cleaned))))]
-            relevant_body.append(bool(body))
+    return None
 
-        not_relevant_body = []
-        for regex in fltr.not_relevant_regex_list:
-            body = [x.strip() for x in sorted((set(regex.findall(text_cleaned))))]
-            not_relevant_body.append(bool(body))
 
-        has_relevant_words = any(relevant_body)
-        has_not_relevant_words = any(not_relevant_body)
+def normalize_text_for_dataframe(texts: pd.Series) -> pd.Series:
+    """
+    Lower-cases texts and replaces punctuation with spaces with the filter normalizer
+    :param texts: pandas Series with texts
+    :return: pandas Series with normalized texts (non-string values become NaN)
+    """
+    return fltr.TEXT_NORMALIZER.normalize_series(texts, lower=True)
 
-        if has_relevant_words and not has_not_relevant_words:
-            return "RELEVANT"
-        else:
-            return "NOT_RELEVANT"
 
-    return None
+def get_key_words_vocabulary() -> pd.DataFrame:
+    """
+    Returns vocabulary of the key words matrix: one row per key word of every category, in the order of
+    fltr.all_key_words_list (the same layout as the per-key-word weight vectors)
+    :return: pandas DF with 'key_word', 'category' and 'is_relevant' columns, indexed by matrix column
+    """
+    matcher = fltr.KEY_WORDS_MATCHER
+    categories = [matcher.categories_names[idx] for idx in matcher.vocabulary_categories]
 
+    return pd.DataFrame({
+        'key_word': matcher.vocabulary_key_words,
+        'category': categories,
+        'is_relevant': [category in fltr.relevant_categories_names for category in categories]
+    })
 
-def base_filter_for_dataframe(df_input: pd.DataFrame) -> pd.DataFrame:
-    df = df_input.copy(deep=True)
 
-    categories = fltr.relevant_categories_names + fltr.not_relevant_categories_names
-    regexes = fltr.relevant_regex_list + fltr.not_relevant_regex_list
+def get_category_indicator_matrix() -> sparse.csr_matrix:
+    """
+    Returns sparse (n_key_words x n_categories) matrix mapping every vocabulary column to its category
+    """
+    matcher = fltr.KEY_WORDS_MATCHER
+    n_key_words = len(matcher.vocabulary_key_words)
 
-    for category, regex in zip(categories, regexes):
-        col_name = 'is_' + category
-        body_name = category + '_body'
-        df[body_name] = df['text'].str.lower().apply(
-            lambda x: re.sub(fltr.PUNCTUATION_REGEX, " ", x) if isinstance(x, str) else x)
-        df[body_name] = df[body_name].apply(regex.findall)
-        df[body_name] = df[body_name].apply(lambda x: [x.strip() for x in sorted(set(x))])
-        df[col_name] = 0
-        df.loc[df[body_name].astype(str) != '[]', col_name] = 1
+    return sparse.csr_matrix((np.ones(n_key_words, dtype=np.int32),
+                              (np.arange(n_key_words), matcher.vocabulary_categories)),
+                             shape=(n_key_words, len(matcher.categories_names)))
 
-    df['has_relevant_words'] = df[['is_' + cat for cat in fltr.relevant_categories_names]].apply(any, axis=1).astype(
-        int)
-    df['has_not_relevant_words'] = df[['is_' + cat for cat in fltr.not_relevant_categories_names]].apply(any,
-                                                                                                         axis=1).astype(
-        int)
 
-    df['base_filter'] = np.all(df[['has_relevant_words', 'has_not_relevant_words']].values == [1, 0], axis=1)
-    df['base_filter_int'] = df['base_filter'].astype(int)
-    df['base_filter'] = df['base_filter'].map({True: "RELEVANT", False: "NOT_RELEVANT"})
+def category_counts_from_matrix(key_words_matrix: sparse.csr_matrix) -> np.ndarray:
+    """
+    Reduces the key words matrix to per-category counts (the same as the number of key words in '<category>_body')
+    :param key_words_matrix: sparse (n_docs x n_key_words) matrix returned by find_keywords_matrix
+    :return: dense (n_docs x n_categories) array
+    """
+    return (key_words_matrix @ get_category_indicator_matrix()).toarray()
+
+
+def get_result_cache_version() -> str:
+    """
+    Returns version of the key word set and text normalization used to key cached filter results
+    """
+    return fltr.KEY_WORDS_MATCHER.version + ':' + fltr.PUNCTUATION_REGEX.pattern
 
-    return df
 
+def open_result_cache(path: str, max_entries: int = 5000000) -> FilterResultCache:
+    """
+    Opens persistent cache of filter results for the current key word set
+    :param path: path to the SQLite file of the cache
+    :param max_entries: maximum number of cached texts (least recently used ones are evicted)
+    :return: cache to be passed to base_filter_for_dataframe / find_keywords_for_dataframe
+    """
+    return FilterResultCache(path, version=get_result_cache_version(), max_entries=max_entries)
 
-def find_keywords_for_dataframe(df_input: pd.DataFrame, unique: bool = True) -> pd.DataFrame:
-    df = df_input.copy(deep=True)
 
-    categories = fltr.relevant_categories_names + fltr.not_relevant_categories_names
-    regexes = fltr.relevant_regex_list + fltr.not_relevant_regex_list
+class CategoryProfile:
+    """
+    Per-category profile of the single-pass matcher, filled by the filter calls it is passed to (see match_texts).
+    The matcher scans a text once for all categories, so the time of every matched text is split between the
+    categories by their number of matches, and the time of texts without matches is reported as the shared scan cost.
+    This attributed time follows how often a category matches and is not its cost: a list of short key words that
+    rarely match but slow down the scan gets almost no time. Use profile_categories(marginal=True) to measure the cost
+    of every category
+    """
 
-    for category, regex in zip(categories, regexes):
-        col_name = 'is_' + category
-        body_name = category + '_body'
-        df[body_name] = df['text'].str.lower().apply(
-            lambda x: re.sub(fltr.PUNCTUATION_REGEX, " ", x) if isinstance(x, str) else x)
-        df[body_name] = df[body_name].apply(regex.findall)
-        if unique:
-            df[body_name] = df[body_name].apply(lambda x: [x.strip() for x in sorted(set(x))])
+    def __init__(self):
+        self.categories_names = None
+        self.n_docs = 0
+        self.time_sec = 0.
+        self.scan_sec = 0.
+        self.n_matches = None
+        self.n_docs_hit = None
+        self.category_time_sec = None
+
+    def _check_categories(self, matcher: KeywordMatcher) -> None:
+        if self.categories_names is None:
+            n_categories = len(matcher.categories_names)
+            self.categories_names = list(matcher.categories_names)
+            self.n_matches = np.zeros(n_categories, dtype=np.int64)
+            self.n_docs_hit = np.zeros(n_categories, dtype=np.int64)
+            self.category_time_sec = np.zeros(n_categories, dtype=np.float64)
+        assert self.categories_names == matcher.categories_names, \
+            "Categories of the matcher have changed since the profile was started, start a new CategoryProfile"
+
+    def add(self, matcher: KeywordMatcher, seconds: float, mask: int,
+            matches: Union[List[Tuple[int, str]], None] = None) -> None:
+        """
+        Adds one matched text to the profile
+        :param matcher: matcher the text was matched with
+        :param seconds: time of the matcher call
+        :param mask: category bit mask of the text
+        :param matches: matches of the text (see KeywordMatcher.find_category_matches), only hits are known if None
+        """
+        self._check_categories(matcher)
+        self.n_docs += 1
+        self.time_sec += seconds
+
+        counts = np.zeros(len(self.categories_names), dtype=np.int64)
+        if matches is not None:
+            for category_idx, _ in matches:
+                counts[category_idx] += 1
         else:
-            df[body_name] = df[body_name].apply(lambda x: [x.strip() for x in sorted(x)])
-        df[col_name] = 0
-        df.loc[df[body_name].astype(str) != '[]', col_name] = 1
+            counts[:] = (mask >> np.arange(len(self.categories_names))) & 1
+
+        total = counts.sum()
+        if total == 0:
+            self.scan_sec += seconds
+            return
+        self.n_matches += counts
+        self.n_docs_hit += counts > 0
+        self.category_time_sec += seconds * counts / total
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        :return: pandas DF ranked by attributed time with number of key words, attributed time, its share and its time
+                 per doc, number of matches, number of docs hit and hit rate of every category, and the shared scan
+                 cost of texts without matches as the last row
+        """
+        columns = ['category', 'is_relevant', 'n_key_words', 'attributed_time_sec', 'n_matches', 'n_docs_hit']
+        if self.categories_names is None:
+            return pd.DataFrame(columns=columns + ['attributed_time_share', 'attributed_us_per_doc', 'hit_rate'])
+
+        key_words_list = dict(zip(fltr.KEY_WORDS_MATCHER.categories_names, fltr.KEY_WORDS_MATCHER.key_words_list))
+        df = pd.DataFrame({
+            'category': self.categories_names,
+            'is_relevant': [category in fltr.relevant_categories_names for category in self.categories_names],
+            'n_key_words': [len(key_words_list.get(category, [])) for category in self.categories_names],
+            'attributed_time_sec': self.category_time_sec,
+            'n_matches': self.n_matches,
+            'n_docs_hit': self.n_docs_hit,
+        })
+        df = df.sort_values('attributed_time_sec', ascending=False, ignore_index=True)
+        scan_row = pd.DataFrame([('SCAN', None, None, self.scan_sec, 0, 0)], columns=columns)
+        df = pd.concat([df, scan_row], ignore_index=True)
+        df['attributed_time_share'] = df['attributed_time_sec'] / self.time_sec if self.time_sec > 0 else 0.
+        df['attributed_us_per_doc'] = df['attributed_time_sec'] / max(self.n_docs, 1) * 10 ** 6
+        df['hit_rate'] = df['n_docs_hit'] / max(self.n_docs, 1)
+        return df
+
+
+def match_texts(texts_cleaned: pd.Series, need_matches: bool = False, cache: FilterResultCache = None,
+                profile: CategoryProfile = None, pool: Pool = None, batch_size: int = 1000
+                ) -> Tuple[np.ndarray, Union[List[List[Tuple[int, str]]], None]]:
+    """
+    Matches normalized texts with the single-pass matcher. Identical texts are matched once, and texts found in the
+    cache are not matched at all
+    :param texts_cleaned: pandas Series with normalized texts (see normalize_text_for_dataframe)
+    :param need_matches: if True -> also return matches of every text (see KeywordMatcher.find_category_matches)
+    :param cache: persistent cache of results (see open_result_cache)
+    :param profile: if given -> every matcher call is timed and added to it (texts found in the cache are not)
+    :param pool: pool created by level_0_filter_runner.create_filter_pool to match the texts missing in the cache in
+                 (only category masks, matched in the current process if None)
+    :param batch_size: number of texts sent to a worker at once
+    :return: category bit mask of every text and matches of every text (or None)
+    """
+    assert pool is None or not (need_matches or profile is not None), \
+        "Only category masks are computed in the pool, arguments need_matches and profile need pool=None"
+
+    matcher = fltr.KEY_WORDS_MATCHER
+    if cache is not None:
+        # key words may have been reloaded since the cache was opened (see level_0_filter_key_words.poll_key_words)
+        cache.version = get_result_cache_version()
+
+    unique_texts = {}
+    rows = np.fromiter((unique_texts.setdefault(text, len(unique_texts)) if isinstance(text, str) else -1
+                        for text in texts_cleaned), dtype=np.int64, count=len(texts_cleaned))
+    unique_texts = list(unique_texts.keys())
+
+    cached = {}
+    keys = None
+    if cache is not None:
+        keys = [cache.text_key(text) for text in unique_texts]
+        cached = cache.get_many(keys, need_matches=need_matches)
+
+    pooled = {}
+    if pool is not None:
+        # normalization is idempotent, so the workers normalizing the texts again get the same masks
+        misses = [idx for idx in range(len(unique_texts)) if keys is None or keys[idx] not in cached]
+        batches = [[unique_texts[idx] for idx in misses[start: start + batch_size]]
+                   for start in range(0, len(misses), batch_size)]
+        # masks of a worker running another key words version (e.g. reloaded at another time than this process)
+        # (cache.version is derived from matcher.version) have other bit positions and must not be cached under this
+        # version, such texts are matched here
+        pooled = dict(zip(misses, chain(*[masks if version == matcher.version else [None] * len(masks)
+                                          for version, masks in pool.imap(category_masks_in_worker, batches)])))
+
+    unique_masks = np.zeros(len(unique_texts) + 1, dtype=np.int64)
+    unique_matches = [None] * len(unique_texts) + [[]]
+    computed = {}
+
+    for idx, text in enumerate(unique_texts):
+        result = cached.get(keys[idx]) if keys is not None else None
+        if result is None and pooled.get(idx) is not None:
+            result = (pooled[idx], None)
+            if keys is not None:
+                computed[keys[idx]] = result
+        elif result is None:
+            t0 = time.perf_counter() if profile is not None else None
+            if need_matches:
+                matches = matcher.find_category_matches(text)
+                mask = 0
+                for category_idx, _ in matches:
+                    mask |= 1 << category_idx
+            else:
+                matches = None
+                mask = matcher.category_mask(text)
+            if profile is not None:
+                profile.add(matcher, time.perf_counter() - t0, mask, matches)
+            result = (mask, matches)
+            if keys is not None:
+                computed[keys[idx]] = result
+        unique_masks[idx], unique_matches[idx] = result
+
+    if cache is not None:
+        cache.put_many(computed)
+
+    # row -1 (non-string text) points to the last element: no hits
+    masks = unique_masks[rows]
+    matches = [unique_matches[row] for row in rows] if need_matches else None
 
-    df['has_relevant_words'] = df[['is_' + cat for cat in fltr.relevant_categories_names]].apply(any, axis=1).astype(
-        int)
-    df['has_not_relevant_words'] = df[['is_' + cat for cat in fltr.not_relevant_categories_names]].apply(any,
-                                                                                                         axis=1).astype(
-        int)
+    return masks, matches
 
+
+def _find_keywords_columns(texts: pd.Series, unique: bool = True, keep_body: bool = False,
+                           return_matrix: bool = False, cache: FilterResultCache = None,
+                           profile: CategoryProfile = None) -> Tuple[Dict[str, Any], Union[sparse.csr_matrix, None]]:
+    """
+    Normalizes texts once and computes all category hit columns from the normalized texts with the single-pass matcher
+    :param texts: pandas Series with texts
+    :param unique: if True -> keep only distinct key words in '<category>_body' columns and the matrix
+    :param keep_body: if True -> add '<category>_body' columns with lists of found key words
+    :param return_matrix: if True -> also build sparse (n_docs x n_key_words) matrix of key word counts and derive
+                          category flags from it
+    :param cache: persistent cache of results (see open_result_cache)
+    :param profile: per-category profile of the matcher to be filled (see CategoryProfile)
+    :return: dict with new columns (in the order they should be added to the DF) and the matrix (or None)
+    """
+    matcher = fltr.KEY_WORDS_MATCHER
+    texts_cleaned = normalize_text_for_dataframe(texts)
+    n_categories = len(matcher.categories_names)
+    bodies = None
+    key_words_matrix = None
+
+    masks, texts_matches = match_texts(texts_cleaned, need_matches=keep_body or return_matrix, cache=cache,
+                                       profile=profile)
+
+    if keep_body:
+        bodies = [[] for _ in range(n_categories)]
+        for matches in texts_matches:
+            found = [[] for _ in range(n_categories)]
+            for category_idx, key_word in matches:
+                found[category_idx].append(key_word)
+            for body, key_words in zip(bodies, found):
+                body.append(sorted(set(key_words)) if unique else sorted(key_words))
+
+    if return_matrix:
+        indptr, indices, data = [0], [], []
+        for matches in texts_matches:
+            counts = matcher.count_key_words(matches, unique=unique)
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+
+        key_words_matrix = sparse.csr_matrix(
+            (np.array(data, dtype=np.int32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(texts_cleaned), len(matcher.vocabulary_key_words)))
+        key_words_matrix.sort_indices()
+        hits = category_counts_from_matrix(key_words_matrix) > 0
+    else:
+        hits = ((masks[:, None] >> np.arange(n_categories)) & 1).astype(bool)
+
+    columns = {}
+    for idx, category in enumerate(matcher.categories_names):
+        if keep_body:
+            columns[category + '_body'] = bodies[idx]
+        columns['is_' + category] = hits[:, idx].astype(int)
+
+    relevant_idx = [matcher.categories_names.index(name) for name in fltr.relevant_categories_names]
+    not_relevant_idx = [matcher.categories_names.index(name) for name in fltr.not_relevant_categories_names]
+    columns['has_relevant_words'] = hits[:, relevant_idx].any(axis=1).astype(int)
+    columns['has_not_relevant_words'] = hits[:, not_relevant_idx].any(axis=1).astype(int)
+
+    return columns, key_words_matrix
+
+
+def base_filter_for_dataframe(df_input: pd.DataFrame, keep_body: bool = False, cache: FilterResultCache = None,
+                              profile: CategoryProfile = None) -> pd.DataFrame:
+    """
+    Applies base filter to the 'text' column of the DF
+    :param df_input: pandas DF with 'text' column
+    :param keep_body: if True -> keep '<category>_body' columns with lists of found key words
+    :param cache: persistent cache of results (see open_result_cache), texts found in it are not matched again
+    :param profile: if given -> per-category cost of the matcher is added to it (see CategoryProfile)
+    :return: copy of the DF with 'is_<category>', 'has_relevant_words', 'has_not_relevant_words', 'base_filter' and
+             'base_filter_int' columns
+    """
+    columns, _ = _find_keywords_columns(df_input['text'], unique=True, keep_body=keep_body, cache=cache,
+                                        profile=profile)
+
+    base_filter_int = ((columns['has_relevant_words'] == 1) & (columns['has_not_relevant_words'] == 0)).astype(int)
+    columns['base_filter'] = np.where(base_filter_int == 1, "RELEVANT", "NOT_RELEVANT")
+    columns['base_filter_int'] = base_filter_int
+
+    return df_input.assign(**columns)
+
+
+def find_keywords_for_dataframe(df_input: pd.DataFrame, unique: bool = True, keep_body: bool = True,
+                                return_matrix: bool = False, cache: FilterResultCache = None,
+                                profile: CategoryProfile = None
+                                ) -> Union[pd.DataFrame, Tuple[pd.DataFrame, sparse.csr_matrix, pd.DataFrame]]:
+    """
+    Finds key words of all categories in the 'text' column of the DF
+    :param df_input: pandas DF with 'text' column
+    :param unique: if True -> keep only distinct key words in '<category>_body' columns and the matrix
+    :param keep_body: if True -> keep '<category>_body' columns with lists of found key words
+    :param return_matrix: if True -> also return sparse (n_docs x n_key_words) CSR matrix of key word counts and its
+                          vocabulary (see get_key_words_vocabulary); category flags are then derived from the matrix
+    :param cache: persistent cache of results (see open_result_cache), texts found in it are not matched again
+    :param profile: if given -> per-category cost of the matcher is added to it (see CategoryProfile)
+    :return: copy of the DF with 'is_<category>', 'has_relevant_words' and 'has_not_relevant_words' columns
+             (and the matrix with its vocabulary if return_matrix is True)
+    """
+    columns, key_words_matrix = _find_keywords_columns(df_input['text'], unique=unique, keep_body=keep_body,
+                                                       return_matrix=return_matrix, cache=cache, profile=profile)
+    df = df_input.assign(**columns)
+
+    if return_matrix:
+        return df, key_words_matrix, get_key_words_vocabulary()
     return df
 
 
+def find_keywords_matrix(texts: pd.Series, unique: bool = True,
+                         cache: FilterResultCache = None) -> Tuple[sparse.csr_matrix, pd.DataFrame]:
+    """
+    Builds sparse (n_docs x n_key_words) CSR matrix of key word counts without adding any columns
+    :param texts: pandas Series with texts
+    :param unique: if True -> count each distinct key word once per document
+    :param cache: persistent cache of results (see open_result_cache), texts found in it are not matched again
+    :return: the matrix and its vocabulary (see get_key_words_vocabulary)
+    """
+    _, key_words_matrix = _find_keywords_columns(texts, unique=unique, keep_body=False, return_matrix=True,
+                                                 cache=cache)
+    return key_words_matrix, get_key_words_vocabulary()
+
+
+def _time_scan(scan: Callable[[str], Any], texts: List[str], repeat: int) -> float:
+    """
+    :return: best time of repeat scans of all texts (seconds)
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for text in texts:
+            scan(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def profile_categories(texts: Sequence[str], need_matches: bool = True, marginal: bool = False,
+                       repeat: int = 3) -> pd.DataFrame:
+    """
+    Profiles per-category cost of the single-pass matcher the filter runs (see CategoryProfile)
+    :param texts: corpus
+    :param need_matches: if True -> profile find_category_matches (find_keywords_for_dataframe with keep_body),
+                         if False -> profile category_mask (base_filter_for_dataframe)
+    :param marginal: if True -> also rebuild the matcher without every category and add 'marginal_sec' column with
+                     the time saved by dropping the category, which is the cost of the category (slow: one matcher
+                     build and repeat scans per category; noisy on small corpora)
+    :param repeat: number of scans of the corpus by every matcher of the marginal cost, the best time is taken
+    :return: pandas DF returned by CategoryProfile.to_dataframe, ranked by 'marginal_sec' if marginal is True (the
+             shared scan cost stays the last row)
+    """
+    texts_cleaned = normalize_text_for_dataframe(pd.Series(texts, dtype=object))
+    profile = CategoryProfile()
+    match_texts(texts_cleaned, need_matches=need_matches, profile=profile)
+    df = profile.to_dataframe()
+    if not marginal:
+        return df
+
+    matcher = fltr.KEY_WORDS_MATCHER
+    texts_cleaned = list(dict.fromkeys(text for text in texts_cleaned if isinstance(text, str)))
+    scan = matcher.find_category_offsets if need_matches else matcher.category_mask
+
+    # the first scan warms up the matcher, so it is not charged to the full matcher only
+    full_sec = _time_scan(scan, texts_cleaned, repeat + 1)
+
+    marginal_sec = {}
+    for idx, category in enumerate(matcher.categories_names):
+        reduced = KeywordMatcher(matcher.categories_names[:idx] + matcher.categories_names[idx + 1:],
+                                 matcher.key_words_list[:idx] + matcher.key_words_list[idx + 1:],
+                                 fltr.relevant_categories_names)
+        scan = reduced.find_category_offsets if need_matches else reduced.category_mask
+        marginal_sec[category] = full_sec - _time_scan(scan, texts_cleaned, repeat)
+
+    df['marginal_sec'] = df['category'].map(marginal_sec)
+    df_categories = df[df['category'].isin(marginal_sec.keys())].sort_values('marginal_sec', ascending=False)
+    return pd.concat([df_categories, df[~df['category'].isin(marginal_sec.keys())]], ignore_index=True)
+
+
+# weights of the categories found by the severity filter experiments (see notebooks/news_classifier/level-0-filter)
+CATEGORY_WEIGHTS = {
+    'harassment': 2, 'theft': 2,
+    'robbery': 4, 'auto_theft': 2,
+    'assault': 2, 'exortion': 5,
+    'kidnapping': 9, 'sex_offences': 9,
+    'vandalism': 2, 'trafficking_illegalgoods': 4,
+    'fraud': 2, 'organised_crime': 4,
+    'homicide': 2, 'terrorist_threats': 1,
+    'diturbance': 1, 'suspicious_activity': 1,
+    'domestic_offences': 1, 'drugalcohol_violations': 1,
+    'traffic_violations': 4, 'trespassing': 4,
+    'weapon_violations': 0.2,
+    'trial': -50,
+    'car_accident': -10,
+    'statistics': -10,
+    'gun_policy': -20,
+    'abortion': -7,
+    'politics': -15,
+    'blaze': -3,
+    'film': -10,
+    'weather': -10,
+    'covid': -8,
+    'other': -15
+}
+
+
+def get_key_words_weights(category_weights: Dict[str, float] = None,
+                          key_word_weights: Dict[str, float] = None) -> np.ndarray:
+    """
+    Builds dense weight vector aligned with the columns of the key words matrix (see get_key_words_vocabulary)
+    :param category_weights: weight of every key word of the category (CATEGORY_WEIGHTS if None, 0 for missing
+                             categories)
+    :param key_word_weights: weights of single key words overriding the weight of their categories
+    :return: array of shape (n_key_words,)
+    """
+    matcher = fltr.KEY_WORDS_MATCHER
+    category_weights = CATEGORY_WEIGHTS if category_weights is None else category_weights
+
+    unknown = set(category_weights) - set(matcher.categories_names)
+    assert not unknown, "Unknown categories in category_weights: %s" % sorted(unknown)
+
+    weights = np.array([category_weights.get(name, 0.) for name in matcher.categories_names],
+                       dtype=np.float64)[matcher.vocabulary_categories]
+
+    if key_word_weights:
+        key_word_weights = {key_word.lower(): weight for key_word, weight in key_word_weights.items()}
+        for column, key_word in enumerate(matcher.vocabulary_key_words):
+            weight = key_word_weights.get(key_word.lower())
+            if weight is not None:
+                weights[column] = weight
+
+    return weights
+
+
+def score_matrix(key_words_matrix: sparse.csr_matrix, weights: np.ndarray) -> np.ndarray:
+    """
+    Scores documents with a single sparse matrix-vector product
+    :param key_words_matrix: sparse (n_docs x n_key_words) matrix returned by find_keywords_matrix
+    :param weights: weight vector returned by get_key_words_weights
+    :return: raw scores of shape (n_docs,)
+    """
+    assert key_words_matrix.shape[1] == weights.shape[0], \
+        "Weights should have one value per matrix column. Got %d columns and %d weights" % (
+            key_words_matrix.shape[1], weights.shape[0])
+    return np.asarray(key_words_matrix @ weights, dtype=np.float64).ravel()
+
+
+def sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-x))
+
+
+def min_max_scaling(scores: np.ndarray, min_score: float = None, max_score: float = None) -> np.ndarray:
+    """
+    Scales scores to [0, 1]
+    :param scores: raw scores
+    :param min_score: score mapped to 0 (min of the scores if None), pass the one of the training scores to scale
+                      new scores the same way
+    :param max_score: score mapped to 1 (max of the scores if None)
+    :return: scaled scores
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    min_score = scores.min() if min_score is None else min_score
+    max_score = scores.max() if max_score is None else max_score
+    scale = max_score - min_score
+    return (scores - min_score) / scale if scale else np.zeros_like(scores)
+
+
+def fit_score_calibration(scores: np.ndarray, y_true: np.ndarray, n_iter: int = 100,
+                          tol: float = 1e-10) -> Tuple[float, float]:
+    """
+    Fits Platt scaling P(RELEVANT | score) = sigmoid(a * score + b) on labeled scores with Newton's method
+    :param scores: raw scores
+    :param y_true: 0 / 1 labels
+    :param n_iter: maximum number of iterations
+    :param tol: stop when the update of the parameters is smaller than tol
+    :return: calibration parameters (a, b)
+    """
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    y_true = np.asarray(y_true, dtype=np.float64).ravel()
+    assert scores.shape == y_true.shape, "Scores and labels should have the same length"
+
+    # regularized targets from Platt's paper, so that separable data does not push the parameters to infinity
+    n_pos = y_true.sum()
+    n_neg = y_true.shape[0] - n_pos
+    targets = np.where(y_true > 0, (n_pos + 1) / (n_pos + 2), 1 / (n_neg + 2))
+
+    a, b = 0., np.log((n_pos + 1) / (n_neg + 1))
+    for _ in range(n_iter):
+        proba = sigmoid(a * scores + b)
+        grad = np.array([np.dot(scores, proba - targets), np.sum(proba - targets)])
+        weights = proba * (1 - proba) + 1e-12
+        hessian = np.array([[np.dot(weights, scores * scores), np.dot(weights, scores)],
+                            [np.dot(weights, scores), np.sum(weights)]])
+        step = np.linalg.solve(hessian + np.eye(2) * 1e-12, grad)
+        a, b = a - step[0], b - step[1]
+        if np.abs(step).max() < tol:
+            break
+
+    return float(a), float(b)
+
+
+def calibrate_scores(scores: np.ndarray, calibration: Tuple[float, float]) -> np.ndarray:
+    """
+    Turns raw scores into probabilities of being RELEVANT
+    :param scores: raw scores
+    :param calibration: parameters returned by fit_score_calibration
+    :return: calibrated scores in [0, 1]
+    """
+    a, b = calibration
+    return sigmoid(a * np.asarray(scores, dtype=np.float64) + b)
+
+
+def score_threshold(y_true: np.ndarray, scores: np.ndarray,
+                    thresholds: np.ndarray = None) -> Tuple[float, float]:
+    """
+    Finds the threshold maximizing F1 score of predictions scores > threshold. F1 of all thresholds is computed at
+    once from cumulative counts of the sorted scores
+    :param y_true: 0 / 1 labels
+    :param scores: scores (raw, scaled or calibrated)
+    :param thresholds: candidate thresholds (all distinct scores if None)
+    :return: best threshold and its F1 score
+    """
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    y_true = np.asarray(y_true).ravel().astype(bool)
+    assert scores.shape == y_true.shape, "Scores and labels should have the same length"
+
+    order = np.argsort(scores, kind='mergesort')
+    sorted_scores = scores[order]
+    # number of positives among the i lowest scores
+    cum_positives = np.concatenate([[0], np.cumsum(y_true[order])])
+    n_positives = cum_positives[-1]
+
+    thresholds = np.unique(scores) if thresholds is None else np.asarray(thresholds, dtype=np.float64)
+    n_below = np.searchsorted(sorted_scores, thresholds, side='right')
+    true_positives = n_positives - cum_positives[n_below]
+    predicted_positives = scores.shape[0] - n_below
+    denominator = predicted_positives + n_positives
+    f1_scores = np.where(denominator > 0, 2 * true_positives / np.maximum(denominator, 1), 0.)
+
+    best = int(np.argmax(f1_scores))
+    return float(thresholds[best]), float(f1_scores[best])
+
+
+def predict_with_weights(key_words_matrix: sparse.csr_matrix, weights: np.ndarray, threshold: float,
+                         scaler_type: str = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scores documents and labels the ones with score > threshold as RELEVANT
+    :param key_words_matrix: sparse (n_docs x n_key_words) matrix returned by find_keywords_matrix
+    :param weights: weight vector returned by get_key_words_weights
+    :param threshold: threshold of the (scaled) scores
+    :param scaler_type: None, 'sigmoid' or 'minmax'
+    :return: (scaled) scores and 0 / 1 predictions
+    """
+    scores = score_matrix(key_words_matrix, weights)
+
+    if scaler_type == 'sigmoid':
+        scores = sigmoid(scores)
+    elif scaler_type == 'minmax':
+        scores = min_max_scaling(scores)
+    elif scaler_type is not None:
+        raise ValueError("Wrong scaler: %s" % scaler_type)
+
+    return scores, (scores > threshold).astype(int)
+
+
+def score_dataframe(df_input: pd.DataFrame, category_weights: Dict[str, float] = None,
+                    key_word_weights: Dict[str, float] = None, unique: bool = True,
+                    calibration: Tuple[float, float] = None, threshold: float = None,
+                    cache: FilterResultCache = None) -> pd.DataFrame:
+    """
+    Scores the 'text' column of the DF with weighted key words
+    :param df_input: pandas DF with 'text' column
+    :param category_weights: weights of the categories (CATEGORY_WEIGHTS if None)
+    :param key_word_weights: weights of single key words overriding the weight of their categories
+    :param unique: if True -> count each distinct key word once per document
+    :param calibration: parameters returned by fit_score_calibration -> add 'score_proba' column
+    :param threshold: threshold of 'score_proba' (or of 'score' without calibration) -> add 'score_label' column
+                      with RELEVANT / NOT_RELEVANT
+    :param cache: persistent cache of results (see open_result_cache)
+    :return: copy of the DF with 'score' column (and 'score_proba' / 'score_label')
+    """
+    key_words_matrix, _ = find_keywords_matrix(df_input['text'], unique=unique, cache=cache)
+    scores = score_matrix(key_words_matrix, get_key_words_weights(category_weights, key_word_weights))
+
+    columns = {'score': scores}
+    if calibration is not None:
+        scores = calibrate_scores(scores, calibration)
+        columns['score_proba'] = scores
+    if threshold is not None:
+        columns['score_label'] = np.where(scores > threshold, "RELEVANT", "NOT_RELEVANT")
+
+    return df_input.assign(**columns)
+
+
+def find_keyword_spans(text: str, label_by: str = 'category', labels: List[str] = None,
+                       resolve_overlaps: bool = True) -> List[Dict[str, Any]]:
+    """
+    Finds key words of the base filter in the text as Prodigy spans with character offsets into the original text
+    :param text: text
+    :param label_by: 'category' -> span label is the upper-cased category name, 'relevance' -> RELEVANT / NOT_RELEVANT
+    :param labels: keep only spans with these labels (all spans if None)
+    :param resolve_overlaps: if True -> keep only the leftmost-longest of overlapping spans
+    :return: list of {"start", "end", "label", "keyword"} dicts sorted by start ([] for non-string values)
+    """
+    if not isinstance(text, str):
+        return []
+
+    # punctuation is replaced char by char, so offsets in the cleaned text are offsets in the original one
+    text_cleaned = fltr.TEXT_NORMALIZER(text)
+    return fltr.KEY_WORDS_MATCHER.find_spans(text_cleaned, label_by=label_by, labels=labels,
+                                             resolve_overlaps=resolve_overlaps)
+
+
+def add_keyword_spans(stream: Iterable[Dict[str, Any]], label_by: str = 'category', labels: List[str] = None,
+                      resolve_overlaps: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Pre-highlights key words in a stream of Prodigy tasks without running a spaCy pipeline. Key words and the base
+    filter label are found in a single scan of each text
+    :param stream: iterable of tasks with 'text' key
+    :param label_by: 'category' -> span label is the upper-cased category name, 'relevance' -> RELEVANT / NOT_RELEVANT
+    :param labels: keep only spans with these labels (all spans if None)
+    :param resolve_overlaps: if True -> keep only the leftmost-longest of overlapping spans
+    :return: iterator over copies of the tasks with 'spans' and meta 'base_filter' set
+    """
+    matcher = fltr.KEY_WORDS_MATCHER
+
+    for eg in stream:
+        task = dict(eg)
+        text = task.get('text')
+
+        if isinstance(text, str):
+            text_cleaned = fltr.TEXT_NORMALIZER(text)
+            offsets = matcher.find_category_offsets(text_cleaned)
+            mask = 0
+            for category_idx, _, _ in offsets:
+                mask |= 1 << category_idx
+            task['spans'] = matcher.find_spans(text_cleaned, label_by=label_by, labels=labels,
+                                               resolve_overlaps=resolve_overlaps, offsets=offsets)
+            task['meta'] = {**task.get('meta', {}), 'base_filter': matcher.label_from_mask(mask)}
+        else:
+            task['spans'] = []
+
+        yield task
+
+
 def create_prodigy_patterns(key_words_list: List[str], label: str) -> str:
+    # spacy is imported here, so that importing the filter does not load it
+    import spacy
+
     final_pattern = ''
     nlp = spacy.blank('en')
 
@@ -0,0 +1,283 @@
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from formatter_utils import TEXT_NORMALIZER
+from loggers import configure_logging
+
+# Setting logger
+logging = configure_logging()
+_logger = logging.getLogger("near-duplicate-utils")
+
+# prime above 2^32 used by the universal hash functions of MinHash
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def get_shingles(text: str, shingle_size: int = 5) -> np.ndarray:
+    """
+    Hashes word shingles (sequences of shingle_size consecutive words) of the text normalized by TEXT_NORMALIZER
+    :param text: text
+    :param shingle_size: number of words per shingle
+    :return: array of distinct 32-bit shingle hashes (empty for non-string / empty texts)
+    """
+    if not isinstance(text, str):
+        return np.empty(0, dtype=np.uint64)
+
+    words = TEXT_NORMALIZER(text).split()
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+
+    shingles = {zlib.crc32(" ".join(words[idx: idx + shingle_size]).encode('utf-8'))
+                for idx in range(max(len(words) - shingle_size + 1, 1))}
+    return np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+
+
+def get_lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Chooses number of LSH bands and rows per band, so that documents with Jaccard similarity of threshold become
+    candidates with probability of about 1/2
+    :param threshold: Jaccard similarity threshold
+    :param num_perm: number of MinHash permutations
+    :return: number of bands and number of rows per band (bands * rows <= num_perm)
+    """
+    assert 0 < threshold < 1, "Argument threshold should be in (0, 1). Instead got %s" % threshold
+
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        # similarity at which the probability of becoming candidates is the steepest
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures of texts with num_perm universal hash functions (a * x + b) mod p
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        """
+        :param num_perm: number of hash functions (length of signatures)
+        :param shingle_size: number of words per shingle
+        :param seed: random seed of the hash functions, signatures are comparable only for the same seed
+        """
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # a * x stays below 2^64 for x < 2^32
+        self.a = rng.randint(1, 1 << 31, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        :return: array of num_perm minimal hashes (all equal to 2^32 - 1 for texts without words)
+        """
+        shingles = get_shingles(text, self.shingle_size)
+        if not shingles.shape[0]:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+
+        hashes = (np.outer(self.a, shingles) + self.b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+        return hashes.min(axis=1)
+
+
+def estimate_jaccard(signature_1: np.ndarray, signature_2: np.ndarray) -> float:
+    return float(np.mean(signature_1 == signature_2))
+
+
+class NearDuplicateIndex:
+    """
+    Streaming LSH index clustering near-identical texts (e.g. syndicated copies of one article with other
+    boilerplate or advertising).
+
+    Every new text is compared with the representatives (first texts) of the clusters sharing at least one LSH band
+    with it. It joins the most similar cluster if the estimated Jaccard similarity of their shingles is at least
+    threshold, or starts a new cluster otherwise. Only signatures of representatives are kept in memory.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        """
+        :param threshold: minimal estimated Jaccard similarity of word shingles of near-duplicates
+        :param num_perm: number of MinHash permutations
+        :param shingle_size: number of words per shingle
+        :param seed: random seed of MinHash
+        """
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size, seed=seed)
+        self.n_bands, self.n_rows = get_lsh_params(threshold, num_perm)
+        self.buckets = [{} for _ in range(self.n_bands)]
+        self.representatives = []
+        self.signatures = []
+        self.cluster_sizes = []
+
+    def add(self, doc_id: Hashable, text: str) -> int:
+        """
+        Adds the text to the index
+        :param doc_id: id of the document (stored for the representatives only)
+        :param text: text of the document
+        :return: id of the cluster of the text
+        """
+        signature = self.hasher.signature(text)
+        band_keys = [signature[band * self.n_rows: (band + 1) * self.n_rows].tobytes()
+                     for band in range(self.n_bands)]
+
+        # texts without words are never near-duplicates of anything
+        is_empty = bool(signature[0] == _MAX_HASH and (signature == _MAX_HASH).all())
+
+        cluster_id = None
+        if not is_empty:
+            candidates = {self.buckets[band].get(key) for band, key in enumerate(band_keys)}
+            candidates.discard(None)
+            best_similarity = self.threshold
+            for candidate in candidates:
+                similarity = estimate_jaccard(signature, self.signatures[candidate])
+                if similarity >= best_similarity:
+                    cluster_id, best_similarity = candidate, similarity
+
+        if cluster_id is None:
+            cluster_id = len(self.representatives)
+            self.representatives.append(doc_id)
+            self.signatures.append(signature)
+            self.cluster_sizes.append(0)
+            if not is_empty:
+                for band, key in enumerate(band_keys):
+                    self.buckets[band].setdefault(key, cluster_id)
+
+        self.cluster_sizes[cluster_id] += 1
+        return cluster_id
+
+    def add_many(self, doc_ids: Iterable[Hashable], texts: Iterable[str]) -> List[int]:
+        return [self.add(doc_id, text) for doc_id, text in zip(doc_ids, texts)]
+
+    def __len__(self) -> int:
+        return len(self.representatives)
+
+
+def cluster_near_duplicates(df_input: pd.DataFrame, text_column: str = 'text', id_column: str = None,
+                            index: NearDuplicateIndex = None, threshold: float = 0.8,
+                            num_perm: int = 128) -> pd.DataFrame:
+    """
+    Assigns near-duplicate clusters to the rows of the DF. Pass the same index for consecutive batches of a stream to
+    cluster them together
+    :param df_input: pandas DF with texts
+    :param text_column: name of the column with texts
+    :param id_column: name of the column with document ids (DF index if None)
+    :param index: index to add the texts to (a new one is created if None)
+    :param threshold: minimal Jaccard similarity of near-duplicates for a new index
+    :param num_perm: number of MinHash permutations for a new index
+    :return: copy of the DF with 'cluster_id', 'representative_id' and 'is_representative' columns
+    """
+    index = NearDuplicateIndex(threshold=threshold, num_perm=num_perm) if index is None else index
+    doc_ids = df_input.index if id_column is None else df_input[id_column]
+
+    n_clusters = len(index)
+    cluster_ids = np.array(index.add_many(doc_ids, df_input[text_column]), dtype=np.int64)
+
+    # the first row of every new cluster is its representative
+    is_representative = np.zeros(len(cluster_ids), dtype=bool)
+    new_clusters, first_rows = np.unique(cluster_ids, return_index=True)
+    is_representative[first_rows[new_clusters >= n_clusters]] = True
+
+    return df_input.assign(cluster_id=cluster_ids,
+                           representative_id=[index.representatives[cluster_id] for cluster_id in cluster_ids],
+                           is_representative=is_representative)
+
+
+def fan_out_to_clusters(df_clustered: pd.DataFrame, df_representatives: pd.DataFrame,
+                        columns: List[str]) -> pd.DataFrame:
+    """
+    Copies results computed for representatives to all members of their clusters
+    :param df_clustered: DF returned by cluster_near_duplicates
+    :param df_representatives: DF with 'cluster_id' column and result columns of representatives
+    :param columns: result columns to copy
+    :return: copy of df_clustered with the result columns
+    """
+    results = df_representatives.drop_duplicates('cluster_id').set_index('cluster_id')[columns]
+    results = results.reindex(df_clustered['cluster_id'].values)
+    return df_clustered.assign(**{column: results[column].values for column in columns})
+
+
+class RepresentativeResults:
+    """
+    Results of the cluster representatives of a stream {cluster_id: {column: value}}, shared by the batches passed to
+    apply_to_representatives. At most max_clusters results are kept, the least recently used ones are evicted
+    """
+
+    def __init__(self, max_clusters: int = 1000000):
+        """
+        :param max_clusters: maximum number of clusters whose results are kept
+        """
+        assert max_clusters > 0, "Argument max_clusters should be positive. Instead got %s" % max_clusters
+
+        self.max_clusters = max_clusters
+        self.n_evicted = 0
+        self._results = OrderedDict()
+
+    def get(self, cluster_id: int) -> Optional[Dict[str, Any]]:
+        result = self._results.get(cluster_id)
+        if result is not None:
+            self._results.move_to_end(cluster_id)
+        return result
+
+    def put(self, cluster_id: int, result: Dict[str, Any]) -> None:
+        self._results[cluster_id] = result
+        self._results.move_to_end(cluster_id)
+        while len(self._results) > self.max_clusters:
+            self._results.popitem(last=False)
+            self.n_evicted += 1
+
+    def clear(self) -> None:
+        self._results.clear()
+
+    def __contains__(self, cluster_id: int) -> bool:
+        return cluster_id in self._results
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+
+def apply_to_representatives(df_clustered: pd.DataFrame, func: Callable[[pd.DataFrame], pd.DataFrame],
+                             results: RepresentativeResults = None) -> pd.DataFrame:
+    """
+    Applies a DF function (e.g. base_filter_for_dataframe) to one representative per cluster and fans the new columns
+    out to the rest of the cluster. The representative is the first document of the cluster in the stream (see
+    'is_representative'), so its result is reused by the members of the cluster in all later batches. If the result
+    of a cluster whose representative was in an earlier batch is not known (evicted from results or results not
+    passed), the first member of the cluster in the batch stands in for the representative
+    :param df_clustered: DF returned by cluster_near_duplicates
+    :param func: function returning copy of its DF argument with new columns
+    :param results: results of the clusters processed in previous batches of a stream; updated in place with the
+                    results of this batch
+    :return: copy of df_clustered with the new columns
+    """
+    results = RepresentativeResults() if results is None else results
+
+    cluster_ids = df_clustered['cluster_id'].values
+    batch_results = {cluster_id: results.get(cluster_id) for cluster_id in pd.unique(cluster_ids)}
+    df_todo = df_clustered[np.array([batch_results[cluster_id] is None for cluster_id in cluster_ids], dtype=bool)]
+
+    representatives = df_todo[df_todo['is_representative'].values]
+    stand_ins = df_todo[~df_todo['cluster_id'].isin(representatives['cluster_id']).values].drop_duplicates('cluster_id')
+    df_todo = pd.concat([representatives, stand_ins])
+    n_stand_ins = stand_ins.shape[0]
+
+    df_processed = func(df_todo)
+    new_columns = [column for column in df_processed.columns if column not in df_clustered.columns]
+
+    for cluster_id, row in zip(df_processed['cluster_id'], df_processed[new_columns].to_dict(orient='records')):
+        results.put(cluster_id, row)
+        batch_results[cluster_id] = row
+
+    _logger.info("Processed %d representatives (%d stand-ins) for %d docs, %d cluster results kept" % (
+        df_todo.shape[0], n_stand_ins, df_clustered.shape[0], len(results)))
+
+    df_results = pd.DataFrame.from_dict(batch_results, orient='index')
+    if not new_columns:
+        new_columns = list(df_results.columns)
+    df_results = df_results.reindex(cluster_ids)
+    return df_clustered.assign(**{column: df_results[column].values for column in new_columns})
@@ -0,0 +1,182 @@
+import os
+import queue
+import time
+from collections import deque
+from itertools import count
+from multiprocessing import cpu_count
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from loggers import configure_logging
+
+# Setting logger
+logging = configure_logging()
+_logger = logging.getLogger("pool-utils")
+
+# fixed cost of a row in characters (per-row overhead of pandas / function calls, so empty rows are not free)
+ROW_COST = 50
+
+
+def get_chunk_bounds(n_rows: int, n_chunks: int) -> List[Tuple[int, int]]:
+    """
+    :return: list of (start, stop) row ranges of the chunks, of the same sizes as np.array_split
+    """
+    size, n_larger = divmod(n_rows, n_chunks)
+    bounds = []
+    start = 0
+    for idx in range(n_chunks):
+        stop = start + size + (idx < n_larger)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def get_text_costs(data: Union[pd.DataFrame, pd.Series, Sequence]) -> np.ndarray:
+    """
+    Estimates processing cost of every row as its number of characters (of all string columns of a DF) plus ROW_COST
+    :param data: pd.DataFrame / pd.Series / list
+    :return: array of costs of the rows
+    """
+    if isinstance(data, pd.DataFrame):
+        columns = [data.iloc[:, idx] for idx in range(data.shape[1])
+                   if data.dtypes.iloc[idx] == object or isinstance(data.dtypes.iloc[idx], pd.StringDtype)]
+    else:
+        columns = [data]
+
+    costs = np.full(len(data), ROW_COST, dtype=np.float64)
+    for column in columns:
+        costs += np.fromiter((len(value) if isinstance(value, str) else 0 for value in column),
+                             dtype=np.float64, count=len(data))
+    return costs
+
+
+def get_balanced_chunk_bounds(costs: Sequence[float], n_chunks: int) -> List[Tuple[int, int]]:
+    """
+    Splits rows into contiguous chunks of about equal total cost (instead of equal number of rows), so a few very
+    long texts do not end up in the same chunk. Rows keep their order
+    :param costs: cost of every row (e.g. see get_text_costs)
+    :param n_chunks: number of chunks
+    :return: list of (start, stop) row ranges of the non-empty chunks (fewer than n_chunks if a single row costs more
+             than a chunk)
+    """
+    costs = np.asarray(costs, dtype=np.float64)
+    n_rows = costs.shape[0]
+    if n_rows == 0:
+        return [(0, 0)]
+
+    cumulative = np.cumsum(costs)
+    targets = cumulative[-1] * np.arange(1, n_chunks) / n_chunks
+    # index of the row reaching every target, the cut is placed on the side of the row closer to the target
+    rows = np.minimum(np.searchsorted(cumulative, targets), n_rows - 1)
+    before = np.where(rows > 0, cumulative[rows - 1], 0.)
+    cuts = rows + (cumulative[rows] - targets <= targets - before)
+
+    stops = np.maximum.accumulate(np.append(cuts, n_rows))
+    starts = np.insert(stops[:-1], 0, 0)
+    return [(int(start), int(stop)) for start, stop in zip(starts, stops) if stop > start]
+
+
+class TimedFunction:
+    """
+    Picklable wrapper of a function returning its result together with the time of the call and pid of the worker
+    """
+
+    def __init__(self, func: callable):
+        self.func = func
+
+    def __call__(self, *args) -> Tuple[Any, float, int]:
+        t0 = time.perf_counter()
+        result = self.func(*args)
+        return result, time.perf_counter() - t0, os.getpid()
+
+
+def get_chunk_timings(bounds: List[Tuple[int, int]], timings: List[Tuple[float, int]],
+                      costs: Optional[Sequence[float]] = None) -> pd.DataFrame:
+    """
+    :param bounds: (start, stop) row ranges of the chunks
+    :param timings: (seconds, worker pid) of the chunks (see TimedFunction)
+    :param costs: cost of every row (number of rows is used if None)
+    :return: pandas DF with rows, cost, seconds and worker pid of every chunk
+    """
+    cumulative = np.concatenate([[0.], np.cumsum(costs)]) if costs is not None else None
+    return pd.DataFrame({
+        'chunk': range(len(bounds)),
+        'n_rows': [stop - start for start, stop in bounds],
+        'cost': [cumulative[stop] - cumulative[start] if cumulative is not None else stop - start
+                 for start, stop in bounds],
+        'seconds': [seconds for seconds, _ in timings],
+        'worker': [pid for _, pid in timings],
+    })
+
+
+def _skew(values: pd.Series) -> float:
+    return values.max() / values.mean() if len(values) and values.mean() > 0 else 1.
+
+
+def log_chunk_timings(df_timings: pd.DataFrame) -> None:
+    """
+    Logs time of every chunk and the skew of chunk costs, chunk times and worker busy times (max / mean). Busy time
+    skew above 1 means that the workers waited idle for the slowest one
+    :param df_timings: DF returned by get_chunk_timings
+    """
+    for row in df_timings.itertuples(index=False):
+        _logger.info("Chunk %d: %d rows, cost %.0f, %.3f sec, worker %d" % (
+            row.chunk, row.n_rows, row.cost, row.seconds, row.worker))
+
+    busy = df_timings.groupby('worker')['seconds'].sum()
+    _logger.info("Skew (max / mean) of %d chunks: cost %.2f, time %.2f; busy time of %d workers: %.2f "
+                 "(%.2f - %.2f sec)" % (df_timings.shape[0], _skew(df_timings['cost']), _skew(df_timings['seconds']),
+                                        busy.shape[0], _skew(busy), busy.min() if len(busy) else 0.,
+                                        busy.max() if len(busy) else 0.))
+
+
+def imap_bounded(pool, func: callable, iterable: Iterable, max_in_flight: int = None,
+                 ordered: bool = True) -> Iterator[Any]:
+    """
+    Lazy version of pool.imap / pool.imap_unordered. The pool's own imap reads the whole iterable into its task
+    queue, so a stream of chunks ends up in memory at once. Here the next chunk is taken from the iterable only when
+    a result is yielded, so at most max_in_flight chunks (and their results) are held at a time
+    :param pool: multiprocessing pool
+    :param func: function to be mapped on the chunks
+    :param iterable: iterable of chunks (e.g. generator of pandas DFs read from a file)
+    :param max_in_flight: maximum number of chunks submitted to the pool and not yet yielded (2 x number of CPU cores
+                          if None)
+    :param ordered: if True -> results are yielded in the order of the chunks, if False -> as soon as they are ready
+    :return: iterator over results (exception of a failed chunk is raised when its result would be yielded)
+    """
+    max_in_flight = 2 * cpu_count() if max_in_flight is None else max_in_flight
+    assert max_in_flight > 0, "Argument max_in_flight should be positive. Instead got %s" % max_in_flight
+
+    iterator = iter(iterable)
+    indices = count()
+    pending = {}
+    ready = deque() if ordered else queue.Queue()
+
+    def submit() -> bool:
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return False
+
+        idx = next(indices)
+        if ordered:
+            pending[idx] = pool.apply_async(func, (chunk,))
+            ready.append(idx)
+        else:
+            # callbacks run in the result handler thread of the pool
+            notify = lambda _, idx=idx: ready.put(idx)
+            pending[idx] = pool.apply_async(func, (chunk,), callback=notify, error_callback=notify)
+        return True
+
+    for _ in range(max_in_flight):
+        if not submit():
+            break
+
+    while pending:
+        idx = ready.popleft() if ordered else ready.get()
+        async_result = pending.pop(idx)
+        # the next chunk is submitted before the result is consumed, so workers do not wait for the consumer
+        submit()
+        yield async_result.get()
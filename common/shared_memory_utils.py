@@ -0,0 +1,331 @@
+import gc
+from multiprocessing import shared_memory
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from loggers import configure_logging
+from pool_utils import TimedFunction
+
+# Setting logger
+logging = configure_logging()
+_logger = logging.getLogger("shared-memory-utils")
+
+# Shared memory transport of parallelize: columns of the input data are copied once into shared memory blocks and
+# workers receive only the names of the blocks and the row range of their chunk. Columns are stored as:
+#   numpy dtypes (numbers, booleans, datetimes)  - raw array
+#   strings (object / string dtype)              - Arrow large_string buffers (validity bitmap, offsets, data)
+# Other columns (lists, dicts, categoricals, ...) are pickled to the workers chunk by chunk, as before.
+# Results may be written by the workers into preallocated shared arrays of fixed-size dtypes (output_dtypes), so that
+# only the new columns come back instead of the pickled result frames.
+
+OutputDtypes = Union[np.dtype, str, type, Dict[Hashable, Union[np.dtype, str, type]]]
+
+# kinds of numpy dtypes stored as raw arrays: bool, int, uint, float, complex, timedelta, datetime
+_SHARED_ARRAY_KINDS = 'biufcmM'
+
+# alignment of Arrow buffers inside a shared block
+_ALIGNMENT = 64
+
+
+def _create_block(size: int) -> shared_memory.SharedMemory:
+    # shared memory of size 0 is not allowed
+    return shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+
+def _release_block(block: shared_memory.SharedMemory, unlink: bool = False) -> None:
+    try:
+        block.close()
+    except BufferError:
+        # a view of the block is still referenced, the mapping is released when the view is collected
+        gc.collect()
+        block.close()
+    if unlink:
+        block.unlink()
+
+
+def _to_shared_strings(series: pd.Series) -> Optional[Tuple[shared_memory.SharedMemory, Dict[str, Any]]]:
+    """
+    Copies string column into a shared block as Arrow large_string buffers
+    :return: block and its description, or None if the column does not consist of strings (and missing values)
+    """
+    import pyarrow as pa
+
+    try:
+        array = pa.array(series, type=pa.large_string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return None
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+
+    layout = []
+    size = 0
+    for buffer in array.buffers():
+        if buffer is None:
+            layout.append(None)
+            continue
+        layout.append((size, buffer.size))
+        size += (buffer.size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+    block = _create_block(size)
+    try:
+        for buffer, position in zip(array.buffers(), layout):
+            if buffer is not None:
+                block.buf[position[0]: position[0] + position[1]] = memoryview(buffer).cast('B')
+    except Exception:
+        _release_block(block, unlink=True)
+        raise
+
+    return block, {'layout': layout, 'length': len(array), 'offset': array.offset, 'null_count': array.null_count}
+
+
+def _to_shared_array(values: np.ndarray) -> Tuple[shared_memory.SharedMemory, Dict[str, Any]]:
+    """
+    Copies numpy array into a shared block
+    """
+    block = _create_block(values.nbytes)
+    shared = np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)
+    shared[:] = values
+    del shared
+    return block, {'dtype': values.dtype, 'length': values.shape[0]}
+
+
+class SharedFrame:
+    """
+    Picklable handle of a pandas DF / Series whose columns are stored in shared memory. Create it in the parent
+    process with SharedFrame.create and pass it to the workers, which read their chunks with read(start, stop)
+    """
+
+    def __init__(self, is_series: bool, name: Hashable, columns: List[Dict[str, Any]], n_rows: int):
+        """
+        :param is_series: if True -> the data is pd.Series (with one column)
+        :param name: name of the Series
+        :param columns: descriptions of the columns (label, dtype, kind, name of the shared block and its layout)
+        :param n_rows: number of rows
+        """
+        self.is_series = is_series
+        self.name = name
+        self.columns = columns
+        self.n_rows = n_rows
+        self._blocks = []
+
+    @classmethod
+    def create(cls, data: Union[pd.DataFrame, pd.Series]) -> 'SharedFrame':
+        """
+        Copies columns of the data into shared memory (call unlink when the workers are done)
+        :param data: pd.DataFrame / pd.Series
+        :return: handle of the shared data
+        """
+        assert isinstance(data, (pd.DataFrame, pd.Series)), \
+            "Argument data should be pd.DataFrame or pd.Series. Instead got %s" % type(data)
+
+        is_series = isinstance(data, pd.Series)
+        frame = data.to_frame() if is_series else data
+
+        shared_frame = cls(is_series, data.name if is_series else None, [], frame.shape[0])
+        try:
+            for idx, label in enumerate(frame.columns):
+                series = frame.iloc[:, idx]
+                column = {'label': label, 'dtype': series.dtype, 'kind': 'pickle', 'block': None}
+
+                shared = None
+                if isinstance(series.dtype, np.dtype) and series.dtype.kind in _SHARED_ARRAY_KINDS:
+                    shared = _to_shared_array(series.to_numpy())
+                    column['kind'] = 'array'
+                elif series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+                    shared = _to_shared_strings(series)
+                    column['kind'] = 'string' if shared is not None else 'pickle'
+
+                if shared is not None:
+                    block, meta = shared
+                    shared_frame._blocks.append(block)
+                    column.update(meta, block=block.name)
+                shared_frame.columns.append(column)
+        except Exception:
+            shared_frame.unlink()
+            raise
+
+        pickled = [column['label'] for column in shared_frame.columns if column['kind'] == 'pickle']
+        if pickled:
+            _logger.info("Columns %s cannot be shared and are pickled to the workers" % pickled)
+        return shared_frame
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_blocks'] = []
+        return state
+
+    @property
+    def pickled_labels(self) -> List[Hashable]:
+        return [column['label'] for column in self.columns if column['kind'] == 'pickle']
+
+    def _read_column(self, column: Dict[str, Any], start: int, stop: int) -> np.ndarray:
+        block = shared_memory.SharedMemory(name=column['block'])
+        try:
+            if column['kind'] == 'array':
+                shared = np.ndarray((column['length'],), dtype=column['dtype'], buffer=block.buf)
+                values = shared[start: stop].copy()
+                del shared
+            else:
+                values = self._read_strings(block, column, start, stop)
+        finally:
+            _release_block(block)
+        return values
+
+    @staticmethod
+    def _read_strings(block: shared_memory.SharedMemory, column: Dict[str, Any], start: int, stop: int) -> np.ndarray:
+        import pyarrow as pa
+
+        buffers = [None if position is None else pa.py_buffer(block.buf[position[0]: position[0] + position[1]])
+                   for position in column['layout']]
+        array = pa.Array.from_buffers(pa.large_string(), column['length'], buffers,
+                                      null_count=column['null_count'], offset=column['offset'])
+        # strings are decoded into python objects, so nothing refers to the block afterwards
+        values = array.slice(start, stop - start).to_numpy(zero_copy_only=False)
+        del array, buffers
+        return values
+
+    def read(self, start: int, stop: int, index: pd.Index,
+             pickled: Optional[pd.DataFrame] = None) -> Union[pd.DataFrame, pd.Series]:
+        """
+        Reads chunk of rows from shared memory (in a worker). Missing strings are returned as None
+        :param start: first row of the chunk
+        :param stop: row after the last row of the chunk
+        :param index: index of the chunk
+        :param pickled: values of the columns that are not shared (see pickled_labels)
+        :return: chunk of the data with the original index, column labels and dtypes
+        """
+        columns = {}
+        for idx, column in enumerate(self.columns):
+            if column['kind'] == 'pickle':
+                values = pickled[column['label']].to_numpy()
+            else:
+                values = self._read_column(column, start, stop)
+            columns[idx] = pd.Series(values, index=index, dtype=column['dtype'], copy=False)
+
+        if self.is_series:
+            return columns[0].rename(self.name)
+
+        chunk = pd.DataFrame(columns, index=index, copy=False)
+        chunk.columns = pd.Index([column['label'] for column in self.columns])
+        return chunk
+
+    def unlink(self) -> None:
+        """
+        Frees shared memory (in the parent process)
+        """
+        for block in self._blocks:
+            _release_block(block, unlink=True)
+        self._blocks = []
+
+
+class SharedOutput:
+    """
+    Picklable handle of preallocated shared arrays that the workers write their results into
+    """
+
+    def __init__(self, output_dtypes: OutputDtypes, n_rows: int):
+        """
+        :param output_dtypes: numpy dtype of the result values (func returns pd.Series / np.ndarray / list) or dict
+                              {column: numpy dtype} of the result columns (func returns pd.DataFrame)
+        :param n_rows: number of rows
+        """
+        self.is_frame = isinstance(output_dtypes, dict)
+        dtypes = output_dtypes if self.is_frame else {None: output_dtypes}
+        self.dtypes = {label: np.dtype(dtype) for label, dtype in dtypes.items()}
+        for label, dtype in self.dtypes.items():
+            assert dtype.kind in _SHARED_ARRAY_KINDS, \
+                "Output dtype should be fixed-size numpy dtype (bool, numbers, datetimes). Instead got %s" % dtype
+
+        self.n_rows = n_rows
+        self._blocks = {label: _create_block(n_rows * dtype.itemsize) for label, dtype in self.dtypes.items()}
+        self.names = {label: block.name for label, block in self._blocks.items()}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_blocks'] = {}
+        return state
+
+    def write(self, start: int, stop: int, result: Any) -> None:
+        """
+        Writes result of the chunk of rows into the shared arrays (in a worker)
+        """
+        if self.is_frame:
+            assert isinstance(result, pd.DataFrame), \
+                "Function should return pd.DataFrame for dict output_dtypes. Instead got %s" % type(result)
+            values = {label: result[label] for label in self.dtypes}
+        else:
+            values = {None: result}
+
+        for label, dtype in self.dtypes.items():
+            column = np.asarray(values[label]).astype(dtype, copy=False)
+            assert column.shape == (stop - start,), \
+                "Result of the chunk should have %d values. Instead got shape %s" % (stop - start, column.shape)
+
+            block = shared_memory.SharedMemory(name=self.names[label])
+            try:
+                shared = np.ndarray((self.n_rows,), dtype=dtype, buffer=block.buf)
+                shared[start: stop] = column
+                del shared
+            finally:
+                _release_block(block)
+
+    def read(self) -> Dict[Hashable, np.ndarray]:
+        """
+        Copies the results out of shared memory (in the parent process)
+        :return: dict {column: values} ({None: values} for single dtype)
+        """
+        return {label: np.ndarray((self.n_rows,), dtype=dtype, buffer=self._blocks[label].buf).copy()
+                for label, dtype in self.dtypes.items()}
+
+    def unlink(self) -> None:
+        for block in self._blocks.values():
+            _release_block(block, unlink=True)
+        self._blocks = {}
+
+
+def _apply_to_shared_chunk(task: Tuple) -> Any:
+    func, shared_frame, start, stop, index, pickled, output = task
+    chunk = shared_frame.read(start, stop, index, pickled)
+    result = func(chunk)
+    if output is None:
+        return result
+
+    output.write(start, stop, result)
+    return None
+
+
+def map_shared_memory(pool, data: Union[pd.DataFrame, pd.Series], func: callable, bounds: List[Tuple[int, int]],
+                      output_dtypes: Optional[OutputDtypes] = None
+                      ) -> Tuple[Union[List[Any], Dict[Hashable, np.ndarray]], List[Tuple[float, int]]]:
+    """
+    Applies func to chunks of the data in the pool, passing the data through shared memory
+    :param pool: multiprocessing pool
+    :param data: pd.DataFrame / pd.Series
+    :param func: function to be mapped on chunks of data
+    :param bounds: (start, stop) row ranges of the chunks (see get_chunk_bounds / get_balanced_chunk_bounds)
+    :param output_dtypes: if given -> results are written into shared arrays of these dtypes (see SharedOutput)
+    :return: list of results of the chunks (or dict {column: values} of all rows if output_dtypes is given) and list
+             of (seconds, worker pid) of the chunks
+    """
+    shared_frame = SharedFrame.create(data)
+    output = None
+    try:
+        output = SharedOutput(output_dtypes, shared_frame.n_rows) if output_dtypes is not None else None
+
+        pickled_labels = shared_frame.pickled_labels
+        frame = data.to_frame() if isinstance(data, pd.Series) else data
+        tasks = [(func, shared_frame, start, stop, data.index[start: stop],
+                  frame.iloc[start: stop][pickled_labels] if pickled_labels else None, output)
+                 for start, stop in bounds]
+
+        timed_results = pool.map(TimedFunction(_apply_to_shared_chunk), tasks, chunksize=1)
+        timings = [(seconds, pid) for _, seconds, pid in timed_results]
+        if output is not None:
+            return output.read(), timings
+        return [result for result, _, _ in timed_results], timings
+    finally:
+        shared_frame.unlink()
+        if output is not None:
+            output.unlink()
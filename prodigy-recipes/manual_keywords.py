@@ -0,0 +1,65 @@
+import os
+import sys
+from typing import Union, Iterable, Optional, List
+
+from prodigy import recipe, log, get_stream
+from prodigy.types import RecipeSettingsType
+from prodigy.util import get_labels
+
+# level-0 filter lives in the common library of the repo
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+
+from level_0_filter_utils import add_keyword_spans
+
+
+@recipe(
+    "textcat.manual_keywords",
+    # fmt: off
+    dataset=("Dataset to save annotations to", "positional", None, str),
+    source=("Data to annotate (file path or '-' to read from standard input)", "positional", None, str),
+    labels=("Comma-separated label(s) to annotate or text file with one label per line", "option", "l", get_labels),
+    label_by=("Label key words by 'category' (e.g. AUTO_THEFT) or by 'relevance' (RELEVANT / NOT_RELEVANT)", "option", "lb", str),
+    exclusive=("Treat classes as mutually exclusive", "flag", "E", bool),
+    # fmt: on
+)
+def manual(
+    dataset: str,
+    source: Union[str, Iterable[dict]],
+    labels: Optional[List[str]] = None,
+    label_by: str = 'category',
+    exclusive: bool = False,
+) -> RecipeSettingsType:
+    """
+    Manually annotate categories that apply to a text. Key words of the level-0
+    filter are pre-highlighted by the filter itself, so no spaCy pipeline or
+    patterns file is needed. Labels of the highlighted key words are
+    pre-selected as accepted options.
+    """
+    log("RECIPE: Starting recipe textcat.manual_keywords", locals())
+    log(f"RECIPE: Annotating with {len(labels or [])} labels", labels)
+    stream = get_stream(source, rehash=True, dedup=True, input_key="text")
+    stream = add_suggestions(stream, labels, label_by)
+
+    return {
+        "view_id": "choice",
+        "dataset": dataset,
+        "stream": stream,
+        "config": {
+            "labels": labels,
+            "choice_style": "single" if exclusive else "multiple",
+            "choice_auto_accept": False,
+            "exclude_by": "task",
+            "auto_count_stream": True,
+        },
+    }
+
+
+def add_suggestions(stream, labels, label_by):
+    options = [{"id": label, "text": label} for label in labels or []]
+
+    for task in add_keyword_spans(stream, label_by=label_by, labels=labels):
+        task["options"] = options
+        if task['spans']:
+            task["accept"] = list(set(s['label'] for s in task['spans']))
+
+        yield task
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+# crime_mapper_utils builds the SQL version of the rules with psycopg2
+crime_mapper_utils = pytest.importorskip("crime_mapper_utils")
+
+
+def test_rule_engine_matches_legacy_on_random_sample():
+    assert crime_mapper_utils.check_crimemapper_equivalence(n_samples=100000) == []
+
+
+def test_rule_engine_matches_legacy_on_every_term():
+    terms = crime_mapper_utils.CRIME_RULE_ENGINE.terms
+    raw_crimes = [*terms, *(term.upper() for term in terms), *(" %s " % term for term in terms)]
+
+    assert crime_mapper_utils.check_crimemapper_equivalence(raw_crimes=raw_crimes) == []
+    for term in terms:
+        assert crime_mapper_utils.crimemapper(term) == crime_mapper_utils.crimemapper_legacy(term)
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+# generic_utils needs the AWS / OpenSearch / Postgres clients of the full environment
+generic_utils = pytest.importorskip("generic_utils")
+
+
+def test_managed_pool_is_reused_with_array_initargs():
+    initargs = (np.arange(10),)
+    try:
+        pool = generic_utils.get_managed_pool(1, initializer=np.asarray, initargs=initargs)
+        assert generic_utils.get_managed_pool(1, initializer=np.asarray, initargs=initargs) is pool
+
+        # equal but not the same array -> new pool
+        other_pool = generic_utils.get_managed_pool(1, initializer=np.asarray, initargs=(np.arange(10),))
+        assert other_pool is not pool
+    finally:
+        generic_utils.shutdown_managed_pool()